@@ -1,10 +1,15 @@
 import os
+import json
+import pickle
+import hashlib
+from pathlib import Path
 import streamlit as st
-import psycopg2
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_anthropic import ChatAnthropic
 from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
+from database import connect_to_database, pooled_connection, read_sql_query
+from query_cache import QueryCache, TABLE_VERSION_QUERY
 
 # Configure Streamlit page - must be the first Streamlit command
 st.set_page_config(page_title="Chat with your database through LLMs")
@@ -14,27 +19,50 @@ load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 
+# Query cache settings (entries per layer, seconds a table version stamp is trusted, and the
+# minimum similarity for a semantic question match, leave it unset to only match exact questions)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+TABLE_VERSION_TTL = float(os.getenv("TABLE_VERSION_TTL", "30"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD")) if os.getenv("SEMANTIC_CACHE_THRESHOLD") else None
+
 # Initialize chat history in session state if it doesn't exist
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-# Mock database schema and descriptions
-def load_database_schema_description():
-    """Load the database schema description from the file and split into chunks."""
+# Schema description sources (the local copy is preferred, it avoids an HTTP round trip on startup)
+SCHEMA_FILE = Path(__file__).resolve().parents[2] / "datasets" / "dataset_multiple_tables" / "database_schema_description.doc"
+SCHEMA_URL = "https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/datasets/dataset_multiple_tables/database_schema_description.doc"
+
+# Vector index settings
+FAISS_INDEX_DIR = "faiss_index_store"
+MANIFEST_FILE = "manifest.json"
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+# Add a function to get the raw content
+def load_database_schema_description_raw():
+    """Load the raw database schema description as a single string."""
+    try:
+        with open(SCHEMA_FILE, "r") as file:
+            return file.read()
+    except Exception:
+        pass
+    
+    # Fallback to the copy on GitHub if the local file is missing
     try:
         import requests
-        response = requests.get("https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/datasets/dataset_multiple_tables/database_schema_description.doc")
+        response = requests.get(SCHEMA_URL)
         response.raise_for_status()
-        content = response.text
+        return response.text
     except Exception as e:
         st.error(f"Error fetching schema from URL: {e}")
-        # Fallback to local file if URL fails
-        try:
-            with open(r"E:\NLP Learning\NLP-Learning\Business Intelligence Chatbot with Langchain\datasets\dataset_multiple_tables\database_schema_description.doc", "r") as file:
-                content = file.read()
-        except Exception as e2:
-            st.error(f"Error reading local schema file: {e2}")
-            return ""
+        return ""
+
+# Mock database schema and descriptions
+def load_database_schema_description():
+    """Load the database schema description from the file and split into chunks."""
+    content = load_database_schema_description_raw()
+    if not content:
+        return []
     
     # Split content into meaningful chunks based on sections
     # First split by major headings (# heading)
@@ -60,37 +88,57 @@ def load_database_schema_description():
     
     return [chunk for chunk in chunks if chunk and len(chunk) > 50]  # Filter empty or too small chunks
 
-# Function to generate a vector index
-def generate_vector_index(text_segments):
+def chunk_hash(chunk):
+    """Content hash of a schema chunk, used as its id in the vector store."""
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+def read_index_manifest():
+    """Read the manifest (embedding model + chunk hashes) of the persisted index, if any."""
+    try:
+        with open(os.path.join(FAISS_INDEX_DIR, MANIFEST_FILE), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def save_vector_index(vector_db, chunk_hashes):
+    """Save the FAISS index together with its manifest."""
+    vector_db.save_local(FAISS_INDEX_DIR)
+    with open(os.path.join(FAISS_INDEX_DIR, MANIFEST_FILE), "w") as file:
+        json.dump({"embedding_model": EMBEDDING_MODEL, "chunk_hashes": chunk_hashes}, file)
+
+def load_vector_index(embed_model, mmap=True):
     """
-    Creates a vector store of text chunks and saves it to a FAISS index.
+    Load the persisted FAISS index.
 
     Args:
-        text_segments (list): List of text chunks to be embedded and indexed.
+        embed_model: Embedding model used for the queries
+        mmap (bool): Memory-map the index read-only instead of reading it into memory
 
     Returns:
-        FAISS vector store: The loaded or newly created vector store
+        FAISS vector store
     """
-    embed_model = OpenAIEmbeddings(model="text-embedding-3-large")
-    vector_db = FAISS.from_texts(text_segments, embedding=embed_model)
-    vector_db.save_local("faiss_index_store")
-    return vector_db
+    if not mmap:
+        return FAISS.load_local(FAISS_INDEX_DIR, embed_model, allow_dangerous_deserialization=True)
+    
+    import faiss
+    index_path = os.path.join(FAISS_INDEX_DIR, "index.faiss")
+    try:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(index_path, flags)
+    except RuntimeError:
+        # Older FAISS builds cannot memory-map flat indexes
+        index = faiss.read_index(index_path)
+    with open(os.path.join(FAISS_INDEX_DIR, "index.pkl"), "rb") as file:
+        docstore, index_to_docstore_id = pickle.load(file)
+    return FAISS(embed_model, index, docstore, index_to_docstore_id)
 
 # Load or create vector database
+@st.cache_resource(show_spinner="Loading schema vector index...")
 def load_or_create_vector_db():
-    """Load existing vector database or create a new one if it doesn't exist."""
-    # For demo purposes, always create a fresh index to ensure correct chunking
-    # But in production, you can load the existing index
-    if os.path.exists("faiss_index_store"):
-        # Try to remove the old index
-        import shutil
-        try:
-            shutil.rmtree("faiss_index_store")
-            st.info("Recreating vector index with proper text chunking...")
-        except Exception as e:
-            st.warning(f"Could not remove old index: {e}. Will try to create/load it anyway.")
-    
-    # Create a new vector index with properly chunked text
+    """
+    Load the persisted vector database, embedding only the schema chunks that are new or changed.
+    An unchanged schema makes zero embedding calls.
+    """
     schema_chunks = load_database_schema_description()
     if not schema_chunks:
         st.error("No schema chunks found or schema file is empty!")
@@ -101,25 +149,40 @@ def load_or_create_vector_db():
         chunk_size = 100
         schema_chunks = [' '.join(tokens[i:i+chunk_size]) for i in range(0, len(tokens), chunk_size)]
     
-    return generate_vector_index(schema_chunks)
-
-# Add a function to get the raw content for fallback
-def load_database_schema_description_raw():
-    """Load the raw database schema description as a single string."""
-    try:
-        import requests
-        response = requests.get("https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/datasets/dataset_multiple_tables/database_schema_description.doc")
-        response.raise_for_status()
-        return response.text
-    except Exception as e:
-        st.error(f"Error fetching schema from URL: {e}")
-        # Fallback to local file if URL fails
-        try:
-            with open(r"E:\NLP Learning\NLP-Learning\Business Intelligence Chatbot with Langchain\datasets\dataset_multiple_tables\database_schema_description.doc", "r") as file:
-                return file.read()
-        except Exception as e2:
-            st.error(f"Error reading local schema file: {e2}")
-            return ""
+    # Deduplicate the chunks by content hash (keeping their order)
+    chunks_by_hash = {}
+    for chunk in schema_chunks:
+        chunks_by_hash.setdefault(chunk_hash(chunk), chunk)
+    chunk_hashes = list(chunks_by_hash)
+    
+    embed_model = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    manifest = read_index_manifest()
+    
+    # Reuse the persisted index if it was built with the same embedding model
+    if manifest and manifest.get("embedding_model") == EMBEDDING_MODEL:
+        stored_hashes = set(manifest.get("chunk_hashes", []))
+        if stored_hashes == set(chunk_hashes):
+            return load_vector_index(embed_model, mmap=True)
+        
+        if stored_hashes & set(chunk_hashes):
+            # Update the index in place: drop removed chunks and embed only the new ones
+            vector_db = load_vector_index(embed_model, mmap=False)
+            indexed_hashes = set(vector_db.index_to_docstore_id.values())
+            removed = [h for h in indexed_hashes if h not in chunks_by_hash]
+            if removed:
+                vector_db.delete(ids=removed)
+            added = [h for h in chunk_hashes if h not in indexed_hashes]
+            if added:
+                vector_db.add_texts([chunks_by_hash[h] for h in added], ids=added)
+            st.info(f"Updated vector index: {len(added)} chunks embedded, {len(removed)} removed.")
+            save_vector_index(vector_db, chunk_hashes)
+            return vector_db
+    
+    # Build the index from scratch (first run, or the embedding model changed)
+    st.info("Creating vector index for the database schema...")
+    vector_db = FAISS.from_texts([chunks_by_hash[h] for h in chunk_hashes], embedding=embed_model, ids=chunk_hashes)
+    save_vector_index(vector_db, chunk_hashes)
+    return vector_db
 
 # Load vector database once at startup
 vector_db = load_or_create_vector_db()
@@ -162,37 +225,41 @@ def get_model_response(prompt, model_choice, history=None):
         st.error(f"Error with model API: {e}")
         return None
     
-def connect_to_database():
-    """Connect to the database using credentials from Streamlit session state."""
-    try:
-        connection = psycopg2.connect(
-            host=st.session_state["Host"],
-            database=st.session_state["Database"],
-            user=st.session_state["User"],
-            password=st.session_state["Password"]
-        )
-        st.success(f"Connected to the database {st.session_state['Database']} successfully!")
-        return connection
-    except Exception as e:
-        st.error(f"Error with database connection: {e}")
-        return None
-    
-def read_sql_query(query):
-    """Execute an SQL query and return the result."""
-    connection = connect_to_database()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            return rows
-        except Exception as e:
-            st.error(f"Error executing query: {e}")
-            return None
-        finally:
-            cursor.close()
-            connection.close()
-    return None
+# Define the query cache (shared by every session of the app process)
+@st.cache_resource(show_spinner=False)
+def get_query_cache():
+    """Create the cache of generated SQL, query results and answers."""
+    return QueryCache(
+        max_entries=QUERY_CACHE_MAX_ENTRIES,
+        version_ttl=TABLE_VERSION_TTL,
+        semantic_threshold=SEMANTIC_CACHE_THRESHOLD
+    )
+
+def fetch_table_versions():
+    """Read the (schema version, data version) stamps of the database tables."""
+    pool = connect_to_database()
+    if pool is None:
+        raise ConnectionError("No database connection")
+    with pooled_connection(pool) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(TABLE_VERSION_QUERY)
+            return cursor.fetchone()
+
+def get_table_versions():
+    """Get the table version stamps of the database in session state (checked at most every TABLE_VERSION_TTL seconds)."""
+    database_key = f"{st.session_state['Host']}:{st.session_state['Port']}/{st.session_state['Database']}"
+    return get_query_cache().table_versions(database_key, fetch_table_versions)
+
+def show_query_cache_stats(container):
+    """Show the hit rate of every cache layer."""
+    hit_rates = get_query_cache().hit_rates()
+    with container.container():
+        st.subheader("Query Cache")
+        columns = st.columns(2)
+        for i, (layer, rate) in enumerate(hit_rates.items()):
+            columns[i % 2].metric(f"{layer.title()} hit rate", "-" if rate is None else f"{rate:.0%}")
+        st.caption(f"Cached results can be up to {TABLE_VERSION_TTL:.0f}s older than the tables: "
+                   "the table versions are only checked that often.")
 
 def clear_chat_history():
     """Clear the chat history from session state."""
@@ -247,8 +314,10 @@ SQL_GENERATION_SYSTEM_PROMPT = """
 """
 
 # Define functions for RAG
-def retrieve_schema(user_query):
-    """Retrieve relevant schema details from vector store."""
+def retrieve_schema(user_query, query_embedding=None):
+    """Retrieve relevant schema details from vector store (reusing the question embedding if it is already computed)."""
+    if query_embedding is not None:
+        return vector_db.similarity_search_by_vector(query_embedding, k=5)
     return vector_db.similarity_search(user_query, k=5)
 
 def generate_sql_query(question, retrieved_schema, model_choice, history=None):
@@ -296,6 +365,12 @@ def main():
         if st.button("Clear Chat History"):
             clear_chat_history()
             st.success("Chat history cleared!")
+        if st.button("Clear Query Cache"):
+            get_query_cache().clear()
+            st.success("Query cache cleared!")
+
+        # Query cache statistics (filled in after the question is processed)
+        cache_stats = st.empty()
 
     # Display chat history
     for message in st.session_state.chat_history:
@@ -317,40 +392,73 @@ def main():
         with st.spinner("Processing your query..."):
             # Extract conversation history for context (excluding the current question)
             model_history = st.session_state.chat_history[:-1] if len(st.session_state.chat_history) > 1 else None
-            
-            schema_docs = retrieve_schema(question)
-            retrieved_schema = "\n".join([doc.page_content for doc in schema_docs])
-            
-            # Display retrieved schema in a more formatted way
-            if show_query:
-                st.subheader("Retrieved Schema Details")
-                with st.expander("View Retrieved Schema Information", expanded=True):
-                    for i, doc in enumerate(schema_docs):
-                        st.markdown(f"### Document {i+1}")
-                        st.text(doc.page_content)
-                        st.markdown("---")
-
-            # Get SQL query using the selected model
-            sql_query = generate_sql_query(question, retrieved_schema, st.session_state.model_choice, model_history)
+
+            # Get the cache keys (the cache is skipped if the table versions cannot be read)
+            query_cache = get_query_cache()
+            schema_version, data_version = get_table_versions()
+            use_cache = data_version is not None
+            context_key = query_cache.context_key(st.session_state.model_choice, schema_version, model_history)
+            question_key = query_cache.question_key(context_key, question)
+
+            # Look up the SQL of the question (exact match first, then semantic match if enabled)
+            sql_query = query_cache.get_sql(question_key) if use_cache else None
+            question_embedding = None
+            if use_cache and sql_query is None and query_cache.semantic_threshold is not None:
+                question_embedding = vector_db.embeddings.embed_query(question)
+                matched_key = query_cache.match_question(context_key, question_embedding)
+                if matched_key:
+                    sql_query = query_cache.get_sql(matched_key, count=False)
+                    question_key = matched_key
+
+            if sql_query:
+                st.caption("SQL query served from the cache")
+            else:
+                schema_docs = retrieve_schema(question, question_embedding)
+                retrieved_schema = "\n".join([doc.page_content for doc in schema_docs])
+
+                # Display retrieved schema in a more formatted way
+                if show_query:
+                    st.subheader("Retrieved Schema Details")
+                    with st.expander("View Retrieved Schema Information", expanded=True):
+                        for i, doc in enumerate(schema_docs):
+                            st.markdown(f"### Document {i+1}")
+                            st.text(doc.page_content)
+                            st.markdown("---")
+
+                # Get SQL query using the selected model
+                sql_query = generate_sql_query(question, retrieved_schema, st.session_state.model_choice, model_history)
+                if sql_query and use_cache:
+                    query_cache.put_sql(question_key, sql_query)
+                    if question_embedding is not None:
+                        query_cache.add_question_embedding(context_key, question_key, question_embedding)
+
             if sql_query:
                 if show_query:
                     st.subheader("Generated SQL Query:")
                     st.code(sql_query, language="sql")
 
-                # Execute the SQL query
-                result = read_sql_query(sql_query)
+                # Execute the SQL query (unless its result for the current data version is cached)
+                result = query_cache.get_result(sql_query, data_version) if use_cache else None
+                if result is None:
+                    result = read_sql_query(sql_query)
+                    if result is not None and use_cache:
+                        query_cache.put_result(sql_query, data_version, result)
                 if result:
                     if show_query:
                         st.subheader("Query Results:")
                         for row in result:
                             st.write(row)
 
-                    # Generate humane response using the selected model
-                    humane_response = get_model_response(
-                        RESPONSE_GENERATION_SYSTEM_PROMPT.format(question=question, result=result), 
-                        st.session_state.model_choice,
-                        model_history
-                    )
+                    # Generate humane response using the selected model (unless it is cached)
+                    humane_response = query_cache.get_answer(question_key, sql_query, data_version) if use_cache else None
+                    if humane_response is None:
+                        humane_response = get_model_response(
+                            RESPONSE_GENERATION_SYSTEM_PROMPT.format(question=question, result=result), 
+                            st.session_state.model_choice,
+                            model_history
+                        )
+                        if humane_response and use_cache:
+                            query_cache.put_answer(question_key, sql_query, data_version, humane_response)
                     
                     # Display assistant response
                     st.chat_message("assistant").write(humane_response)
@@ -370,6 +478,8 @@ def main():
                 # Add error message to chat history as assistant response
                 st.session_state.chat_history.append({"role": "assistant", "content": error_message})
 
+    show_query_cache_stats(cache_stats)
+
     # Footer
     st.markdown(
         """
@@ -1,15 +1,20 @@
 import os
 import streamlit as st
-import psycopg2
 from openai import OpenAI
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from database import connect_to_database, pooled_connection, read_sql_query
+from query_cache import QueryCache, TABLE_VERSION_QUERY
 
 # Configure APIs
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 
+# Query cache settings (entries per layer and seconds a table version stamp is trusted)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+TABLE_VERSION_TTL = float(os.getenv("TABLE_VERSION_TTL", "30"))
+
 # Utility Functions
 def configure_streamlit():
     """Configure the Streamlit app settings."""
@@ -83,37 +88,40 @@ def get_model_response(question, prompt, model_choice, history=None):
         st.error(f"Error with model API: {e}")
         return None
     
-def connect_to_database():
-    """Connect to the database using credentials from Streamlit session state."""
-    try:
-        connection = psycopg2.connect(
-            host=st.session_state["Host"],
-            database=st.session_state["Database"],
-            user=st.session_state["User"],
-            password=st.session_state["Password"]
-        )
-        st.success(f"Connected to the database {st.session_state['Database']} successfully!")
-        return connection
-    except Exception as e:
-        st.error(f"Error with database connection: {e}")
-        return None
-    
-def read_sql_query(query):
-    """Execute an SQL query and return the result."""
-    connection = connect_to_database()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            return rows
-        except Exception as e:
-            st.error(f"Error executing query: {e}")
-            return None
-        finally:
-            cursor.close()
-            connection.close()
-    return None
+# Define the query cache (shared by every session of the app process)
+@st.cache_resource(show_spinner=False)
+def get_query_cache():
+    """Create the cache of generated SQL, query results and answers."""
+    return QueryCache(
+        max_entries=QUERY_CACHE_MAX_ENTRIES,
+        version_ttl=TABLE_VERSION_TTL
+    )
+
+def fetch_table_versions():
+    """Read the (schema version, data version) stamps of the database tables."""
+    pool = connect_to_database()
+    if pool is None:
+        raise ConnectionError("No database connection")
+    with pooled_connection(pool) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(TABLE_VERSION_QUERY)
+            return cursor.fetchone()
+
+def get_table_versions():
+    """Get the table version stamps of the database in session state (checked at most every TABLE_VERSION_TTL seconds)."""
+    database_key = f"{st.session_state['Host']}:{st.session_state['Port']}/{st.session_state['Database']}"
+    return get_query_cache().table_versions(database_key, fetch_table_versions)
+
+def show_query_cache_stats(container):
+    """Show the hit rate of every cache layer."""
+    hit_rates = get_query_cache().hit_rates()
+    with container.container():
+        st.subheader("Query Cache")
+        columns = st.columns(2)
+        for i, (layer, rate) in enumerate(hit_rates.items()):
+            columns[i % 2].metric(f"{layer.title()} hit rate", "-" if rate is None else f"{rate:.0%}")
+        st.caption(f"Cached results can be up to {TABLE_VERSION_TTL:.0f}s older than the tables: "
+                   "the table versions are only checked that often.")
 
 def load_database_schema_description():
     """Load the database schema description from the file."""
@@ -209,6 +217,12 @@ def main():
         if st.button("Clear Chat History"):
             clear_chat_history()
             st.success("Chat history cleared!")
+        if st.button("Clear Query Cache"):
+            get_query_cache().clear()
+            st.success("Query cache cleared!")
+
+        # Query cache statistics (filled in after the question is processed)
+        cache_stats = st.empty()
 
     # Display chat history
     for message in st.session_state.chat_history:
@@ -231,34 +245,56 @@ def main():
             # Extract conversation history for context (excluding the current question)
             model_history = st.session_state.chat_history[:-1] if len(st.session_state.chat_history) > 1 else None
 
-            # Get SQL query from LLM
-            sql_query = get_model_response(
-                question, 
-                SQL_GENERATION_SYSTEM_PROMPT.format(database_schema_description=load_database_schema_description()), 
-                st.session_state.model_choice,
-                model_history
+            # Get the cache keys (the cache is skipped if the table versions cannot be read)
+            query_cache = get_query_cache()
+            schema_version, data_version = get_table_versions()
+            use_cache = data_version is not None
+            question_key = query_cache.question_key(
+                query_cache.context_key(st.session_state.model_choice, schema_version, model_history), question
             )
+
+            # Get SQL query from the cache or the LLM
+            sql_query = query_cache.get_sql(question_key) if use_cache else None
+            if sql_query:
+                st.caption("SQL query served from the cache")
+            else:
+                sql_query = get_model_response(
+                    question, 
+                    SQL_GENERATION_SYSTEM_PROMPT.format(database_schema_description=load_database_schema_description()), 
+                    st.session_state.model_choice,
+                    model_history
+                )
+                if sql_query and use_cache:
+                    query_cache.put_sql(question_key, sql_query)
             
             if sql_query:
                 if show_query:
                     st.subheader("Generated SQL Query:")
                     st.code(sql_query, language="sql")
 
-                # Execute the SQL query
-                result = read_sql_query(sql_query)
+                # Execute the SQL query (unless its result for the current data version is cached)
+                result = query_cache.get_result(sql_query, data_version) if use_cache else None
+                if result is None:
+                    result = read_sql_query(sql_query)
+                    if result is not None and use_cache:
+                        query_cache.put_result(sql_query, data_version, result)
                 if result:
                     if show_query:
                         st.subheader("Query Results:")
                         for row in result:
                             st.write(row)
 
-                    # Generate humane response
-                    humane_response = get_model_response(
-                        question, 
-                        RESPONSE_GENERATION_SYSTEM_PROMPT.format(question=question, result=result),
-                        st.session_state.model_choice,
-                        model_history
-                    )
+                    # Generate humane response (unless it is cached)
+                    humane_response = query_cache.get_answer(question_key, sql_query, data_version) if use_cache else None
+                    if humane_response is None:
+                        humane_response = get_model_response(
+                            question, 
+                            RESPONSE_GENERATION_SYSTEM_PROMPT.format(question=question, result=result),
+                            st.session_state.model_choice,
+                            model_history
+                        )
+                        if humane_response and use_cache:
+                            query_cache.put_answer(question_key, sql_query, data_version, humane_response)
                     
                     # Display assistant response
                     st.chat_message("assistant").write(humane_response)
@@ -278,6 +314,8 @@ def main():
                 # Add error message to chat history as assistant response
                 st.session_state.chat_history.append({"role": "assistant", "content": error_message})
 
+    show_query_cache_stats(cache_stats)
+
     # Footer
     st.markdown(
         """
@@ -0,0 +1,145 @@
+"""
+Database access for the database chat apps (shared by the apps with and without RAG).
+
+- One connection pool per set of credentials, shared by every session of the app process,
+  that waits for a free connection instead of failing when all are in use
+- Every query runs in its own transaction with a statement timeout, and a broken pooled
+  connection is replaced transparently
+- SELECT results are streamed from a server-side cursor, keeping at most MAX_RESULT_ROWS rows
+"""
+import os
+import uuid
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+import streamlit as st
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from dotenv import load_dotenv
+
+# The settings can come from the .env file of the apps
+load_dotenv()
+
+# Database settings (connection pool size, per-query timeout, rows fetched per round trip and rows kept per result)
+DB_POOL_MIN_CONNECTIONS = int(os.getenv("DB_POOL_MIN_CONNECTIONS", "1"))
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "10"))
+QUERY_TIMEOUT_MS = int(os.getenv("QUERY_TIMEOUT_MS", "30000"))
+FETCH_BATCH_SIZE = 2000
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "1000"))
+
+# Define the database connection pool (shared by every session of the app process)
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """Thread-safe pool that waits for a free connection instead of raising PoolError when all are in use."""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=QUERY_TIMEOUT_MS / 1000):
+            raise PoolError("Timed out waiting for a free database connection")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+@st.cache_resource(show_spinner=False)
+def get_connection_pool(host, port, database, user, password):
+    """Create one connection pool per set of credentials, reused across reruns and sessions."""
+    return BlockingConnectionPool(
+        DB_POOL_MIN_CONNECTIONS,
+        DB_POOL_MAX_CONNECTIONS,
+        host=host,
+        port=port,
+        database=database,
+        user=user,
+        password=password
+    )
+
+def connect_to_database():
+    """Get the connection pool for the credentials in Streamlit session state."""
+    try:
+        return get_connection_pool(
+            st.session_state["Host"],
+            st.session_state["Port"],
+            st.session_state["Database"],
+            st.session_state["User"],
+            st.session_state["Password"]
+        )
+    except Exception as e:
+        st.error(f"Error with database connection: {e}")
+        return None
+
+@contextmanager
+def pooled_connection(pool):
+    """
+    Borrow a healthy connection from the pool and give it back afterwards.
+    The per-query statement timeout doubles as the health check: a connection that
+    cannot run it (e.g. closed by the server) is discarded and another one is tried.
+    """
+    for _ in range(DB_POOL_MAX_CONNECTIONS + 1):
+        connection = pool.getconn()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (QUERY_TIMEOUT_MS,))
+            break
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            pool.putconn(connection, close=True)
+    else:
+        raise psycopg2.OperationalError("No healthy database connection available")
+
+    try:
+        yield connection
+    finally:
+        # End the transaction so the connection goes back to the pool clean
+        if not connection.closed:
+            connection.rollback()
+        pool.putconn(connection, close=bool(connection.closed))
+
+def iter_sql_query(connection, query, batch_size=FETCH_BATCH_SIZE):
+    """Stream the rows of a query in batches, using a server-side cursor for SELECT statements."""
+    query = query.strip().rstrip(";")
+    streamable = query.split(None, 1)[0].lower() in ("select", "with", "values", "table") if query else False
+    cursor = connection.cursor(name=f"bi_chatbot_{uuid.uuid4().hex}") if streamable else connection.cursor()
+    try:
+        cursor.execute(query)
+        if not streamable and cursor.description is None: # Statement without a result set
+            return
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        try:
+            cursor.close()
+        except psycopg2.Error:
+            pass # The transaction already failed, the rollback releases the cursor
+
+def read_sql_query(query, max_rows=MAX_RESULT_ROWS):
+    """Execute an SQL query and return (at most `max_rows` of) the result."""
+    pool = connect_to_database()
+    if pool:
+        try:
+            with pooled_connection(pool) as connection:
+                rows = iter_sql_query(connection, query, batch_size=min(FETCH_BATCH_SIZE, max_rows + 1))
+                try:
+                    result = list(islice(rows, max_rows + 1))
+                finally:
+                    rows.close() # Close the cursor without fetching the remaining rows
+            if len(result) > max_rows:
+                st.warning(f"The query returned more than {max_rows} rows, only the first {max_rows} are used.")
+                result = result[:max_rows]
+            return result
+        except Exception as e:
+            st.error(f"Error executing query: {e}")
+            return None
+    return None
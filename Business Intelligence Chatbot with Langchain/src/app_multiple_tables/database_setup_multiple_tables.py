@@ -1,93 +1,262 @@
 # Script to create a database and multiple tables in PostgreSQL
-import pandas as pd
-import psycopg2
+#
+# Usage:
+#   python database_setup_multiple_tables.py                      # Bulk load into PostgreSQL (COPY FROM STDIN)
+#   python database_setup_multiple_tables.py --method values      # Bulk load with execute_values instead of COPY
+#   python database_setup_multiple_tables.py --method row         # Original row-by-row inserts (for comparison)
+#   python database_setup_multiple_tables.py --sqlite olist.db    # Load into a local SQLite stand-in
+import argparse
+import io
 import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Step 1: Load the CSV files
-customers      = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/customers_dataset.csv')
-geolocation    = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/geolocation_dataset.csv')
-order_items    = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/order_items_dataset.csv')
-order_payments = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/order_payments_dataset.csv')
-order_reviews  = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/order_reviews_dataset.csv')
-orders         = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/orders_dataset.csv')
-products       = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/product_dataset.csv', index_col=0)
-sellers        = pd.read_csv('https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables/sellers_dataset.csv')
-
-# Replace NaN values with None (PostgreSQL's NULL)
-all_df = [customers, geolocation, order_items, order_payments, order_reviews, orders, products, sellers]
-
-for i, df in enumerate(all_df):
-    all_df[i] = df.where(pd.notnull(df), None)
-
-# Step 2: Connect to PostgreSQL
-try:
-    conn = psycopg2.connect(
+# Step 1: Define the CSV sources of each table (extra read_csv arguments per table)
+DATA_URL = "https://raw.githubusercontent.com/mcikalmerdeka/NLP-Learning/main/Business%20Intelligence%20Chatbot%20with%20Langchain/dataset_multiple_tables"
+TABLE_FILES = {
+    "customers": ("customers_dataset.csv", {}),
+    "geolocation": ("geolocation_dataset.csv", {}),
+    "order_items": ("order_items_dataset.csv", {}),
+    "order_payments": ("order_payments_dataset.csv", {}),
+    "order_reviews": ("order_reviews_dataset.csv", {}),
+    "orders": ("orders_dataset.csv", {}),
+    "products": ("product_dataset.csv", {"index_col": 0}),
+    "sellers": ("sellers_dataset.csv", {}),
+}
+
+def load_dataframes(data_dir=None, tables=None):
+    """Load the CSV files from GitHub, or from a local directory if given."""
+    dataframes = {}
+    for table, (filename, read_kwargs) in TABLE_FILES.items():
+        if tables and table not in tables:
+            continue
+        source = os.path.join(data_dir, filename) if data_dir else f"{DATA_URL}/{filename}"
+        dataframes[table] = pd.read_csv(source, **read_kwargs)
+    return dataframes
+
+# Step 2: Define the connections (one per worker, so tables can be loaded in parallel)
+def connect_postgres():
+    import psycopg2
+    return psycopg2.connect(
         host="localhost",
         database=os.getenv("DB_NAME_2"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD")
     )
-    cursor = conn.cursor()
-    print("Connected to PostgreSQL successfully!")
-except psycopg2.Error as e:
-    print(f"Error connecting to PostgreSQL: {e}")
-    exit()
-
-# Step 3: Define a function to map Pandas dtypes to PostgreSQL types
-def map_dtype_to_sql(dtype):
-    if pd.api.types.is_integer_dtype(dtype):
-        return "INT"
-    elif pd.api.types.is_float_dtype(dtype):
-        return "FLOAT"
-    elif pd.api.types.is_bool_dtype(dtype):
+
+def connect_sqlite(path):
+    # Writers wait for each other instead of failing with "database is locked"
+    return sqlite3.connect(path, timeout=600)
+
+# Step 3: Define a function to infer PostgreSQL types from the column values
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+DATETIME_NAME_HINTS = ("date", "timestamp", "_at")
+
+def infer_sql_type(series):
+    """
+    Infer the SQL type of a column from its values, not just its dtype:
+    - integer columns use INTEGER or BIGINT depending on their range
+    - float columns that only hold whole numbers (ints with missing values) become integers
+    - text columns named like dates are stored as TIMESTAMP when every value parses
+    - other text columns use TEXT, which has no length limit (VARCHAR(255) truncated long reviews)
+    """
+    values = series.dropna()
+    if pd.api.types.is_bool_dtype(series):
         return "BOOLEAN"
-    elif pd.api.types.is_datetime64_any_dtype(dtype):
+    if pd.api.types.is_datetime64_any_dtype(series):
         return "TIMESTAMP"
+    if pd.api.types.is_integer_dtype(series) or (
+        pd.api.types.is_float_dtype(series) and len(values) and (values % 1 == 0).all()
+    ):
+        if len(values) and (values.min() < INT32_MIN or values.max() > INT32_MAX):
+            return "BIGINT"
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        return "DOUBLE PRECISION"
+    if len(values) and any(hint in series.name.lower() for hint in DATETIME_NAME_HINTS):
+        parsed = pd.to_datetime(values, errors="coerce")
+        if parsed.notna().all():
+            return "TIMESTAMP"
+    return "TEXT"
+
+def prepare_dataframe(df):
+    """Infer the column types and convert the values so they load cleanly into those types."""
+    column_types = {col: infer_sql_type(df[col]) for col in df.columns}
+    df = df.copy()
+    for col, sql_type in column_types.items():
+        if sql_type in ("INTEGER", "BIGINT"):
+            df[col] = df[col].astype("Int64") # Whole-number floats would be written as "5.0"
+        elif sql_type == "TIMESTAMP":
+            df[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
+    return df, column_types
+
+# Step 4: Define the loaders
+def _rows(chunk):
+    # Python values with NULLs as None (the drivers cannot bind numpy scalars or pandas NA)
+    return list(chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None))
+
+def _insert_rows(connection, cursor, table, chunk, placeholder):
+    """Insert a chunk one row at a time, skipping (and counting) the rows that fail."""
+    insert_query = f"INSERT INTO {table} VALUES ({', '.join([placeholder] * len(chunk.columns))})"
+    failed = 0
+    for row in _rows(chunk):
+        try:
+            cursor.execute(insert_query, row)
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            failed += 1
+            if failed <= 3:
+                print(f"Error inserting row into `{table}`: {e}")
+    return failed
+
+def _load_chunk(connection, cursor, table, chunk, method, placeholder):
+    """Load one chunk in a single statement; fall back to row inserts if it fails."""
+    try:
+        if method == "copy":
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, header=False, index=False)
+            buffer.seek(0)
+            columns = ", ".join(chunk.columns)
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        elif method == "values":
+            from psycopg2.extras import execute_values
+            execute_values(cursor, f"INSERT INTO {table} VALUES %s", _rows(chunk), page_size=len(chunk))
+        else:
+            cursor.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join([placeholder] * len(chunk.columns))})", _rows(chunk)
+            )
+        connection.commit()
+        return 0
+    except Exception as e:
+        # Only this chunk is rolled back, then its good rows are kept
+        connection.rollback()
+        print(f"Bulk load of a `{table}` chunk failed ({e}), retrying row by row...")
+        return _insert_rows(connection, cursor, table, chunk, placeholder)
+
+def load_table(connect, table, df, method="copy", chunk_size=50_000, replace=False, placeholder="%s"):
+    """
+    Create a table and stream the DataFrame into it in chunks, then build its indexes.
+
+    Args:
+        connect: Function returning a new database connection
+        table: Table name
+        df: DataFrame with the table data
+        method: 'copy' (COPY FROM STDIN), 'values' (execute_values), 'many' (executemany) or 'row'
+        chunk_size: Number of rows per chunk
+        replace: Drop the table first instead of appending to it
+        placeholder: Parameter placeholder of the driver ('%s' for psycopg2, '?' for sqlite3)
+
+    Returns:
+        Dictionary with the rows loaded, failed rows and timings of the table
+    """
+    start_time = time.perf_counter()
+    df, column_types = prepare_dataframe(df)
+    connection = connect()
+    cursor = connection.cursor()
+    try:
+        # Create the table
+        if replace:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        schema = ", ".join(f"{col} {sql_type}" for col, sql_type in column_types.items())
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({schema});")
+        connection.commit()
+
+        # Insert the data chunk by chunk
+        failed = 0
+        for offset in range(0, len(df), chunk_size):
+            chunk = df.iloc[offset:offset + chunk_size]
+            if method == "row":
+                failed += _insert_rows(connection, cursor, table, chunk, placeholder)
+            else:
+                failed += _load_chunk(connection, cursor, table, chunk, method, placeholder)
+        load_seconds = time.perf_counter() - start_time
+
+        # Build the indexes after the load, it is much cheaper than maintaining them row by row
+        for col in df.columns:
+            if col.endswith("_id") or col.endswith("_zip_code_prefix"):
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table} ({col})")
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+    loaded = len(df) - failed
+    return {
+        "table": table,
+        "rows": loaded,
+        "failed": failed,
+        "load_seconds": load_seconds,
+        "total_seconds": time.perf_counter() - start_time,
+        "rows_per_second": loaded / load_seconds if load_seconds else float("inf"),
+    }
+
+def load_all(connect, dataframes, workers=4, **load_kwargs):
+    """Load every table in parallel, each worker using its own connection."""
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(load_table, connect, table, df, **load_kwargs): table
+            for table, df in dataframes.items()
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error loading table `{futures[future]}`: {e}")
+                continue
+            print(
+                f"Table `{result['table']}`: {result['rows']:,} rows in {result['load_seconds']:.2f}s "
+                f"({result['rows_per_second']:,.0f} rows/sec, {result['failed']} failed, "
+                f"{result['total_seconds']:.2f}s with indexes)"
+            )
+            results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the Olist CSV files into PostgreSQL (or SQLite)")
+    parser.add_argument("--method", choices=["copy", "values", "row"], default="copy", help="Loading method for PostgreSQL")
+    parser.add_argument("--sqlite", metavar="PATH", help="Load into this SQLite database instead of PostgreSQL")
+    parser.add_argument("--data-dir", help="Read the CSV files from this directory instead of GitHub")
+    parser.add_argument("--tables", nargs="*", help="Only load these tables")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=4, help="Tables loaded in parallel")
+    parser.add_argument("--replace", action="store_true", help="Drop existing tables before loading")
+    args = parser.parse_args()
+
+    dataframes = load_dataframes(args.data_dir, args.tables)
+
+    if args.sqlite:
+        connect = lambda: connect_sqlite(args.sqlite)
+        method = "row" if args.method == "row" else "many" # SQLite has no COPY
+        placeholder = "?"
     else:
-        return "VARCHAR(255)" # Default to VARCHAR for object/string types
-    
-# Step 4: Generate the SQL schema from the DataFrame
-table_name = ["customers", "geolocation", "order_items", "order_payments", "order_reviews", "orders", "products", "sellers"]
-
-# Create a dictionary to store schemas for each table
-schemas = {}
-
-for df, table in zip(all_df, table_name):
-    schemas[table] = ", ".join([
-        f"{col} {map_dtype_to_sql(dtype)}"
-        for col, dtype in zip(df.columns, df.dtypes)
-    ])
-
-# Note: the output will look something like this (postgres style):
-# id INT, price FLOAT, is_active BOOLEAN, created_at TIMESTAMP, description VARCHAR(255)
-
-# Step 5: Create the table
-for table in table_name:
-    create_table_query = f"CREATE TABLE IF NOT EXISTS {table} ({schemas[table]});"
+        connect = connect_postgres
+        method = args.method
+        placeholder = "%s"
+
+    # Check the connection before starting the workers
     try:
-        cursor.execute(create_table_query)
-        conn.commit()
-        print(f"Table `{table}` created successfully!")
-    except psycopg2.Error as e:
-        conn.rollback()
-        print(f"Error creating table: {e}")
-
-# Step 6: Insert the data into the table
-for df, table in zip(all_df, table_name):
-    for _, row in df.iterrows():
-        placeholders = ", ".join(["%s"] * len(row))
-        insert_query = f"INSERT INTO {table} VALUES ({placeholders})" # Insert the data per row
-        try:
-            cursor.execute(insert_query, tuple(row))
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Error inserting row: {e}")
-
-# Commit the changes and close the connection
-conn.commit()
-cursor.close()
-conn.close()
-print("Data inserted successfully!")
\ No newline at end of file
+        connect().close()
+        print("Connected to the database successfully!")
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        exit()
+
+    start_time = time.perf_counter()
+    results = load_all(
+        connect, dataframes, workers=args.workers,
+        method=method, chunk_size=args.chunk_size, replace=args.replace, placeholder=placeholder,
+    )
+    total_rows = sum(result["rows"] for result in results)
+    elapsed = time.perf_counter() - start_time
+    print(f"Data inserted successfully! {total_rows:,} rows in {elapsed:.2f}s ({total_rows / elapsed:,.0f} rows/sec overall)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Layered cache for the database chat apps (shared by the apps with and without RAG).
+
+- SQL layer: normalized question (+ model, chat history, schema version) -> generated SQL
+- Result layer: SQL text + data version -> result rows
+- Answer layer: question key + SQL text + data version -> final answer
+
+The schema and data versions are stamps read from the database, so a change to the
+tables makes the old entries unreachable. The stamps are only read again every
+`version_ttl` seconds (TABLE_VERSION_TTL in the apps), so a cached result can be up to
+that old, plus the second or so PostgreSQL takes to publish the table statistics.
+Optionally, questions can also be matched semantically by comparing their embeddings.
+"""
+import re
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Query returning the (schema version, data version) stamps of the database: a hash of the
+# columns of every table, and a hash of the row counters of every table of this database
+# (rows inserted, updated, deleted and live, so a TRUNCATE counts too). Writes to other
+# databases of the server leave the stamps unchanged.
+TABLE_VERSION_QUERY = """
+    SELECT
+        (SELECT md5(coalesce(string_agg(table_name || '.' || column_name || ':' || data_type, ',' ORDER BY table_name, ordinal_position), ''))
+         FROM information_schema.columns
+         WHERE table_schema NOT IN ('pg_catalog', 'information_schema')),
+        (SELECT md5(coalesce(string_agg(relid || ':' || n_tup_ins || ':' || n_tup_upd || ':' || n_tup_del || ':' || n_live_tup, ',' ORDER BY relid), ''))
+         FROM pg_stat_user_tables)
+"""
+
+def normalize_question(question):
+    """Lowercase the question, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+def is_cacheable_sql(sql_query):
+    """Only the results of read queries are cached."""
+    words = sql_query.split(None, 1)
+    return bool(words) and words[0].lower() in ("select", "with")
+
+def _digest(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+class QueryCache:
+    """
+    Process-wide cache of generated SQL, query results and answers.
+    Every layer is an LRU dictionary with its own hit/miss counters.
+    """
+
+    LAYERS = ("sql", "result", "answer")
+
+    def __init__(self, max_entries=512, version_ttl=30, semantic_threshold=None):
+        """
+        Args:
+            max_entries: Maximum number of entries per layer
+            version_ttl: Seconds a table version stamp is trusted before asking the database again
+            semantic_threshold: Minimum cosine similarity for a semantic question match (None to disable)
+        """
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.semantic_threshold = semantic_threshold
+        self._layers = {layer: OrderedDict() for layer in self.LAYERS}
+        self.stats = {layer: {"hits": 0, "misses": 0} for layer in self.LAYERS}
+        self.stats["semantic"] = {"hits": 0, "misses": 0}
+        self._versions = {} # Database key -> (checked_at, schema_version, data_version)
+        self._embeddings = np.zeros((0, 0), dtype=np.float32) # Normalized question embeddings
+        self._embedding_keys = [] # (context key, question key) of every embedding row
+        self._lock = threading.Lock()
+
+    # Version stamps
+    def table_versions(self, database_key, fetch_versions):
+        """
+        Get the (schema version, data version) stamps of a database, calling `fetch_versions()`
+        at most every `version_ttl` seconds: writes to the tables are noticed up to that late.
+        The stamps are prefixed with `database_key` so entries of different databases never collide.
+        Returns (None, None) if the stamps cannot be fetched, which disables the cache.
+        """
+        with self._lock:
+            versions = self._versions.get(database_key)
+            if versions and time.monotonic() - versions[0] < self.version_ttl:
+                return versions[1:]
+        try:
+            schema_version, data_version = fetch_versions()
+        except Exception:
+            return None, None
+        versions = (time.monotonic(), f"{database_key}:{schema_version}", f"{database_key}:{data_version}")
+        with self._lock:
+            self._versions[database_key] = versions
+        return versions[1:]
+
+    # Keys
+    @staticmethod
+    def context_key(model_choice, schema_version, history=None):
+        """Key of everything besides the question that the generated SQL depends on."""
+        user_turns = [msg["content"] for msg in history or [] if msg["role"] == "user"]
+        return _digest(model_choice, schema_version or "", *[normalize_question(turn) for turn in user_turns])
+
+    @staticmethod
+    def question_key(context_key, question):
+        return _digest(context_key, normalize_question(question))
+
+    # Layers
+    def _get(self, layer, key, count=True):
+        with self._lock:
+            entries = self._layers[layer]
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            if count:
+                self.stats[layer]["hits" if value is not None else "misses"] += 1
+            return value
+
+    def _put(self, layer, key, value):
+        with self._lock:
+            entries = self._layers[layer]
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def get_sql(self, question_key, count=True):
+        return self._get("sql", question_key, count)
+
+    def put_sql(self, question_key, sql_query):
+        self._put("sql", question_key, sql_query)
+
+    def get_result(self, sql_query, data_version):
+        if not is_cacheable_sql(sql_query):
+            return None
+        return self._get("result", _digest(sql_query.strip(), data_version))
+
+    def put_result(self, sql_query, data_version, rows):
+        if is_cacheable_sql(sql_query):
+            self._put("result", _digest(sql_query.strip(), data_version), rows)
+
+    def get_answer(self, question_key, sql_query, data_version):
+        return self._get("answer", _digest(question_key, sql_query.strip(), data_version))
+
+    def put_answer(self, question_key, sql_query, data_version, answer):
+        self._put("answer", _digest(question_key, sql_query.strip(), data_version), answer)
+
+    # Semantic matching
+    def match_question(self, context_key, embedding):
+        """Find the cached question (in the same context) most similar to `embedding`, returns its question key or None."""
+        if self.semantic_threshold is None:
+            return None
+        query = np.array(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            candidates = [i for i, (key, _) in enumerate(self._embedding_keys) if key == context_key]
+            best = None
+            if candidates and self._embeddings.shape[1] == query.shape[0]:
+                similarities = self._embeddings[candidates] @ query
+                top = int(np.argmax(similarities))
+                if similarities[top] >= self.semantic_threshold:
+                    best = self._embedding_keys[candidates[top]][1]
+            self.stats["semantic"]["hits" if best else "misses"] += 1
+            return best
+
+    def add_question_embedding(self, context_key, question_key, embedding):
+        """Remember the embedding of a question whose SQL was just cached."""
+        if self.semantic_threshold is None:
+            return
+        vector = np.array(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            if self._embeddings.shape[1] != vector.shape[0]:
+                self._embeddings = np.zeros((0, vector.shape[0]), dtype=np.float32)
+                self._embedding_keys = []
+            self._embeddings = np.vstack([self._embeddings, vector])[-self.max_entries:]
+            self._embedding_keys = (self._embedding_keys + [(context_key, question_key)])[-self.max_entries:]
+
+    # Reporting
+    def hit_rates(self):
+        """Hit rate of every layer (None for a layer that was never used)."""
+        with self._lock:
+            return {
+                layer: counters["hits"] / (counters["hits"] + counters["misses"]) if counters["hits"] + counters["misses"] else None
+                for layer, counters in self.stats.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            for entries in self._layers.values():
+                entries.clear()
+            self._embeddings = np.zeros((0, 0), dtype=np.float32)
+            self._embedding_keys = []
+            self._versions = {}
@@ -0,0 +1,229 @@
+"""
+CPU benchmark of the RAG retrieval path.
+
+- Retrieval: 100k synthetic document embeddings, searched query by query with the previous
+  approach (sklearn cosine_similarity + full argsort over a list of arrays), with
+  ExactIndex.search one query at a time, and with batched queries. With --indexes, the
+  approximate backends (hnsw, ivfpq) too, with their recall of the exact top-k.
+- Embedding: the retriever model run document by document, as before, against the batched,
+  mask-aware _embed_documents.
+- Saved index: save_index, then load_index read into memory or memory-mapped, and the
+  memory-mapped index opened by several worker processes sharing its pages.
+- Generation: tokens/s of the generator answering questions one by one (as before), batched with
+  left padding, and on one KV cache of a context shared by all the questions, plus the time to
+  the first streamed token.
+
+    python bench_rag.py --documents 100000 --queries 200
+    python bench_rag.py --documents 100000 --queries 200 --indexes hnsw ivfpq
+    python bench_rag.py --embed-documents 2000 --retriever sentence-transformers/all-MiniLM-L6-v2
+    python bench_rag.py --documents 0 --index-documents 1000000
+    python bench_rag.py --documents 0 --generate-queries 16 --generator gpt2
+"""
+import argparse
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import torch
+from sklearn.metrics.pairwise import cosine_similarity
+
+from checking_rag import INDEX_BACKENDS, RAG, ExactIndex, load_index, save_index
+
+
+def synthetic_embeddings(count, dim, rng, topics=200, latent_dim=64):
+    # Like sentence embeddings, points around topics in a space of far fewer dimensions, projected and noised
+    # (approximate indexes are meaningless on isotropic noise, where every point is as far as the others)
+    centers = rng.standard_normal((topics, latent_dim), dtype=np.float32)
+    latent = centers[rng.integers(topics, size=count)] + 0.5 * rng.standard_normal((count, latent_dim), dtype=np.float32)
+    projection = np.random.default_rng(1).standard_normal((latent_dim, dim), dtype=np.float32)
+    return latent @ projection + 0.5 * rng.standard_normal((count, dim), dtype=np.float32)
+
+
+def bench_retrieval(documents, queries, dim, k, backends=()):
+    rng = np.random.default_rng(0)
+    embeddings = synthetic_embeddings(documents + queries, dim, rng)
+    embeddings, query_embeddings = embeddings[:documents], embeddings[documents:]
+
+    embedding_list = list(embeddings)
+    start = time.perf_counter()
+    before = []
+    for query_embedding in query_embeddings:
+        similarities = cosine_similarity([query_embedding], embedding_list)[0]
+        before.append(np.argsort(similarities)[-k:][::-1])
+    before_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = ExactIndex(dim)
+    for batch in range(0, documents, 1000):
+        index.add(embeddings[batch:batch + 1000])
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [index.search(query_embedding[None], k)[0][0] for query_embedding in query_embeddings]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched, _ = index.search(query_embeddings, k)
+    batched_time = time.perf_counter() - start
+
+    assert all(np.array_equal(a, b) for a, b in zip(before, single)), "Different top-k than before"
+    assert np.array_equal(np.array(single), batched)
+    print(f"retrieval: {documents} documents x {dim} dims, {queries} queries, top-{k}, same results")
+    print(f"  index built in {build_time:.2f}s (added in batches of 1000)")
+    print(f"  before (cosine_similarity + argsort): {before_time / queries * 1000:.1f} ms/query")
+    print(f"  matmul + argpartition:                {single_time / queries * 1000:.1f} ms/query "
+          f"({before_time / single_time:.0f}x)")
+    print(f"  retrieve_many (batched):              {batched_time / queries * 1000:.2f} ms/query "
+          f"({before_time / batched_time:.0f}x)")
+
+    for name in backends:
+        start = time.perf_counter()
+        index = INDEX_BACKENDS[name](dim)
+        for batch in range(0, documents, 10_000):
+            index.add(embeddings[batch:batch + 10_000])
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        found, _ = index.search(query_embeddings, k)
+        elapsed = time.perf_counter() - start
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, batched)])
+        print(f"  {name + ' (batched)':<37} {elapsed / queries * 1000:.2f} ms/query, recall@{k} {recall:.3f}, "
+              f"built in {build_time:.1f}s")
+
+
+def bench_embedding(retriever, generator, count, batch_size):
+    words = "alex works as an engineer and likes climbing music travel books coffee dogs space".split()
+    rng = np.random.default_rng(0)
+    documents = [" ".join(rng.choice(words, size=rng.integers(5, 60))) for _ in range(count)]
+    rag = RAG(retriever, generator, batch_size=batch_size)
+
+    start = time.perf_counter()
+    before = []
+    for document in documents:
+        inputs = rag.retriever_tokenizer(document, return_tensors="pt", truncation=True, max_length=512)
+        with torch.no_grad():
+            outputs = rag.retriever_model(**inputs)
+        before.append(outputs.last_hidden_state.mean(dim=1).squeeze().numpy())
+    before_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = rag._embed_documents(documents)
+    batched_time = time.perf_counter() - start
+
+    before = np.array(before)
+    cosine = np.sum(before * batched, axis=1) / (np.linalg.norm(before, axis=1) * np.linalg.norm(batched, axis=1))
+    print(f"embedding: {count} documents, batch size {batch_size}, min cosine to the unbatched embeddings {cosine.min():.6f}")
+    print(f"  before (one document at a time): {count / before_time:.0f} documents/s")
+    print(f"  batched, mask-aware:             {count / batched_time:.0f} documents/s ({before_time / batched_time:.1f}x)")
+
+
+def open_and_search(args):
+    path, mmap, query = args
+    start = time.perf_counter()
+    documents, index = load_index(path, "synthetic", mmap)
+    opened = time.perf_counter() - start
+    indices, _ = index.search(query[None], 5)
+    return opened, time.perf_counter() - start, documents[int(indices[0, 0])]
+
+
+def bench_saved_index(count, dim, workers):
+    rng = np.random.default_rng(0)
+    index = ExactIndex(dim, capacity=count)
+    for batch in range(0, count, 100_000):
+        index.add(rng.standard_normal((min(100_000, count - batch), dim), dtype=np.float32))
+    documents = [f"Document {i}: synthetic text of the saved index benchmark" for i in range(count)]
+    query = index.vectors[count // 2].copy()
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        save_index(path, documents, index, "synthetic")
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+        print(f"saved index: {count} documents x {dim} dims, {size / 2**20:.0f} MiB written in {time.perf_counter() - start:.1f}s")
+        del index, documents
+
+        for mmap in (False, True):
+            opened, searched, document = open_and_search((path, mmap, query))
+            assert document == f"Document {count // 2}: synthetic text of the saved index benchmark"
+            print(f"  {'memory-mapped' if mmap else 'read':>13}: opened in {opened * 1000:.1f} ms, "
+                  f"first search done after {searched * 1000:.0f} ms")
+
+        # Every reading worker would hold its own copy, the mapped ones share the page cache
+        with Pool(workers) as pool:
+            start = time.perf_counter()
+            results = pool.map(open_and_search, [(path, True, query)] * workers)
+            elapsed = time.perf_counter() - start
+        print(f"  {workers} worker processes opened the mapped index and searched it in {elapsed:.2f}s "
+              f"(slowest open {max(result[0] for result in results) * 1000:.1f} ms)")
+
+
+def bench_generation(retriever, generator, count, max_new_tokens, batch_size):
+    rag = RAG(retriever, generator)
+    rag.add_documents([f"Fact {i}: Alex visited city number {i} and liked its food and its museums." for i in range(20)])
+    queries = [f"What did Alex think of city number {i}?" for i in range(count)]
+    tokenizer = rag.generator_tokenizer
+
+    def run(name, generate_all, prompts, baseline=None):
+        start = time.perf_counter()
+        answers = generate_all()
+        elapsed = time.perf_counter() - start
+        tokens = sum(len(tokenizer(a)["input_ids"]) - len(tokenizer(p)["input_ids"]) for a, p in zip(answers, prompts))
+        speedup = f" ({baseline / elapsed:.1f}x)" if baseline else ""
+        print(f"  {name:<36} {tokens / elapsed:7.1f} tokens/s, {elapsed:.2f}s{speedup}")
+        return answers, elapsed
+
+    for name, k, shared in (("own context (top-5)", 5, False), ("shared context (all 20 facts)", 20, True)):
+        contexts = [rag.retrieve(queries[0], k)] * count if shared else rag.retrieve_many(queries, k)
+        prompts = [rag._prompt(query, docs) for query, docs in zip(queries, contexts)]
+        print(f"generation, {name}: {count} questions, {max_new_tokens} new tokens, "
+              f"~{len(tokenizer(prompts[0])['input_ids'])} prompt tokens")
+        before, before_time = run("one by one", lambda: [rag.generate(q, c, max_new_tokens) for q, c in zip(queries, contexts)], prompts)
+        batched, _ = run(f"generate_many (batch {batch_size})",
+                         lambda: rag.generate_many(queries, contexts, max_new_tokens, batch_size), prompts, before_time)
+        assert batched == before, "Batched generation changed the answers"
+        if shared:
+            cached, _ = run("generate_many (shared KV cache)",
+                            lambda: rag.generate_many(queries, contexts, max_new_tokens, reuse_context_cache=True),
+                            prompts, before_time)
+            assert cached == before, "The context cache changed the answers"
+
+    start = time.perf_counter()
+    stream = rag.generate_stream(queries[0], rag.retrieve(queries[0], 5), max_new_tokens)
+    next(stream)
+    print(f"  streaming: first text after {(time.perf_counter() - start) * 1000:.0f} ms")
+    for _ in stream:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding size (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--indexes", nargs="*", default=[], choices=["hnsw", "ivfpq"],
+                        help="Approximate index backends also searched")
+    parser.add_argument("--embed-documents", type=int, default=0, help="Documents embedded with the retriever model (0 to skip)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--retriever", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--generator", default="gpt2")
+    parser.add_argument("--index-documents", type=int, default=0, help="Documents of the saved index benchmark (0 to skip)")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes opening the saved index")
+    parser.add_argument("--generate-queries", type=int, default=0, help="Questions answered by the generator (0 to skip)")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--generate-batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.documents:
+        bench_retrieval(args.documents, args.queries, args.dim, args.k, args.indexes)
+    if args.embed_documents:
+        bench_embedding(args.retriever, args.generator, args.embed_documents, args.batch_size)
+    if args.index_documents:
+        bench_saved_index(args.index_documents, args.dim, args.workers)
+    if args.generate_queries:
+        bench_generation(args.retriever, args.generator, args.generate_queries, args.max_new_tokens,
+                         args.generate_batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,292 @@
+import copy
+import hashlib
+import json
+import mmap as _mmap
+import os
 import numpy as np
 import torch
-from typing import List, Tuple
-from transformers import AutoTokenizer, AutoModel, AutoModelForCausalLM
-from sklearn.metrics.pairwise import cosine_similarity
+from collections.abc import Sequence
+from threading import Thread
+from typing import Iterator, List, Tuple
+from transformers import AutoTokenizer, AutoModel, AutoModelForCausalLM, TextIteratorStreamer
+
+# Same file as the visualizer's src/core/vector_index.py: the same backends and on-disk format
+from vector_index import VECTOR_INDEX_BACKENDS as INDEX_BACKENDS, ExactIndex, VectorIndex, create_vector_index
+
+
+# Documents of a saved index, decoded on access from a blob of UTF-8 texts and their offsets
+class MappedDocuments(Sequence):
+    def __init__(self, blob, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+        self._mapped = len(offsets) - 1
+        self._added = []
+
+    def __len__(self) -> int:
+        return self._mapped + len(self._added)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        if i >= self._mapped:
+            return self._added[i - self._mapped]
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    def extend(self, documents: List[str]):
+        self._added.extend(documents)
+
+
+def _model_checksum(model_name: str) -> str:
+    return hashlib.sha256(model_name.encode("utf-8")).hexdigest()
+
+
+def _replace(path: str, write):
+    # Written next to the target and renamed, so a process mapping the old file keeps a consistent view
+    with open(path + ".tmp", "wb") as f:
+        write(f)
+    os.replace(path + ".tmp", path)
+
+
+def save_index(path: str, documents: Sequence, index, retriever_model_name: str):
+    # documents.bin + offsets.npy: the documents, index/: the vector index (vector_index.py's format),
+    # index.json: the retriever model
+    os.makedirs(path, exist_ok=True)
+    offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+
+    def write_documents(f):
+        for i, document in enumerate(documents):
+            data = document.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+
+    _replace(os.path.join(path, "documents.bin"), write_documents)
+    _replace(os.path.join(path, "offsets.npy"), lambda f: np.save(f, offsets))
+    index.save(os.path.join(path, "index"))
+    meta = {
+        "retriever_model": retriever_model_name,
+        "checksum": _model_checksum(retriever_model_name),
+        "documents": len(documents),
+        "index": index.backend,
+    }
+    _replace(os.path.join(path, "index.json"), lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+
+def load_index(path: str, retriever_model_name: str, mmap: bool = True) -> Tuple[MappedDocuments, object]:
+    # With mmap the files are mapped instead of read: opening is instant and processes share the pages
+    with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["checksum"] != _model_checksum(retriever_model_name):
+        raise ValueError(f"The index in {path} was embedded with {meta['retriever_model']}, not {retriever_model_name}")
+
+    if os.path.isdir(os.path.join(path, "index")):
+        index = VectorIndex.load(os.path.join(path, "index"), mmap)
+    else:
+        # Indexes saved before the shared vector indexes only have their normalized embeddings.npy
+        index = ExactIndex.from_vectors(np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r" if mmap else None))
+    offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r" if mmap else None)
+    if not len(index) == len(offsets) - 1 == meta["documents"]:
+        raise ValueError(f"The index in {path} is incomplete")
+    with open(os.path.join(path, "documents.bin"), "rb") as f:
+        if mmap and offsets[-1]:
+            blob = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+        else:
+            blob = f.read()
+    return MappedDocuments(blob, offsets), index
+
 
 class RAG:
-    def __init__(self, retriever_model_name: str, generator_model_name: str):
+    def __init__(self, retriever_model_name: str, generator_model_name: str, batch_size: int = 32,
+                 index: str = "exact", index_params: dict = None):
         # Initialize tokenizers and models
+        self.retriever_model_name = retriever_model_name
         self.retriever_tokenizer = AutoTokenizer.from_pretrained(retriever_model_name)
         self.retriever_model = AutoModel.from_pretrained(retriever_model_name)
         
         self.generator_tokenizer = AutoTokenizer.from_pretrained(generator_model_name)
         self.generator_model = AutoModelForCausalLM.from_pretrained(generator_model_name)
+        # Batched prompts are padded on the left, so every answer starts right after its prompt
+        self.generator_tokenizer.padding_side = "left"
+        # Prompts too long for the model lose the start of their context, not the query
+        self.generator_tokenizer.truncation_side = "left"
+        if self.generator_tokenizer.pad_token is None:
+            self.generator_tokenizer.pad_token = self.generator_tokenizer.eos_token
         
+        self.batch_size = batch_size
         self.documents = []
-        self.document_embeddings = []
+        # "exact" up to a few hundred thousand documents, "hnsw" or "ivfpq" (approximate) for larger corpora
+        self.index = create_vector_index(index, self.retriever_model.config.hidden_size, **(index_params or {}))
+
+    @property
+    def document_embeddings(self) -> np.ndarray:
+        return self.index.vectors
 
     def add_documents(self, documents: List[str]):
         self.documents.extend(documents)
-        new_embeddings = self._embed_documents(documents)
-        self.document_embeddings.extend(new_embeddings)
+        self.index.add(self._embed_documents(documents))
+
+    def save(self, path: str):
+        save_index(path, self.documents, self.index, self.retriever_model_name)
+
+    def load(self, path: str, mmap: bool = True):
+        self.documents, self.index = load_index(path, self.retriever_model_name, mmap)
 
-    def _embed_documents(self, documents: List[str]) -> List[np.ndarray]:
-        embeddings = []
-        for doc in documents:
-            inputs = self.retriever_tokenizer(doc, return_tensors="pt", truncation=True, max_length=512)
+    def _embed_documents(self, documents: List[str]) -> np.ndarray:
+        embeddings = None
+        # Sorted by length, so the documents of a batch need little padding
+        order = sorted(range(len(documents)), key=lambda i: len(documents[i]))
+        for start in range(0, len(documents), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            inputs = self.retriever_tokenizer(
+                [documents[i] for i in batch], return_tensors="pt", padding=True, truncation=True, max_length=512
+            )
             with torch.no_grad():
                 outputs = self.retriever_model(**inputs)
-            embeddings.append(outputs.last_hidden_state.mean(dim=1).squeeze().numpy())
+            # Mean pooling over the real tokens, the padding is masked out
+            mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+            pooled = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            if embeddings is None:
+                embeddings = np.empty((len(documents), pooled.shape[1]), dtype=np.float32)
+            embeddings[batch] = pooled.numpy()
+        if embeddings is None:
+            return np.empty((0, self.retriever_model.config.hidden_size), dtype=np.float32)
         return embeddings
 
     def retrieve(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
-        query_embedding = self._embed_documents([query])[0]
-        similarities = cosine_similarity([query_embedding], self.document_embeddings)[0]
-        top_k_indices = np.argsort(similarities)[-k:][::-1]
-        return [(self.documents[i], similarities[i]) for i in top_k_indices]
+        return self.retrieve_many([query], k)[0]
 
-    def generate(self, query: str, retrieved_docs: List[Tuple[str, float]]) -> str:
+    def retrieve_many(self, queries: List[str], k: int = 5) -> List[List[Tuple[str, float]]]:
+        indices, similarities = self.index.search(self._embed_documents(queries), k)
+        return [
+            # Approximate indexes pad short rows with id -1
+            [(self.documents[i], float(similarity)) for i, similarity in zip(row, row_similarities) if i >= 0]
+            for row, row_similarities in zip(indices, similarities)
+        ]
+
+    def _prompt(self, query: str, retrieved_docs: List[Tuple[str, float]]) -> str:
         context = " ".join([doc for doc, _ in retrieved_docs])
-        prompt = f"Context: {context}\n\nQuery: {query}\n\nAnswer:"
-        
-        inputs = self.generator_tokenizer(prompt, return_tensors="pt")
+        return f"Context: {context}\n\nQuery: {query}\n\nAnswer:"
+
+    def _generator_inputs(self, prompts: List[str], max_new_tokens: int):
+        max_positions = getattr(self.generator_model.config, "max_position_embeddings", None)
+        return self.generator_tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=max_positions is not None,
+            max_length=max_positions - max_new_tokens if max_positions is not None else None,
+        )
+
+    def generate(self, query: str, retrieved_docs: List[Tuple[str, float]], max_new_tokens: int = 100) -> str:
+        return self.generate_many([query], [retrieved_docs], max_new_tokens)[0]
+
+    def generate_many(
+        self,
+        queries: List[str],
+        retrieved_docs: List[List[Tuple[str, float]]],
+        max_new_tokens: int = 100,
+        batch_size: int = 8,
+        reuse_context_cache: bool = False,
+    ) -> List[str]:
+        # With reuse_context_cache, the queries sharing the same retrieved context run on one KV cache of its prompt
+        prompts = [self._prompt(query, docs) for query, docs in zip(queries, retrieved_docs)]
+        if not reuse_context_cache:
+            return self._generate_batched(prompts, max_new_tokens, batch_size)
+
+        groups = {}
+        for i, docs in enumerate(retrieved_docs):
+            groups.setdefault(tuple(doc for doc, _ in docs), []).append(i)
+        answers = [None] * len(prompts)
+        alone = sorted(group[0] for group in groups.values() if len(group) == 1)
+        for i, answer in zip(alone, self._generate_batched([prompts[i] for i in alone], max_new_tokens, batch_size)):
+            answers[i] = answer
+        for group in groups.values():
+            if len(group) > 1:
+                shared = self._generate_shared_prefix([prompts[i] for i in group], max_new_tokens, batch_size)
+                for i, answer in zip(group, shared):
+                    answers[i] = answer
+        return answers
+
+    def _generate_batched(self, prompts: List[str], max_new_tokens: int, batch_size: int) -> List[str]:
+        answers = []
+        for start in range(0, len(prompts), batch_size):
+            inputs = self._generator_inputs(prompts[start:start + batch_size], max_new_tokens)
+            with torch.no_grad():
+                outputs = self.generator_model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=self.generator_tokenizer.pad_token_id,
+                )
+            answers.extend(self.generator_tokenizer.decode(output, skip_special_tokens=True) for output in outputs)
+        return answers
+
+    def _generate_shared_prefix(self, prompts: List[str], max_new_tokens: int, batch_size: int) -> List[str]:
+        input_ids = [self._generator_inputs([prompt], max_new_tokens)["input_ids"][0] for prompt in prompts]
+        # Tokens common to all the prompts (at least one token of every prompt is left to run)
+        prefix = min(len(ids) for ids in input_ids) - 1
+        for ids in input_ids[1:]:
+            differs = (ids[:prefix] != input_ids[0][:prefix]).nonzero()
+            if len(differs):
+                prefix = int(differs[0, 0])
+        if prefix == 0:
+            return self._generate_batched(prompts, max_new_tokens, batch_size)
+
         with torch.no_grad():
-            outputs = self.generator_model.generate(**inputs, max_length=150, num_return_sequences=1)
-        
-        return self.generator_tokenizer.decode(outputs[0], skip_special_tokens=True)
+            prefix_cache = self.generator_model(input_ids[0][None, :prefix], use_cache=True).past_key_values
+        answers = []
+        for start in range(0, len(prompts), batch_size):
+            suffixes = [ids[prefix:] for ids in input_ids[start:start + batch_size]]
+            # The suffixes are padded on the left, between the cached prefix and themselves
+            width = prefix + max(len(suffix) for suffix in suffixes)
+            batch_ids = torch.full((len(suffixes), width), self.generator_tokenizer.pad_token_id, dtype=input_ids[0].dtype)
+            attention_mask = torch.zeros_like(batch_ids)
+            batch_ids[:, :prefix] = input_ids[0][:prefix]
+            attention_mask[:, :prefix] = 1
+            for row, suffix in enumerate(suffixes):
+                batch_ids[row, width - len(suffix):] = suffix
+                attention_mask[row, width - len(suffix):] = 1
+            cache = copy.deepcopy(prefix_cache)
+            cache.batch_repeat_interleave(len(suffixes))
+            with torch.no_grad():
+                outputs = self.generator_model.generate(
+                    input_ids=batch_ids,
+                    attention_mask=attention_mask,
+                    past_key_values=cache,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=self.generator_tokenizer.pad_token_id,
+                )
+            answers.extend(self.generator_tokenizer.decode(output, skip_special_tokens=True) for output in outputs)
+        return answers
+
+    def generate_stream(
+        self, query: str, retrieved_docs: List[Tuple[str, float]], max_new_tokens: int = 100
+    ) -> Iterator[str]:
+        # Yields the answer text piece by piece as it is generated (without the prompt)
+        inputs = self._generator_inputs([self._prompt(query, retrieved_docs)], max_new_tokens)
+        streamer = TextIteratorStreamer(self.generator_tokenizer, skip_prompt=True, skip_special_tokens=True)
+        kwargs = dict(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=self.generator_tokenizer.pad_token_id,
+            streamer=streamer,
+        )
+        thread = Thread(target=self.generator_model.generate, kwargs=kwargs, daemon=True)
+        thread.start()
+        try:
+            yield from streamer
+        finally:
+            thread.join()
 
     def query(self, query: str, k: int = 5) -> str:
         retrieved_docs = self.retrieve(query, k)
         return self.generate(query, retrieved_docs)
 
+    def query_many(self, queries: List[str], k: int = 5, max_new_tokens: int = 100) -> List[str]:
+        return self.generate_many(queries, self.retrieve_many(queries, k), max_new_tokens)
+
 # Example usage
 if __name__ == "__main__":
     # Initialize RAG with appropriate model names
@@ -109,8 +346,7 @@ if __name__ == "__main__":
         "What are some of Alex's favorite books or TV shows?"
     ]
 
-    for query in queries:
-        result = rag.query(query)
+    for query, result in zip(queries, rag.query_many(queries)):
         print(f"Query: {query}")
         print(f"Answer: {result}")
         print()
\ No newline at end of file
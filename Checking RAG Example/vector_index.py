@@ -0,0 +1,397 @@
+"""Vector indexes with interchangeable search backends
+
+Every index stores L2-normalized float32 vectors and ranks them by cosine
+similarity behind the same API: add(), search(), save() and load().
+
+- "exact": a NumPy matrix searched by matmul + argpartition. Exact results,
+  O(n) per query; the right choice up to a few hundred thousand vectors.
+- "hnsw": an HNSW graph (requires hnswlib). Approximate, logarithmic search
+  time, the full vectors are kept in memory.
+- "ivfpq": an inverted file of product-quantized codes (requires faiss-cpu).
+  Approximate, a few dozen bytes per vector in memory, for corpora that do
+  not fit in memory as float32. Candidates can be re-scored with the full
+  vectors, memory-mapped from disk.
+
+The same file is kept in rag-pipeline-visualizer/src/core/ and in
+"Checking RAG Example/", so both projects share the backends and the
+on-disk format: a fix to one copy goes into both.
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Type
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _replace(path: Path, write: Callable[[str], None]):
+    # Written next to the target and renamed, so a process mapping the old file keeps a consistent view
+    temporary = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    write(str(temporary))
+    os.replace(temporary, path)
+
+
+class VectorIndex(ABC):
+    """Common API of the index backends
+
+    Vectors get consecutive integer ids in the order they are added, starting
+    at 0, so ids index the list of chunks they were embedded from. A backend
+    must implement every abstract method to be instantiated.
+    """
+
+    backend = ""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of vectors in the index"""
+
+    @property
+    @abstractmethod
+    def vectors(self) -> np.ndarray:
+        """(n, dim) array of the normalized vectors, approximated by an ivfpq index without rerank"""
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray):
+        """Append vectors to the index
+
+        Args:
+            vectors: (n, dim) array, normalized before being stored
+        """
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the k most similar vectors of every query
+
+        Args:
+            queries: (q, dim) array of query vectors
+            k: Number of neighbours, capped to the size of the index
+
+        Returns:
+            Tuple of (ids, similarities), two (q, k) arrays sorted best first.
+            Approximate backends pad a row with id -1 when they find fewer
+            than k neighbours.
+        """
+
+    def params(self) -> Dict:
+        """Constructor arguments, saved so load() rebuilds the same index"""
+        return {}
+
+    def save(self, path):
+        """Write the index to the directory `path`
+
+        Args:
+            path: Directory, created if missing
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self._save(path)
+        meta = {"backend": self.backend, "dim": self.dim, "count": len(self), "params": self.params()}
+        _replace(path / "index.json", lambda temporary: Path(temporary).write_text(json.dumps(meta), encoding="utf-8"))
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "VectorIndex":
+        """Open an index written by save(), whatever its backend
+
+        Args:
+            path: Directory of the saved index
+            mmap: Map the exact backend's vectors instead of reading them
+
+        Returns:
+            Index of the saved backend
+        """
+        path = Path(path)
+        with open(path / "index.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        backend = VECTOR_INDEX_BACKENDS[meta["backend"]]
+        index = backend(meta["dim"], **meta["params"])
+        index._load(path, meta["count"], mmap)
+        if len(index) != meta["count"]:
+            raise ValueError(f"The index in {path} is incomplete")
+        return index
+
+    @abstractmethod
+    def _save(self, path: Path):
+        """Write the backend's files into the directory `path`"""
+
+    @abstractmethod
+    def _load(self, path: Path, count: int, mmap: bool):
+        """Read the backend's files written by _save() from the directory `path`"""
+
+
+class ExactIndex(VectorIndex):
+    """Brute-force cosine search over one preallocated NumPy matrix"""
+
+    backend = "exact"
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        super().__init__(dim)
+        self._data = np.empty((capacity, dim), dtype=np.float32)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray) -> "ExactIndex":
+        """Wrap normalized vectors as they are (e.g. a read-only memmap), the next add() copies them to memory"""
+        index = cls(vectors.shape[1], capacity=0)
+        index._data = vectors
+        index.size = len(vectors)
+        return index
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    def add(self, vectors: np.ndarray):
+        vectors = _normalize(vectors)
+        count = len(vectors)
+        # Nothing to write: a mapped matrix would be read-only
+        if count == 0:
+            return
+        if self.size + count > len(self._data):
+            # Capacity doubles, so adding batch by batch stays amortized O(n)
+            grown = np.empty((max(2 * len(self._data), self.size + count), self.dim), dtype=np.float32)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:self.size + count] = vectors
+        self.size += count
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = _normalize(queries)
+        k = min(k, self.size)
+        ids = np.empty((len(queries), k), dtype=np.int64)
+        similarities = np.empty((len(queries), k), dtype=np.float32)
+        if k == 0:
+            return ids, similarities
+        # Queries are scored in blocks to bound the (queries x vectors) score matrix
+        block = max(1, (1 << 24) // self.size)
+        for start in range(0, len(queries), block):
+            scores = queries[start:start + block] @ self.vectors.T
+            if k < self.size:
+                top = np.argpartition(scores, self.size - k, axis=1)[:, self.size - k:]
+            else:
+                top = np.broadcast_to(np.arange(self.size), scores.shape)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            ids[start:start + block] = np.take_along_axis(top, order, axis=1)
+            similarities[start:start + block] = np.take_along_axis(top_scores, order, axis=1)
+        return ids, similarities
+
+    def _save(self, path: Path):
+        _replace(path / "vectors.npy", lambda temporary: np.save(temporary, self.vectors))
+
+    def _load(self, path: Path, count: int, mmap: bool):
+        # A mapped matrix is read-only, the next add() copies it to memory
+        self._data = np.load(path / "vectors.npy", mmap_mode="r" if mmap else None)
+        self.size = len(self._data)
+
+
+class HNSWIndex(VectorIndex):
+    """Hierarchical navigable small world graph, built by hnswlib
+
+    Args:
+        dim: Vector size
+        M: Links per node; more links improve recall and cost memory
+        ef_construction: Candidate list size while inserting
+        ef_search: Candidate list size while searching (at least k)
+    """
+
+    backend = "hnsw"
+
+    def __init__(self, dim: int, M: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        super().__init__(dim)
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("The hnsw backend requires hnswlib: pip install hnswlib")
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._hnswlib = hnswlib
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(max_elements=1024, M=M, ef_construction=ef_construction)
+
+    def __len__(self) -> int:
+        return self._index.get_current_count()
+
+    def params(self) -> Dict:
+        return {"M": self.M, "ef_construction": self.ef_construction, "ef_search": self.ef_search}
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if not len(self):
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.asarray(self._index.get_items(np.arange(len(self))), dtype=np.float32)
+
+    def add(self, vectors: np.ndarray):
+        vectors = _normalize(vectors)
+        size = len(self)
+        if size + len(vectors) > self._index.get_max_elements():
+            self._index.resize_index(max(2 * self._index.get_max_elements(), size + len(vectors)))
+        self._index.add_items(vectors, np.arange(size, size + len(vectors)))
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = _normalize(queries)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        self._index.set_ef(max(self.ef_search, k))
+        labels, distances = self._index.knn_query(queries, k=k)
+        # The "ip" space returns 1 - inner product
+        return labels.astype(np.int64), 1 - distances
+
+    def _save(self, path: Path):
+        _replace(path / "hnsw.bin", self._index.save_index)
+
+    def _load(self, path: Path, count: int, mmap: bool):
+        self._index = self._hnswlib.Index(space="ip", dim=self.dim)
+        self._index.load_index(str(path / "hnsw.bin"), max_elements=max(count, 1024))
+
+
+class IVFPQIndex(VectorIndex):
+    """Inverted file over product-quantized codes, built by faiss
+
+    The coarse centroids and the codebooks have to be trained, so vectors are
+    kept in an ExactIndex (and searched exactly) until `train_size` of them
+    have been added. The index is then trained on them once and later vectors
+    are only encoded.
+
+    Product quantization alone loses the order of close neighbours. With
+    `rerank`, the full vectors are kept next to the codes (memory-mapped once
+    saved and loaded) and the k * rerank candidates of the codes are re-scored
+    exactly.
+
+    Args:
+        dim: Vector size
+        nlist: Inverted lists; defaults to sqrt of the training vectors
+        m: Sub-quantizers, a divisor of dim; each vector takes m bytes with
+            8 bits per code. Defaults to the largest divisor up to dim / 8
+        nbits: Bits per sub-quantizer code
+        nprobe: Inverted lists scanned per query; more improves recall
+        rerank: Candidates re-scored per result, 0 to keep only the codes
+        train_size: Vectors buffered before training
+    """
+
+    backend = "ivfpq"
+
+    def __init__(self, dim: int, nlist: Optional[int] = None, m: Optional[int] = None, nbits: int = 8,
+                 nprobe: int = 16, rerank: int = 10, train_size: Optional[int] = None):
+        super().__init__(dim)
+        try:
+            import faiss
+        except ImportError:
+            raise ImportError("The ivfpq backend requires faiss-cpu: pip install faiss-cpu")
+        self._faiss = faiss
+        self.nlist = nlist
+        self.m = m or max(d for d in range(1, max(1, dim // 8) + 1) if dim % d == 0)
+        self.nbits = nbits
+        self.nprobe = nprobe
+        self.rerank = rerank
+        # faiss wants ~39 training vectors per centroid of every quantizer
+        self.train_size = train_size or 39 * max(nlist or 0, 2 ** nbits)
+        # Vectors not trained on yet, or all of them when reranking
+        self._vectors = ExactIndex(dim)
+        self._index = None
+
+    def __len__(self) -> int:
+        return self._index.ntotal if self._index is not None else len(self._vectors)
+
+    def params(self) -> Dict:
+        return {"nlist": self.nlist, "m": self.m, "nbits": self.nbits, "nprobe": self.nprobe,
+                "rerank": self.rerank, "train_size": self.train_size}
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is not None:
+            return self._vectors.vectors
+        # Only the codes are kept, these are their approximations
+        self._index.make_direct_map()
+        return self._index.reconstruct_n(0, len(self))
+
+    def _train(self):
+        faiss = self._faiss
+        vectors = np.ascontiguousarray(self._vectors.vectors)
+        self.nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        quantizer = faiss.IndexFlatIP(self.dim)
+        index = faiss.IndexIVFPQ(quantizer, self.dim, self.nlist, self.m, self.nbits, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add(vectors)
+        self._index = index
+        if not self.rerank:
+            self._vectors = None
+
+    def add(self, vectors: np.ndarray):
+        vectors = _normalize(vectors)
+        if self._vectors is not None:
+            self._vectors.add(vectors)
+        if self._index is not None:
+            self._index.add(vectors)
+        elif len(self._vectors) >= self.train_size:
+            self._train()
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._index is None:
+            return self._vectors.search(queries, k)
+        queries = _normalize(queries)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        self._index.nprobe = self.nprobe
+        similarities, ids = self._index.search(queries, min(k * max(self.rerank, 1), len(self)))
+        if not self.rerank:
+            return ids, similarities
+        # Exact scores of the candidates, the -1 padding sorts last
+        candidates = self._vectors.vectors[np.maximum(ids, 0)]
+        scores = np.einsum("qd,qcd->qc", queries, candidates)
+        scores[ids < 0] = -np.inf
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def _save(self, path: Path):
+        if self._index is not None:
+            _replace(path / "ivfpq.faiss", lambda temporary: self._faiss.write_index(self._index, temporary))
+        if self._vectors is not None:
+            self._vectors._save(path)
+
+    def _load(self, path: Path, count: int, mmap: bool):
+        if os.path.exists(path / "ivfpq.faiss"):
+            self._index = self._faiss.read_index(str(path / "ivfpq.faiss"))
+        if os.path.exists(path / "vectors.npy"):
+            self._vectors._load(path, count, mmap)
+        else:
+            self._vectors = None
+
+
+VECTOR_INDEX_BACKENDS: Dict[str, Type[VectorIndex]] = {
+    "exact": ExactIndex,
+    "hnsw": HNSWIndex,
+    "ivfpq": IVFPQIndex,
+}
+
+
+def create_vector_index(backend: str, dim: int, **params) -> VectorIndex:
+    """Create an empty index
+
+    Args:
+        backend: "exact", "hnsw" or "ivfpq"
+        dim: Vector size
+        **params: Backend options (see the backend classes)
+
+    Returns:
+        Empty index of the backend
+    """
+    if backend not in VECTOR_INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index backend {backend!r}, choose one of {list(VECTOR_INDEX_BACKENDS)}")
+    return VECTOR_INDEX_BACKENDS[backend](dim, **params)
@@ -0,0 +1,79 @@
+"""
+Offline ingestion benchmark: local HTML fixtures + the stub embedder, no API keys needed.
+To run this go to the root directory and run the command:
+python benchmarks/bench_ingestion.py --pages 50 --latency 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ingestion import StubEmbeddings, get_vectorstore, ingest
+
+WORDS = ("agent memory planning tool reflection prompt chain retrieval attack robustness token "
+         "model context vector embedding graph node state reasoning search answer").split()
+
+
+def write_fixtures(directory: str, pages: int, paragraphs: int, seed: int = 0):
+    """Write `pages` local HTML files with random paragraphs and return their paths"""
+    rng = random.Random(seed)
+    paths = []
+    for page in range(pages):
+        body = "\n".join(
+            f"<p>{' '.join(rng.choice(WORDS) for _ in range(120))}.</p>" for _ in range(paragraphs)
+        )
+        path = os.path.join(directory, f"page_{page}.html")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(f"<html><head><title>Page {page}</title></head><body>{body}</body></html>")
+        paths.append(path)
+    return paths
+
+
+def edit_paragraph(path: str, paragraph: int, seed: int = 1):
+    """Replace the text of one paragraph of a fixture page, the rest of the page is left as it is"""
+    rng = random.Random(seed)
+    with open(path, encoding="utf-8") as file:
+        html = file.read()
+    paragraphs = html.split("<p>")
+    end = paragraphs[paragraph + 1].index("</p>")
+    paragraphs[paragraph + 1] = f"{' '.join(rng.choice(WORDS) for _ in range(120))}." + paragraphs[paragraph + 1][end:]
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("<p>".join(paragraphs))
+
+
+def run(label, sources, persist_directory, args):
+    embedder = StubEmbeddings(latency=args.latency)
+    stats = ingest(sources, get_vectorstore(embedder, persist_directory), batch_size=args.batch_size, split_workers=args.split_workers)
+    print(f"{label:<28} {stats['seconds']:7.2f}s  chunks={stats['chunks']:<6} embedded={stats['embedded']:<6} "
+          f"unchanged={stats['unchanged']:<6} embedding calls={embedder.calls}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--split-workers", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per embedding call")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sources = write_fixtures(directory, args.pages, args.paragraphs)
+        persist_directory = os.path.join(directory, "chroma")
+
+        run("cold ingestion", sources, persist_directory, args)
+        run("re-run, nothing changed", sources, persist_directory, args)
+
+        # Edit one paragraph of one page, only its chunks should be embedded again
+        edit_paragraph(sources[0], args.paragraphs // 2)
+        stats = run("re-run, one paragraph edited", sources, persist_directory, args)
+        print(f"  one paragraph of {args.pages * args.paragraphs} edited: {stats['embedded']} chunks re-embedded, "
+              f"{stats['unchanged']} reused, {stats['pruned']} stale chunks pruned")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_core.runnables import RunnableSequence
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
+from graph.chains.cache import cached_grader
 import os
 from dotenv import load_dotenv
 
@@ -31,5 +32,5 @@ answer_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-# Create the answer grader chain
-answer_grader: RunnableSequence = answer_prompt | structured_llm_grader
+# Create the answer grader chain (memoized on question + generation when the grader cache is switched on)
+answer_grader: Runnable = cached_grader(answer_prompt | structured_llm_grader, name="answer_grader", output_model=AnswerGrader)
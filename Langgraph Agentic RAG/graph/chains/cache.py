@@ -0,0 +1,184 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Type
+
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from pydantic import BaseModel
+
+# Define the storage backends, both store the grader output as JSON with an expiry time
+class LRUCacheBackend:
+    """
+    In-process LRU cache with TTL eviction
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            expires_at = time.time() + self.ttl if self.ttl else None
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    SQLite cache with TTL eviction, shared across processes and restarts
+    """
+
+    def __init__(self, path: str = "grader_cache.sqlite", ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS grader_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM grader_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                self._connection.execute("DELETE FROM grader_cache WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            expires_at = time.time() + self.ttl if self.ttl else None
+            self._connection.execute(
+                "INSERT OR REPLACE INTO grader_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            # Drop every expired entry while we are at it
+            self._connection.execute("DELETE FROM grader_cache WHERE expires_at < ?", (time.time(),))
+            self._connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM grader_cache")
+            self._connection.commit()
+
+
+# Define the key: documents are reduced to their content so identical chunks share a key
+def _normalize(value: Any) -> Any:
+    if isinstance(value, Document):
+        return value.page_content
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return value
+
+
+def cache_key(name: str, inputs: Dict[str, Any]) -> str:
+    payload = json.dumps(_normalize(inputs), sort_keys=True, default=str)
+    return hashlib.sha256(f"{name}\0{payload}".encode("utf-8")).hexdigest()
+
+
+class GraderCache:
+    """
+    Memoization layer for the structured output grader chains.
+    Disabled (pass-through) until `configure` is called with a backend.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, backend: Optional[str] = None, ttl: Optional[float] = 3600, max_size: int = 1024, path: str = "grader_cache.sqlite"):
+        """
+        Switch the cache on or off
+
+        Args:
+            backend: 'lru' for an in-process cache, 'sqlite' for a persistent one, None to disable
+            ttl: Seconds before an entry expires (None to keep entries forever)
+            max_size: Maximum number of entries of the LRU backend
+            path: Database file of the SQLite backend
+        """
+        if backend is None:
+            self.backend = None
+        elif backend == "lru":
+            self.backend = LRUCacheBackend(max_size=max_size, ttl=ttl)
+        elif backend == "sqlite":
+            self.backend = SQLiteCacheBackend(path=path, ttl=ttl)
+        else:
+            raise ValueError("Grader cache backend must be 'lru', 'sqlite' or None")
+
+    def _count(self, name: str, outcome: str):
+        with self._lock:
+            counters = self.stats.setdefault(name, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def wrap(self, chain: Runnable, name: str, output_model: Type[BaseModel]) -> Runnable:
+        """
+        Wrap a grader chain so identical inputs are answered from the cache
+        """
+
+        def invoke(inputs: Dict[str, Any], config: RunnableConfig) -> BaseModel:
+            backend = self.backend
+            if backend is None:
+                return chain.invoke(inputs, config)
+
+            key = cache_key(name, inputs)
+            cached = backend.get(key)
+            if cached is not None:
+                self._count(name, "hits")
+                return output_model.model_validate_json(cached)
+
+            self._count(name, "misses")
+            result = chain.invoke(inputs, config)
+            backend.set(key, result.model_dump_json())
+            return result
+
+        return RunnableLambda(invoke, name=name)
+
+
+grader_cache = GraderCache()
+
+
+def cached_grader(chain: Runnable, name: str, output_model: Type[BaseModel]) -> Runnable:
+    return grader_cache.wrap(chain, name, output_model)
+
+
+def configure_grader_cache(backend: Optional[str] = None, **kwargs):
+    grader_cache.configure(backend, **kwargs)
+
+
+def grader_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {name: dict(counters) for name, counters in grader_cache.stats.items()}
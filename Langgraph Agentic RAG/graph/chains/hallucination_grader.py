@@ -1,7 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_core.runnables import RunnableSequence
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
+from graph.chains.cache import cached_grader
 import os
 from dotenv import load_dotenv
 
@@ -30,6 +31,6 @@ hallucination_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-# Create the hallucination grader chain
-hallucination_grader: RunnableSequence = hallucination_prompt | structured_llm_grader
+# Create the hallucination grader chain (memoized on documents + generation when the grader cache is switched on)
+hallucination_grader: Runnable = cached_grader(hallucination_prompt | structured_llm_grader, name="hallucination_grader", output_model=HallucinationGrader)
 
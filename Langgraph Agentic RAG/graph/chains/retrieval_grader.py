@@ -1,6 +1,7 @@
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
+from graph.chains.cache import cached_grader
 import os
 from dotenv import load_dotenv
 
@@ -35,5 +36,5 @@ grade_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-# Define the final retrieval grader chain
-retrieval_grader = grade_prompt | structured_llm_grader
\ No newline at end of file
+# Define the final retrieval grader chain (memoized on question + document when the grader cache is switched on)
+retrieval_grader = cached_grader(grade_prompt | structured_llm_grader, name="retrieval_grader", output_model=GradeDocuments)
\ No newline at end of file
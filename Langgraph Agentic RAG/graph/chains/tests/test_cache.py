@@ -0,0 +1,76 @@
+"""
+Offline tests for the grader result cache, the grader chain is replaced by a fake that counts its calls.
+To run this go to the root directory and run the command:
+pytest -s -v graph/chains/tests/test_cache.py
+"""
+import time
+
+from langchain.schema import Document
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from graph.chains.cache import GraderCache
+
+class FakeGrade(BaseModel):
+    binary_score: bool
+
+def make_grader(cache):
+    calls = []
+
+    def fake_grader(inputs):
+        calls.append(inputs)
+        return FakeGrade(binary_score="agent" in inputs["question"])
+
+    return cache.wrap(RunnableLambda(fake_grader), name="fake_grader", output_model=FakeGrade), calls
+
+def test_disabled_cache_is_pass_through() -> None:
+    cache = GraderCache()
+    grader, calls = make_grader(cache)
+
+    grader.invoke({"question": "agent memory", "documents": [Document(page_content="memory")]})
+    grader.invoke({"question": "agent memory", "documents": [Document(page_content="memory")]})
+
+    assert len(calls) == 2
+    assert cache.stats == {}
+
+def test_lru_cache_hits_on_identical_inputs() -> None:
+    cache = GraderCache()
+    cache.configure("lru", ttl=None, max_size=2)
+    grader, calls = make_grader(cache)
+
+    first = grader.invoke({"question": "agent memory", "documents": [Document(page_content="memory")]})
+    second = grader.invoke({"question": "agent memory", "documents": [Document(page_content="memory", metadata={"x": 1})]})
+    grader.invoke({"question": "pizza", "documents": [Document(page_content="memory")]})
+
+    assert first == second == FakeGrade(binary_score=True)
+    assert len(calls) == 2
+    assert cache.stats["fake_grader"] == {"hits": 1, "misses": 2}
+
+def test_lru_cache_ttl_and_size_eviction() -> None:
+    cache = GraderCache()
+    cache.configure("lru", ttl=0.05, max_size=1)
+    grader, calls = make_grader(cache)
+
+    grader.invoke({"question": "a"})
+    grader.invoke({"question": "b"}) # Evicts "a"
+    grader.invoke({"question": "a"})
+    time.sleep(0.1) # Expires "a"
+    grader.invoke({"question": "a"})
+
+    assert len(calls) == 4
+
+def test_sqlite_cache_persists_across_instances(tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    cache = GraderCache()
+    cache.configure("sqlite", path=path)
+    grader, calls = make_grader(cache)
+    grader.invoke({"question": "agent memory", "generation": "answer"})
+
+    reopened = GraderCache()
+    reopened.configure("sqlite", path=path)
+    grader, new_calls = make_grader(reopened)
+    res = grader.invoke({"question": "agent memory", "generation": "answer"})
+
+    assert res == FakeGrade(binary_score=True)
+    assert len(calls) == 1 and len(new_calls) == 0
+    assert reopened.stats["fake_grader"] == {"hits": 1, "misses": 0}
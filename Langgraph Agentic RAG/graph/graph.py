@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from graph.chains.answer_grader import answer_grader
+from graph.chains.cache import configure_grader_cache
 from graph.chains.hallucination_grader import hallucination_grader
 from graph.consts import RETRIEVE, GRADE_DOCUMENTS, WEB_SEARCH, GENERATE
 from graph.nodes import retrieve_node, grade_documents_node, web_search_node, generate_node
@@ -10,6 +11,14 @@ from langgraph.graph import START, StateGraph, END
 
 load_dotenv()
 
+# Switch on the grader result cache (GRADER_CACHE=lru or GRADER_CACHE=sqlite, off when unset)
+# Graders are then not called again on identical inputs when the graph loops or a question is repeated
+configure_grader_cache(
+    backend=os.getenv("GRADER_CACHE") or None,
+    ttl=float(os.getenv("GRADER_CACHE_TTL", "3600")),
+    path=os.getenv("GRADER_CACHE_PATH", "grader_cache.sqlite"),
+)
+
 # Define the function to handle conditional for grade documents node to web search node or generate node
 def decide_to_generate(state: GraphState) -> bool:
     """
@@ -1,48 +1,89 @@
+import os
+import time
 from typing import Any, Dict
 
+from langchain_core.runnables import RunnableLambda
+
 from graph.chains.retrieval_grader import retrieval_grader
 from graph.state import GraphState
 
-# Define the grade documents node
-def grade_documents_node(state: GraphState) -> Dict[str, Any]:
+# Define the grading settings (how many grader calls run at once, and whether to stop at the first irrelevant document)
+GRADING_MAX_CONCURRENCY = int(os.getenv("GRADING_MAX_CONCURRENCY", "8"))
+GRADING_EARLY_EXIT = os.getenv("GRADING_EARLY_EXIT", "false").lower() == "true"
+
+# Define a timed wrapper around the grader so the latency of every document can be reported
+def _grade_document(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+    score = retrieval_grader.invoke(inputs)
+    return {"score": score, "latency": time.perf_counter() - start_time}
+
+timed_retrieval_grader = RunnableLambda(_grade_document)
+
+# Define the grade documents function with the concurrency options
+def grade_documents(state: GraphState, max_concurrency: int = GRADING_MAX_CONCURRENCY, early_exit: bool = GRADING_EARLY_EXIT) -> Dict[str, Any]:
     """
-    Determines whether the retrieved documents are relevant to the question
-    If any document is not relevant, we will set a flag to run web search
+    Grades all the documents concurrently (at most `max_concurrency` grader calls in flight)
 
     Args:
         state (dict): The current graph state
+        max_concurrency (int): Maximum number of concurrent grader calls
+        early_exit (bool): Stop grading as soon as one document is not relevant. The web search
+            will run anyway, so only the documents already graded as relevant are kept
 
     Returns:
         state (dict): Filtered out irrelevant documents and updated web_search state
     """
 
-    print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
-
-    # Get the question and the documents from the currentstate
+    # Get the question and the documents from the current state
     question = state["question"]
     documents = state["documents"]
 
-    filtered_docs = [] # List to store the relevant documents if any
+    relevant = {} # Index -> document, to keep the original order of the relevant documents
     web_search = False # Flag to check if we need to run web search, will toggle to true if any document is not relevant
+    graded = 0
+    start_time = time.perf_counter()
 
-    # Iterate over the documents and grade them
-    for doc in documents:
-        score = retrieval_grader.invoke(
-            {"question": question, "document": doc.page_content} # Pass the question and the document to the grader
-        )
+    # Grade the documents as they complete (pass the question and the document to the grader)
+    inputs = [{"question": question, "document": doc.page_content} for doc in documents]
+    results = timed_retrieval_grader.batch_as_completed(inputs, config={"max_concurrency": max_concurrency})
+    try:
+        for index, result in results:
+            graded += 1
 
-        # Take the binary score from the grader
-        grade = score.binary_score
+            # Take the binary score from the grader
+            grade = result["score"].binary_score
 
-        # Condition to check if the document is relevant
-        if grade.lower() == "yes":
-            print("---GRADE: DOCUMENT RELEVANT---")
-            filtered_docs.append(doc)
+            # Condition to check if the document is relevant
+            if grade.lower() == "yes":
+                print(f"---GRADE: DOCUMENT {index} RELEVANT ({result['latency']:.2f}s)---")
+                relevant[index] = documents[index]
+            else:
+                print(f"---GRADE: DOCUMENT {index} NOT RELEVANT ({result['latency']:.2f}s)---")
+                web_search = True
+                if early_exit:
+                    print("---EARLY EXIT: WEB SEARCH ALREADY DECIDED, SKIPPING REMAINING DOCUMENTS---")
+                    break
+    finally:
+        results.close() # Cancel the grader calls that have not started yet
 
-        else:
-            print("---GRADE: DOCUMENT NOT RELEVANT---")
-            web_search = True
-            continue
+    print(f"---GRADED {graded}/{len(documents)} DOCUMENTS IN {time.perf_counter() - start_time:.2f}s (MAX CONCURRENCY {max_concurrency})---")
 
     # Update the state with the filtered documents and the web search flag
-    return {"documents": filtered_docs, "web_search": web_search}
\ No newline at end of file
+    filtered_docs = [relevant[index] for index in sorted(relevant)]
+    return {"documents": filtered_docs, "web_search": web_search}
+
+# Define the grade documents node
+def grade_documents_node(state: GraphState) -> Dict[str, Any]:
+    """
+    Determines whether the retrieved documents are relevant to the question
+    If any document is not relevant, we will set a flag to run web search
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Filtered out irrelevant documents and updated web_search state
+    """
+
+    print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
+    return grade_documents(state)
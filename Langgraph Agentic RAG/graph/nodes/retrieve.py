@@ -1,7 +1,7 @@
 from typing import Any, Dict, List
 
 from graph.state import GraphState
-from ingestion import retriever
+from ingestion import get_retriever
 
 # Define the retrieve node
 def retrieve_node(state: GraphState) -> Dict[str, Any]:
@@ -10,8 +10,8 @@ def retrieve_node(state: GraphState) -> Dict[str, Any]:
     # Get the question from the state
     question = state['question']
 
-    # Retrieve the relevant documents based on the question
-    documents = retriever.invoke(question)
+    # Retrieve the relevant documents based on the question (the vectorstore is opened on first use, run `python ingestion.py` to fill it)
+    documents = get_retriever().invoke(question)
 
     # Update the field of document in our current state
-    return {"documents": documents}
\ No newline at end of file
+    return {"documents": documents}
@@ -0,0 +1,59 @@
+"""
+Offline tests for the grade documents node, the retrieval grader is replaced by a fake with injected latency.
+To run this go to the root directory and run the command:
+pytest -s -v graph/nodes/tests
+"""
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test") # The real chains are built at import time but never called here
+
+from langchain.schema import Document
+from langchain_core.runnables import RunnableLambda
+
+import graph.nodes.grade_documents as grade_documents_module
+from graph.chains.retrieval_grader import GradeDocuments
+from graph.nodes.grade_documents import grade_documents
+
+LATENCY = 0.2
+
+# Define a fake grader: documents containing "pizza" are not relevant, every call takes LATENCY seconds
+def fake_grader(inputs):
+    time.sleep(LATENCY)
+    return GradeDocuments(binary_score="no" if "pizza" in inputs["document"] else "yes")
+
+def make_state(contents):
+    return {"question": "agent memory", "documents": [Document(page_content=content) for content in contents]}
+
+def test_grading_runs_concurrently(monkeypatch) -> None:
+    monkeypatch.setattr(grade_documents_module, "retrieval_grader", RunnableLambda(fake_grader))
+    state = make_state([f"agent memory {i}" for i in range(8)])
+
+    start_time = time.perf_counter()
+    res = grade_documents(state, max_concurrency=8)
+    elapsed = time.perf_counter() - start_time
+
+    assert [doc.page_content for doc in res["documents"]] == [f"agent memory {i}" for i in range(8)]
+    assert res["web_search"] is False
+    assert elapsed < 3 * LATENCY # About one call instead of eight
+
+def test_grading_keeps_order_and_sets_web_search(monkeypatch) -> None:
+    monkeypatch.setattr(grade_documents_module, "retrieval_grader", RunnableLambda(fake_grader))
+    state = make_state(["agent memory 0", "how to make a pizza", "agent memory 2"])
+
+    res = grade_documents(state, max_concurrency=2)
+
+    assert [doc.page_content for doc in res["documents"]] == ["agent memory 0", "agent memory 2"]
+    assert res["web_search"] is True
+
+def test_grading_early_exit(monkeypatch) -> None:
+    monkeypatch.setattr(grade_documents_module, "retrieval_grader", RunnableLambda(fake_grader))
+    state = make_state(["how to make a pizza"] + [f"agent memory {i}" for i in range(7)])
+
+    start_time = time.perf_counter()
+    res = grade_documents(state, max_concurrency=1, early_exit=True)
+    elapsed = time.perf_counter() - start_time
+
+    assert res["web_search"] is True
+    assert res["documents"] == []
+    assert elapsed < 3 * LATENCY # The remaining seven calls are never started
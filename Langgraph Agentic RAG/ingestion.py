@@ -1,9 +1,15 @@
+import argparse
+import hashlib
+import math
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
 from dotenv import load_dotenv
-from langchain_community.document_loaders import WebBaseLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -15,34 +21,252 @@ urls = [
     "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
 ]
 
-# Load the documents and store them in a list
-doc_batches = [WebBaseLoader(url).load() for url in urls]
-docs = [doc for doc_batch in doc_batches for doc in doc_batch]
-
-# Equivalent for loop version:
-# docs = []
-# for doc_batch in doc_batches:
-#     for doc in doc_batch:
-#         docs.append(doc)
-
-# Split the documents into chunks
-text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=500, chunk_overlap=100)
-docs_split = text_splitter.split_documents(docs)
-
-# Store the documents in a vector database (run this once)
-vectorstore = Chroma.from_documents(
-    documents=docs_split,
-    collection_name="rag-chroma",
-    embedding=OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=openai_api_key),
-    persist_directory="langgraph_agentic_rag/.chroma_db",
-)
-
-# # Turn the vectorstore into a retriever (to perform similarity search)
-# retriever = vectorstore.as_retriever()
-
-# We can also use this approach after we already created the vectorstore (because the vectorstore variable is commented)
-retriever = Chroma(
-    collection_name="rag-chroma",
-    embedding_function=OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=openai_api_key),
-    persist_directory="langgraph_agentic_rag/.chroma_db",
-).as_retriever()
\ No newline at end of file
+# Define the vectorstore settings (shared by the ingestion command and the retriever)
+COLLECTION_NAME = "rag-chroma"
+PERSIST_DIRECTORY = "langgraph_agentic_rag/.chroma_db"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Define the chunking settings (token based, using the tiktoken encoder)
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+
+# Define a deterministic offline embedder for benchmarks and tests
+class StubEmbeddings(Embeddings):
+    """
+    Hash-based embeddings that never leave the machine.
+    Counts the calls and texts it receives so batching can be verified.
+    """
+
+    def __init__(self, dimensions: int = 256, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency # Simulated latency per embedding call (seconds)
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in text.lower().split():
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] % 2 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def get_embeddings(kind: str = "openai") -> Embeddings:
+    """
+    Get the embedding model used for ingestion ('openai' or the offline 'stub')
+    """
+    if kind == "stub":
+        return StubEmbeddings()
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL, openai_api_key=openai_api_key)
+
+
+def get_vectorstore(embedding: Embeddings = None, persist_directory: str = PERSIST_DIRECTORY):
+    """
+    Open the persistent Chroma collection (no documents are loaded or embedded here)
+    """
+    from langchain_chroma import Chroma
+    return Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embedding or get_embeddings(),
+        persist_directory=persist_directory,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_retriever():
+    """
+    Turn the already ingested vectorstore into a retriever (to perform similarity search)
+    """
+    return get_vectorstore().as_retriever()
+
+
+def __getattr__(name):
+    # Keep `from ingestion import retriever` working without building it at import time
+    if name == "retriever":
+        return get_retriever()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Define the loading step (runs in a thread pool, it is network / disk bound)
+def load_source(source: str) -> List[Document]:
+    """
+    Load a web page, or a local HTML file (used for offline benchmarks)
+    """
+    if os.path.exists(source):
+        from bs4 import BeautifulSoup
+        with open(source, "r", encoding="utf-8") as file:
+            soup = BeautifulSoup(file.read(), "html.parser")
+        title = soup.title.get_text() if soup.title else ""
+        return [Document(page_content=soup.get_text(), metadata={"source": source, "title": title})]
+
+    from langchain_community.document_loaders import WebBaseLoader
+    return WebBaseLoader(source).load()
+
+
+# Define the splitting step (runs in a process pool, tiktoken encoding is CPU bound)
+@lru_cache(maxsize=4)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def split_document(page_content: str, metadata: Dict, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[Tuple[str, Dict]]:
+    """
+    Split one document into (chunk text, metadata) pairs
+    """
+    text_splitter = _get_text_splitter(chunk_size, chunk_overlap)
+    return [(chunk, dict(metadata)) for chunk in text_splitter.split_text(page_content)]
+
+
+def chunk_id(source: str, text: str) -> str:
+    """
+    Content hash of a chunk, used as its id in the vectorstore
+    """
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+def ingest(
+    sources: Iterable[str],
+    vectorstore,
+    batch_size: int = 64,
+    fetch_workers: int = 8,
+    split_workers: int = None,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    prune: bool = True,
+) -> Dict[str, float]:
+    """
+    Stream the sources into the vectorstore: pages are fetched concurrently, split in a
+    process pool as they arrive, and only chunks whose content hash is not stored yet
+    are embedded, in batches of `batch_size`.
+
+    Args:
+        sources: URLs or local HTML file paths
+        vectorstore: Chroma vectorstore to upsert into
+        batch_size: Number of chunks per embedding call
+        fetch_workers: Number of concurrent page downloads
+        split_workers: Number of splitting processes (default: CPU count)
+        chunk_size: Chunk size in tokens
+        chunk_overlap: Chunk overlap in tokens
+        prune: Remove stored chunks of a source that no longer exist in it
+
+    Returns:
+        Dictionary of ingestion stats
+    """
+    sources = list(sources)
+    stats = {"sources": len(sources), "failed_sources": 0, "chunks": 0, "embedded": 0, "unchanged": 0, "pruned": 0, "embedding_batches": 0}
+    start_time = time.perf_counter()
+
+    pending_ids, pending_texts, pending_metadatas = [], [], []
+    seen_ids = {} # source -> ids of the chunks found in this run
+
+    def flush(count):
+        # Embed and upsert the first `count` pending chunks in one call
+        vectorstore.add_texts(texts=pending_texts[:count], metadatas=pending_metadatas[:count], ids=pending_ids[:count])
+        del pending_ids[:count], pending_texts[:count], pending_metadatas[:count]
+        stats["embedded"] += count
+        stats["embedding_batches"] += 1
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, ProcessPoolExecutor(max_workers=split_workers) as split_pool:
+        fetch_futures = {fetch_pool.submit(load_source, source): source for source in sources}
+        split_futures = []
+
+        # Hand every page to the splitters as soon as it is downloaded
+        for future in as_completed(fetch_futures):
+            source = fetch_futures[future]
+            try:
+                docs = future.result()
+            except Exception as e:
+                print(f"---FAILED TO LOAD {source}: {e}---")
+                stats["failed_sources"] += 1
+                continue
+            seen_ids.setdefault(source, set())
+            for doc in docs:
+                split_futures.append(split_pool.submit(split_document, doc.page_content, doc.metadata, chunk_size, chunk_overlap))
+
+        # Upsert the chunks as the splitters finish, skipping the ones already stored
+        for future in as_completed(split_futures):
+            chunks = future.result()
+            if not chunks:
+                continue
+
+            ids, new_chunks = [], {}
+            for text, metadata in chunks:
+                source = metadata.get("source", "")
+                _id = chunk_id(source, text)
+                seen_ids.setdefault(source, set()).add(_id)
+                ids.append(_id)
+                new_chunks.setdefault(_id, (text, metadata))
+            stats["chunks"] += len(chunks)
+
+            stored = set(vectorstore.get(ids=list(new_chunks), include=[])["ids"])
+            stats["unchanged"] += sum(1 for _id in ids if _id in stored)
+            stored.update(pending_ids)
+            for _id, (text, metadata) in new_chunks.items():
+                if _id in stored:
+                    continue
+                pending_ids.append(_id)
+                pending_texts.append(text)
+                pending_metadatas.append(metadata)
+
+            while len(pending_ids) >= batch_size:
+                flush(batch_size)
+
+    if pending_ids:
+        flush(len(pending_ids))
+
+    # Remove chunks that disappeared from a source since the last run
+    if prune:
+        for source, ids in seen_ids.items():
+            stored_ids = vectorstore.get(where={"source": source}, include=[])["ids"]
+            stale_ids = [_id for _id in stored_ids if _id not in ids]
+            if stale_ids:
+                vectorstore.delete(ids=stale_ids)
+                stats["pruned"] += len(stale_ids)
+
+    stats["seconds"] = time.perf_counter() - start_time
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest web pages into the Chroma vectorstore")
+    parser.add_argument("sources", nargs="*", default=urls, help="URLs or local HTML files (default: the blog posts)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding call")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Concurrent page downloads")
+    parser.add_argument("--split-workers", type=int, default=None, help="Splitting processes (default: CPU count)")
+    parser.add_argument("--embedder", choices=["openai", "stub"], default="openai", help="Embedding model, 'stub' runs offline")
+    parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    parser.add_argument("--no-prune", action="store_true", help="Keep chunks that no longer exist in their source")
+    args = parser.parse_args()
+
+    vectorstore = get_vectorstore(get_embeddings(args.embedder), args.persist_directory)
+    stats = ingest(
+        args.sources,
+        vectorstore,
+        batch_size=args.batch_size,
+        fetch_workers=args.fetch_workers,
+        split_workers=args.split_workers,
+        prune=not args.no_prune,
+    )
+
+    print("---INGESTION COMPLETE---")
+    for key, value in stats.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from graph.graph import rag_app
+from graph.chains.cache import grader_cache_stats
 
 load_dotenv()
 
@@ -10,6 +11,9 @@ if __name__ == "__main__":
     # Experiment 1: Agent memory (inside the knowledge store, from the first url source)
     print(rag_app.invoke(input={"question": "What is agent memory?"}))
 
+    # Grader cache hits and misses (only counted when GRADER_CACHE is set)
+    print(grader_cache_stats())
+
     # # Experiment 2: Few-show prompting (inside the knowledge store, from the second url source)
     # print(rag_app.invoke(input={"question": "Can you explain the concept of few-shot prompting?"}))
 
@@ -1,17 +1,26 @@
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
 import random
+import asyncio
+import json
+import os
+import sqlite3
+from array import array
+from collections import namedtuple
 from urllib.parse import unquote
-from time import sleep
+from time import sleep, monotonic
 from base64 import b64decode
 from random import uniform
 from re import match, sub
 from datetime import datetime
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import QueueHandler
 from multiprocessing import Pool, Queue, cpu_count
 from sys import stdout
-from tqdm import tqdm
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +30,8 @@ logging.basicConfig(
 )
 
 log_queue = Queue()
+# Nothing reads the queue, don't wait at exit for the buffered records to be flushed into it
+log_queue.cancel_join_thread()
 log_handler = QueueHandler(log_queue)
 root_logger = logging.getLogger()
 root_logger.addHandler(log_handler)
@@ -40,15 +51,1143 @@ valid_filters = [
     "pro_video",
 ]
 
+def _media_urls(img_srcs, videos, gif_srcs, is_encrypted, quoted=False):
+    """
+    Convert the media URLs of an instance to Twitter URLs
+
+    :param img_srcs: src of the images
+    :param videos: (data-url, src of the first source) of the videos, data-url is None if the video has none
+    :param gif_srcs: src of the first source of the gifs
+    :param is_encrypted: True if instance uses encrypted media
+    :param quoted: True for the media of a quoted tweet
+    :return: lists of images, videos and gifs
+    """
+    if is_encrypted:
+        pictures = [
+            "https://pbs.twimg.com/"
+            + b64decode(src.split("/")[-1].encode("utf-8")).decode("utf-8").split("?")[0]
+            for src in img_srcs
+        ]
+        videos = [
+            b64decode(data_url.split("/")[-1].encode("utf-8")).decode("utf-8")
+            if data_url is not None
+            else source
+            for data_url, source in videos
+        ]
+        gifs = [
+            "https://" + b64decode(src.split("/")[-1].encode("utf-8")).decode("utf-8")
+            for src in gif_srcs
+        ]
+    else:
+        pictures = [
+            "https://pbs.twimg.com" + unquote(src.split("/pic")[1]).split("?")[0]
+            for src in img_srcs
+        ]
+        videos = [
+            unquote("https" + data_url.split("https")[1])
+            if data_url is not None
+            else unquote(source)
+            if quoted
+            else source
+            for data_url, source in videos
+        ]
+        gifs = [unquote("https://" + src.split("/pic/")[1]) for src in gif_srcs]
+    return pictures, videos, gifs
+
+
+def _user_info(avatar_src, name, username, is_encrypted):
+    """
+    Build the user dictionary of a tweet
+
+    :param avatar_src: src of the avatar image, None if the tweet has none
+    :param name: text of the full name link
+    :param username: text of the username link
+    :param is_encrypted: True if instance uses encrypted media
+    :return: dictionary of user
+    """
+    avatar = ""
+    profile_id = ""
+    if is_encrypted:
+        try:
+            avatar = "https://pbs.twimg.com/" + b64decode(
+                avatar_src.split("/")[-1].encode("utf-8")
+            ).decode("utf-8")
+        except:
+            avatar = ""
+
+        if avatar_src is not None:
+            profile_id = (
+                b64decode(avatar_src.split("/enc/")[1].encode("utf-8"))
+                .decode("utf-8")
+                .split("/profile_images/")[1]
+                .split("/")[0]
+            )
+    else:
+        avatar = "https://pbs.twimg.com" + unquote(avatar_src.split("/pic")[1])
+
+        if avatar_src is not None:
+            profile_id = unquote(avatar_src).split("profile_images/")[1].split("/")[0]
+    return {
+        "name": name.strip(),
+        "username": username.strip(),
+        "profile_id": profile_id,
+        "avatar": avatar,
+    }
+
+
+def _stat_value(text):
+    """
+    Convert a tweet stat to int, 0 if empty
+    """
+    return int(text.strip().replace(",", "") or 0)
+
+
+def _has_class(name):
+    # XPath test of a class, like class_=name in BeautifulSoup
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+class TimelineParser:
+    """
+    Single-pass extraction engine for timeline pages, built on lxml.
+
+    Every timeline item is walked once, keeping the first element of each selector used by
+    the BeautifulSoup helpers of Nitter, so the tweets are the same dictionaries. As in
+    `Nitter._extract_tweet`, links whose href contains "https" count as their href text.
+    """
+
+    _items = etree.XPath(f'//div[{_has_class("timeline-item")}]')
+    _tweets = etree.XPath(
+        '//div[normalize-space(@class)="timeline-item" or normalize-space(@class)="timeline-item thread"]'
+    )
+    _error_panel = etree.XPath(f'//div[{_has_class("error-panel")}]')
+    _protected = etree.XPath('//div[normalize-space(@class)="timeline-header timeline-protected"]')
+    _show_more = etree.XPath(f'//div[{_has_class("show-more")}]')
+    _first_link = etree.XPath(".//a")
+    _first_media_src = etree.XPath('(//img[contains(@src, "/pic/")])[1]/@src')
+    _usernames = etree.XPath(f'//a[{_has_class("username")}]')
+
+    # (tag, class) -> field, for the first match in the whole timeline item
+    ITEM_FIELDS = {
+        ("div", "tweet-content media-body"): "content",
+        ("div", "quote-text"): "quote-text",
+        ("img", "avatar"): "avatar",
+        ("a", "fullname"): "fullname",
+        ("a", "username"): "username",
+        ("span", "tweet-date"): "date",
+        ("div", "retweet-header"): "retweet-header",
+        ("div", "pinned"): "pinned",
+        ("a", "card-container"): "card",
+        ("div", "replying-to"): "replying-to",
+        ("div", "quote"): "quote",
+        ("div", "tweet-body"): "body",
+    }
+    # (tag, class) -> field, for the first match in the quoted tweet
+    QUOTE_FIELDS = {
+        ("div", "tweet-content media-body"): "content",
+        ("div", "quote-text"): "quote-text",
+        ("img", "avatar"): "avatar",
+        ("a", "fullname"): "fullname",
+        ("a", "username"): "username",
+        ("span", "tweet-date"): "date",
+        ("div", "attachments"): "attachments",
+    }
+
+    def parse(self, text):
+        """
+        Parse a page
+
+        :param text: HTML of the page
+        :return: root element of the page
+        """
+        # A parser per page, lxml parsers cannot be shared between threads
+        parser = etree.HTMLParser(encoding="utf-8")
+        root = etree.fromstring(text.encode("utf-8"), parser)
+        if root is None:
+            root = etree.fromstring(b"<html></html>", parser)
+        return root
+
+    def error_message(self, root, instance):
+        """
+        Get the error of a page without tweets, like Nitter._check_error_page
+
+        :param root: page to check
+        :param instance: instance the page comes from
+        :return: error message, or None if the page has tweets
+        """
+        if self._tweets(root):
+            return None
+        panels = self._error_panel(root)
+        if panels:
+            span = self._first(panels[0], "span")
+            return "Fetching error: " + self.text(span, replace_links=False).strip()
+        if self._protected(root):
+            return "Account is protected"
+        return f"Empty page on {instance}"
+
+    def timeline_items(self, root):
+        """
+        :param root: timeline page
+        :return: list of (timeline item, list of its classes)
+        """
+        return [(item, item.get("class").split()) for item in self._items(root)]
+
+    def next_page_href(self, root):
+        """
+        :param root: timeline page
+        :return: href of the last 'show more' button, or None if there is none
+        """
+        buttons = self._show_more(root)
+        if not buttons:
+            return None
+        return self._first_link(buttons[-1])[0].get("href")
+
+    def usernames(self, root):
+        """
+        :param root: following or followers page
+        :return: list of the usernames of the page, with their '@'
+        """
+        return [self.text(link, replace_links=False).strip() for link in self._usernames(root)]
+
+    def media_encrypted(self, root):
+        """
+        :param root: page
+        :return: True if the media URLs of the page are encrypted, False if not, None if it has no media
+        """
+        srcs = self._first_media_src(root)
+        return "/enc/" in srcs[0] if srcs else None
+
+    @staticmethod
+    def _is_replaced(element):
+        # Links to https URLs are replaced by their href, their content is gone
+        return element.tag == "a" and "https" in element.get("href", "")
+
+    def text(self, element, replace_links=True):
+        """
+        Text of an element, with the https links replaced by their href
+
+        :param element: element to get the text of
+        :param replace_links: False to keep the text of the links
+        :return: text of the element
+        """
+        parts = []
+
+        def walk(node):
+            if node.text:
+                parts.append(node.text)
+            for child in node:
+                if isinstance(child.tag, str):
+                    if replace_links and self._is_replaced(child):
+                        parts.append(child.get("href"))
+                    else:
+                        walk(child)
+                if child.tail:
+                    parts.append(child.tail)
+
+        walk(element)
+        return "".join(parts)
+
+    def _scan(self, item):
+        """
+        Walk a timeline item once
+
+        :param item: timeline item
+        :return: dictionaries of the first elements found in the item and in its quoted tweet,
+            the stat elements and the attachments of the tweet body
+        """
+        found, quoted, stats = {}, {}, []
+        body_attachments = []
+        item_fields, quote_fields = self.ITEM_FIELDS, self.QUOTE_FIELDS
+
+        def walk(node, in_quote):
+            for child in node:
+                tag = child.tag
+                if not isinstance(tag, str) or self._is_replaced(child):
+                    continue
+                classes = child.get("class")
+                keys = []
+                if classes:
+                    tokens = classes.split()
+                    keys = [(tag, token) for token in tokens]
+                    if len(tokens) > 1:
+                        keys.append((tag, " ".join(tokens)))
+                for key in keys:
+                    field = item_fields.get(key)
+                    if field and field not in found:
+                        found[field] = child
+                    if in_quote:
+                        field = quote_fields.get(key)
+                        if field and field not in quoted:
+                            quoted[field] = child
+                if tag == "a":
+                    found.setdefault("link", child)
+                    if in_quote:
+                        quoted.setdefault("link", child)
+                elif tag == "span" and ("span", "tweet-stat") in keys:
+                    stats.append(child)
+                elif (
+                    tag == "div"
+                    and not body_attachments
+                    and ("div", "attachments") in keys
+                    and node is found.get("body")
+                ):
+                    body_attachments.append(child)
+                walk(child, in_quote or child is found.get("quote"))
+
+        walk(item, False)
+        return found, quoted, stats, body_attachments[0] if body_attachments else None
+
+    def _descendants(self, element, tags):
+        # Descendants with one of the tags, like element.find_all after the https links are replaced
+        for child in element:
+            if not isinstance(child.tag, str) or self._is_replaced(child):
+                continue
+            if child.tag in tags:
+                yield child
+            yield from self._descendants(child, tags)
+
+    def _first(self, element, tag):
+        return next(self._descendants(element, (tag,)), None)
+
+    def _media(self, attachments, is_encrypted, quoted=False):
+        img_srcs, videos, gif_srcs = [], [], []
+        for element in self._descendants(attachments, ("img", "video")):
+            if element.tag == "img":
+                img_srcs.append(element.get("src"))
+                continue
+            classes = (element.get("class") or "").split()
+            if not classes:
+                data_url = element.get("data-url")
+                videos.append(
+                    (data_url, None)
+                    if data_url is not None
+                    else (None, self._first(element, "source").get("src"))
+                )
+            elif "gif" in classes:
+                gif_srcs.append(self._first(element, "source").get("src"))
+        return _media_urls(img_srcs, videos, gif_srcs, is_encrypted, quoted)
+
+    def _tweet_text(self, fields):
+        if "content" in fields:
+            return self.text(fields["content"]).strip().replace("\n", " ")
+        if "quote-text" in fields:
+            return self.text(fields["quote-text"]).strip().replace("\n", " ")
+        return ""
+
+    def _tweet_link(self, fields):
+        if "link" in fields:
+            return "https://twitter.com" + fields["link"].get("href")
+        return ""
+
+    def _tweet_date(self, fields):
+        if "date" in fields:
+            return self._first(fields["date"], "a").get("title").split("/")[-1].split("#")[0]
+        return ""
+
+    def _user(self, fields, is_encrypted):
+        avatar = fields.get("avatar")
+        return _user_info(
+            avatar.get("src") if avatar is not None else None,
+            self.text(fields["fullname"]),
+            self.text(fields["username"]),
+            is_encrypted,
+        )
+
+    def extract_tweet(self, item, is_encrypted):
+        """
+        Extract content from a timeline item, same output as Nitter._extract_tweet
+
+        :param item: timeline item to extract content from
+        :param is_encrypted: True if instance uses encrypted media
+        :return: dictionary of content for the tweet
+        """
+        found, quoted, stats, attachments = self._scan(item)
+
+        quoted_tweet = found.get("quote")
+        if quoted_tweet is not None:
+            deleted = quoted_tweet.get("class").split() == ["quote", "unavailable"]
+            if "attachments" in quoted:
+                quoted_pictures, quoted_videos, quoted_gifs = self._media(
+                    quoted["attachments"], is_encrypted, quoted=True
+                )
+            else:
+                quoted_pictures, quoted_videos, quoted_gifs = [], [], []
+
+        if attachments is not None:
+            pictures, videos, gifs = self._media(attachments, is_encrypted)
+        else:
+            pictures, videos, gifs = [], [], []
+
+        card = found.get("card")
+        replying_to = found.get("replying-to")
+        return {
+            "link": self._tweet_link(found),
+            "text": self._tweet_text(found),
+            "user": self._user(found, is_encrypted),
+            "date": self._tweet_date(found),
+            "is-retweet": "retweet-header" in found,
+            "is-pinned": "pinned" in found,
+            "external-link": card.get("href") if card is not None else "",
+            "replying-to": [
+                self.text(user).strip()
+                for user in self._descendants(replying_to, ("a",))
+            ]
+            if replying_to is not None
+            else [],
+            "quoted-post": {
+                "link": self._tweet_link(quoted) if not deleted else "",
+                "text": self._tweet_text(quoted) if not deleted else "",
+                "user": self._user(quoted, is_encrypted) if not deleted else {},
+                "date": self._tweet_date(quoted) if not deleted else "",
+                "pictures": quoted_pictures,
+                "videos": quoted_videos,
+                "gifs": quoted_gifs,
+            }
+            if quoted_tweet is not None
+            else {},
+            "stats": {
+                "comments": _stat_value(self.text(self._first(stats[0], "div"))),
+                "retweets": _stat_value(self.text(self._first(stats[1], "div"))),
+                "quotes": _stat_value(self.text(self._first(stats[2], "div"))),
+                "likes": _stat_value(self.text(self._first(stats[3], "div"))),
+            },
+            "pictures": pictures,
+            "videos": videos,
+            "gifs": gifs,
+        }
+
+
+# Item yielded by the asyncio mode: kind is "tweet" (data is a tweet dictionary) or "thread" (data is a list of tweets)
+ScrapedTweet = namedtuple("ScrapedTweet", ["term", "kind", "data"])
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0"
+}
+COOKIES = {"hlsPlayback": "on", "infiniteScroll": ""}
+
+
+class AsyncRateLimiter:
+    def __init__(self, interval, jitter=0.5):
+        """
+        Space the requests sent to one instance, shared by all the coroutines using that instance
+
+        :param interval: average number of seconds between two requests
+        :param jitter: random variation of the interval, as a fraction of it
+        """
+        self.interval = interval
+        self.jitter = jitter
+        self._next_slot = 0.0
+
+    async def wait(self):
+        """
+        Wait for the next free slot. Slots are reserved before sleeping, so concurrent callers queue up
+        """
+        now = monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval * uniform(1 - self.jitter, 1 + self.jitter)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _backoff_delay(attempt, base=0.5, cap=30):
+    """
+    Exponential backoff with jitter
+
+    :param attempt: number of failed attempts so far, starting at 0
+    :param base: delay of the first retry in seconds
+    :param cap: max delay in seconds
+    :return: seconds to wait before the next attempt
+    """
+    return min(base * 2**attempt, cap) * uniform(0.5, 1)
+
+
+class InstanceHealth:
+    def __init__(self, window=20):
+        """
+        Rolling health of one instance with a circuit breaker
+
+        :param window: number of recent requests used for the error rate
+        """
+        self.outcomes = deque(maxlen=window)
+        self.latency = None  # Moving average of the request times, in seconds
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.opened = 0  # Times the circuit opened in a row, sets its cooldown
+        self.open_until = 0.0
+
+    @property
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def state(self):
+        if not self.opened:
+            return "closed"
+        return "open" if monotonic() < self.open_until else "half-open"
+
+
+class InstanceScoreboard:
+    def __init__(
+        self,
+        instances,
+        failure_threshold=3,
+        error_rate_threshold=0.5,
+        cooldown=5,
+        max_cooldown=300,
+        window=20,
+    ):
+        """
+        Latency and error rates of the instances, used to route the requests
+
+        :param instances: list of instances
+        :param failure_threshold: consecutive failures opening the circuit of an instance
+        :param error_rate_threshold: error rate over the window opening the circuit of an instance
+        :param cooldown: seconds an instance is skipped when its circuit opens, doubled every time it fails again
+        :param max_cooldown: max seconds an instance is skipped
+        :param window: number of recent requests used for the error rate
+        """
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.window = window
+        self.health = {instance: InstanceHealth(window) for instance in instances}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled (the scoreboard is copied to the worker processes)
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get(self, instance):
+        if instance not in self.health:
+            self.health[instance] = InstanceHealth(self.window)
+        return self.health[instance]
+
+    def request_started(self, instance):
+        """
+        Count a request in flight, the instances busy with many requests get fewer new ones
+
+        :param instance: instance the request is sent to
+        """
+        with self._lock:
+            self._get(instance).in_flight += 1
+
+    def record(self, instance, ok, latency=None, in_flight=False):
+        """
+        Record the outcome of a request
+
+        :param instance: instance the request was sent to
+        :param ok: False if the instance was unreachable, timed out or rate limited the request
+        :param latency: seconds the request took (a timeout counts too)
+        :param in_flight: True if request_started was called for the request
+        """
+        with self._lock:
+            health = self._get(instance)
+            if in_flight:
+                health.in_flight = max(health.in_flight - 1, 0)
+            health.outcomes.append(ok)
+            if latency is not None:
+                health.latency = (
+                    latency if health.latency is None else 0.7 * health.latency + 0.3 * latency
+                )
+            if ok:
+                health.consecutive_failures = 0
+                if health.opened:
+                    logging.info(f"{instance} recovered")
+                    health.opened = 0
+                    health.outcomes.clear()
+                    health.outcomes.append(True)
+            else:
+                health.consecutive_failures += 1
+                state = health.state
+                if state == "half-open" or (
+                    state == "closed"
+                    and (
+                        health.consecutive_failures >= self.failure_threshold
+                        or (
+                            len(health.outcomes) >= self.failure_threshold
+                            and health.error_rate >= self.error_rate_threshold
+                        )
+                    )
+                ):
+                    cooldown = min(self.cooldown * 2**health.opened, self.max_cooldown)
+                    health.opened += 1
+                    health.open_until = monotonic() + cooldown
+                    logging.warning(f"{instance} is failing, skipping it for {cooldown:.0f}s")
+
+    def is_available(self, instance):
+        """
+        :return: False while the circuit of the instance is open
+        """
+        with self._lock:
+            return self._get(instance).state != "open"
+
+    def score(self, instance):
+        """
+        :return: expected cost of a request to the instance, lower is better
+        """
+        health = self._get(instance)
+        if health.latency is None:
+            # Unknown instances get the average latency so they are tried
+            known = [h.latency for h in self.health.values() if h.latency is not None]
+            latency = sum(known) / len(known) if known else 1.0
+        else:
+            latency = health.latency
+        return latency * (1 + health.in_flight) * (1 + 4 * health.error_rate)
+
+    def choose(self, instances, exclude=()):
+        """
+        Pick the instance for the next request: the best of two random available instances,
+        so the load goes to the fastest healthy instances without all going to a single one
+
+        :param instances: candidate instances
+        :param exclude: instances to avoid if possible (e.g. the ones that just failed)
+        :return: URL of the instance
+        """
+        with self._lock:
+            candidates = [instance for instance in instances if instance not in exclude] or list(instances)
+            available = [instance for instance in candidates if self._get(instance).state != "open"]
+            if not available:
+                # Every circuit is open: use the one closest to a retry instead of stalling
+                return min(candidates, key=lambda instance: self._get(instance).open_until)
+            if len(available) == 1:
+                return available[0]
+            return min(random.sample(available, 2), key=self.score)
+
+    def snapshot(self):
+        """
+        :return: dictionary of the state, latency (seconds) and error rate of every instance
+        """
+        with self._lock:
+            return {
+                instance: {
+                    "state": health.state,
+                    "latency": health.latency,
+                    "error_rate": health.error_rate,
+                }
+                for instance, health in self.health.items()
+            }
+
+
+def _probe_instance(instance, endpoint="/x", timeout=10):
+    """
+    Check that an instance serves a timeline
+
+    :param instance: instance to probe
+    :param endpoint: endpoint to use
+    :param timeout: request timeout in seconds
+    :return: (True if the instance works, seconds the request took)
+    """
+    start = monotonic()
+    try:
+        r = requests.get(instance + endpoint, headers=HEADERS, cookies=COOKIES, timeout=timeout)
+        ok = r.ok and len(BeautifulSoup(r.text, "lxml").find_all("div", class_="timeline-item")) > 0
+    except requests.RequestException:
+        ok = False
+    return ok, monotonic() - start
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        scoreboard,
+        instances,
+        interval=60,
+        endpoint="/x",
+        timeout=10,
+        max_workers=16,
+        on_probe=None,
+    ):
+        """
+        Background thread probing all the instances concurrently and recording the results in a scoreboard
+
+        :param scoreboard: InstanceScoreboard to update
+        :param instances: list of instances to probe
+        :param interval: seconds between two rounds of probes
+        :param endpoint: endpoint to probe
+        :param timeout: probe timeout in seconds
+        :param max_workers: max number of concurrent probes
+        :param on_probe: function called with the list of working instances after every round
+        """
+        self.scoreboard = scoreboard
+        self.instances = list(instances)
+        self.interval = interval
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.on_probe = on_probe
+        self._stop = threading.Event()
+        self._thread = None
+
+    def probe_all(self):
+        """
+        Probe every instance once, concurrently
+
+        :return: list of the working instances
+        """
+        if not self.instances:
+            return []
+        with ThreadPoolExecutor(min(self.max_workers, len(self.instances))) as executor:
+            results = list(
+                executor.map(
+                    lambda instance: _probe_instance(instance, self.endpoint, self.timeout),
+                    self.instances,
+                )
+            )
+        working = []
+        for instance, (ok, latency) in zip(self.instances, results):
+            self.scoreboard.record(instance, ok, latency if ok else None)
+            if ok:
+                working.append(instance)
+        return working
+
+    def _run(self):
+        while not self._stop.is_set():
+            working = self.probe_all()
+            if self.on_probe:
+                self.on_probe(working)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="nitter-health-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class AsyncNitterClient:
+    def __init__(self, nitter, instances, max_concurrency=50, instance_interval=1.0, timeout=10):
+        """
+        Shared connection pool of the asyncio mode
+
+        :param nitter: Nitter scraper, used to check the pages
+        :param instances: list of instances to spread the requests over
+        :param max_concurrency: max number of requests in flight across all instances
+        :param instance_interval: average number of seconds between two requests to the same instance
+        :param timeout: request timeout in seconds
+        """
+        self.nitter = nitter
+        self.instances = list(instances)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.limiters = {
+            instance: AsyncRateLimiter(instance_interval) for instance in self.instances
+        }
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = 0
+        self._encrypted = {}
+        self._encryption_locks = {}
+        self._client = None
+
+    async def __aenter__(self):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("The asyncio mode requires httpx: pip install httpx")
+        self._httpx = httpx
+        self._client = httpx.AsyncClient(
+            headers=HEADERS,
+            cookies=COOKIES,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+
+    def choose_instance(self, exclude=()):
+        """
+        Pick an instance for the next request, routing to the fastest healthy instances
+
+        :param exclude: instances that already failed for this request
+        :return: URL of the instance
+        """
+        return self.nitter.scoreboard.choose(self.instances, exclude)
+
+    async def fetch(self, instance, endpoint):
+        """
+        Download a page from an instance, waiting for its rate limiter and the global concurrency budget.
+        The outcome is recorded in the scoreboard
+
+        :return: HTTP response
+        """
+        await self.limiters[instance].wait()
+        async with self.semaphore:
+            self.requests += 1
+            self.nitter.scoreboard.request_started(instance)
+            start = monotonic()
+            try:
+                r = await self._client.get(instance + endpoint)
+            except self._httpx.HTTPError:
+                self.nitter.scoreboard.record(instance, False, monotonic() - start, in_flight=True)
+                raise
+            ok = r.status_code != 429 and r.status_code < 500
+            self.nitter.scoreboard.record(instance, ok, r.elapsed.total_seconds(), in_flight=True)
+            return r
+
+    async def get_page(self, endpoint, max_retries=5, timeline=False):
+        """
+        Download a page, retrying on other instances with exponential backoff
+
+        :param endpoint: endpoint to use
+        :param max_retries: max number of retries
+        :param timeline: True for a timeline page, parsed with the timeline parser if there is one
+        :return: (page content, instance), or (None, None) if the page could not be fetched
+        """
+        failed = set()
+        for attempt in range(max_retries):
+            instance = self.choose_instance(exclude=failed)
+            try:
+                r = await self.fetch(instance, endpoint)
+            except self._httpx.HTTPError as e:
+                logging.warning(f"{instance} unreachable ({e.__class__.__name__})")
+            else:
+                soup = self.nitter._check_error_page(
+                    self.nitter._parse_page(r.text, timeline), instance
+                )
+                if r.is_success:
+                    return soup, instance
+                if r.status_code != 429 and r.status_code < 500:
+                    # Retrying would not fix it (e.g. user not found)
+                    return None, None
+                logging.warning(f"Error fetching {instance} (HTTP {r.status_code})")
+            failed.add(instance)
+            await asyncio.sleep(_backoff_delay(attempt))
+
+        logging.warning("Max retries reached. Check your request and try again.")
+        return None, None
+
+    async def is_encrypted(self, instance, soup=None):
+        """
+        Check (once per instance) if an instance uses encrypted media, from the media of a page
+        of the instance if it has any, else by fetching a profile page
+
+        :param instance: URL of the instance
+        :param soup: page of the instance. Default is None
+        :return: True if encrypted, False otherwise
+        """
+        if instance not in self._encrypted and soup is not None:
+            encrypted = self.nitter._page_encryption(soup)
+            if encrypted is not None:
+                self._encrypted[instance] = encrypted
+        if instance not in self._encrypted:
+            async with self._encryption_locks.setdefault(instance, asyncio.Lock()):
+                if instance not in self._encrypted:
+                    try:
+                        r = await self.fetch(instance, "/x")
+                    except self._httpx.HTTPError:
+                        r = None
+                    soup = BeautifulSoup(r.text, "lxml") if r is not None and r.is_success else None
+                    if soup is None or not soup.find("a", class_="profile-card-avatar"):
+                        # Checked again by the next page of this instance
+                        logging.warning(f"Could not check if {instance} uses encrypted media")
+                        return False
+                    self._encrypted[instance] = self.nitter._is_encrypted_page(soup)
+        return self._encrypted[instance]
+
+
+class JsonlSink:
+    def __init__(self, path):
+        """
+        Append-only JSON lines file, one scraped tweet or thread per line
+
+        :param path: path of the file
+        """
+        self.path = path
+        self._file = open(path, "ab")
+
+    @property
+    def offset(self):
+        return self._file.tell()
+
+    def write(self, items):
+        """
+        Append items and flush them to disk
+
+        :param items: list of ScrapedTweet
+        :return: offset of the end of the file
+        """
+        self._file.write(
+            b"".join(
+                json.dumps(item._asdict(), ensure_ascii=False).encode("utf-8") + b"\n"
+                for item in items
+            )
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self.offset
+
+    def truncate(self, offset):
+        """
+        Drop what was written after an offset (the pages written after the last checkpoint)
+        """
+        if offset < self.offset:
+            self._file.truncate(offset)
+            self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    def __init__(self, path):
+        """
+        Directory of Parquet files, one file per scraped page. The tweets and threads are stored as JSON
+        in the 'data' column, next to their 'term', 'kind' and 'link'. Requires pyarrow
+
+        :param path: path of the directory
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The Parquet sink requires pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith("part-"))
+
+    @property
+    def offset(self):
+        return len(self._parts())
+
+    def write(self, items):
+        """
+        Write the items of a page to a new file
+
+        :param items: list of ScrapedTweet
+        :return: number of files
+        """
+        table = self._pa.table(
+            {
+                "term": [item.term for item in items],
+                "kind": [item.kind for item in items],
+                "link": [
+                    item.data["link"] if item.kind == "tweet" else item.data[0]["link"]
+                    for item in items
+                ],
+                "data": [json.dumps(item.data, ensure_ascii=False) for item in items],
+            }
+        )
+        offset = self.offset
+        part = os.path.join(self.path, f"part-{offset:06d}.parquet")
+        self._pa.parquet.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+        return offset + 1
+
+    def truncate(self, offset):
+        """
+        Drop the files written after an offset (the pages written after the last checkpoint)
+        """
+        for name in self._parts()[offset:]:
+            os.remove(os.path.join(self.path, name))
+
+    def close(self):
+        pass
+
+
+class ScrapeState:
+    def __init__(self, path):
+        """
+        Persistent link index and checkpoints of the streaming mode. Both are in one SQLite file,
+        so the links of a page and the cursor of the next page are committed together
+
+        :param path: path of the SQLite file
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS links (link TEXT PRIMARY KEY)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints (job TEXT PRIMARY KEY, endpoint TEXT, "
+            "collected INTEGER NOT NULL, sink_offset INTEGER NOT NULL, done INTEGER NOT NULL)"
+        )
+        self._connection.commit()
+        self._pending = set()
+
+    # Link index, used like the already_scraped set of a search
+    def __contains__(self, link):
+        return (
+            link in self._pending
+            or self._connection.execute("SELECT 1 FROM links WHERE link = ?", (link,)).fetchone()
+            is not None
+        )
+
+    def add(self, link):
+        self._pending.add(link)
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM links").fetchone()[0] + len(self._pending)
+
+    # Checkpoints
+    def get_checkpoint(self, job):
+        """
+        :param job: key of the search
+        :return: dictionary with the endpoint of the next page, the number of tweets and threads collected,
+            the sink offset and True if the search is done, or None if there is no checkpoint
+        """
+        row = self._connection.execute(
+            "SELECT endpoint, collected, sink_offset, done FROM checkpoints WHERE job = ?", (job,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"endpoint": row[0], "collected": row[1], "sink_offset": row[2], "done": bool(row[3])}
+
+    def sink_offset(self):
+        """
+        :return: sink offset of the last committed page, None if nothing was committed
+        """
+        return self._connection.execute("SELECT MAX(sink_offset) FROM checkpoints").fetchone()[0]
+
+    def commit(self, job, endpoint, collected, sink_offset):
+        """
+        Commit the links added since the last commit with the checkpoint of a search
+
+        :param job: key of the search
+        :param endpoint: endpoint of the next page, None if the search is done
+        :param collected: number of tweets and threads collected
+        :param sink_offset: offset of the sink after the page
+        """
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO links (link) VALUES (?)", [(link,) for link in self._pending]
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (job, endpoint, collected, sink_offset, done) VALUES (?, ?, ?, ?, ?)",
+                (job, endpoint, collected, sink_offset, endpoint is None),
+            )
+        self._pending.clear()
+
+    def rollback(self):
+        """
+        Forget the links added since the last commit
+        """
+        self._pending.clear()
+
+    def reset(self, job):
+        """
+        Delete the checkpoint of a search
+        """
+        with self._connection:
+            self._connection.execute("DELETE FROM checkpoints WHERE job = ?", (job,))
+
+    def close(self):
+        self._connection.close()
+
+
+FollowGraph = namedtuple("FollowGraph", ["edges", "usernames"])
+
+
+class FollowGraphWriter:
+    def __init__(self, path):
+        """
+        Edge list of a follow graph, written to disk as it is crawled. 'edges.int32' holds the
+        (follower id, followed id) pairs as native C ints and line N of 'usernames.txt' is the
+        username of id N. Read it back with load_follow_graph
+
+        :param path: directory of the graph, its previous content is replaced
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.ids = {}
+        self.edges = 0
+        self._edges = open(os.path.join(path, "edges.int32"), "wb")
+        self._usernames = open(os.path.join(path, "usernames.txt"), "w", encoding="utf-8")
+
+    def id(self, username):
+        """
+        :param username: username without '@'
+        :return: id of the username, assigned on first sight
+        """
+        user_id = self.ids.get(username)
+        if user_id is None:
+            user_id = self.ids[username] = len(self.ids)
+            self._usernames.write(username + "\n")
+        return user_id
+
+    def add_page(self, username, kind, names):
+        """
+        Add the edges of a following or followers page
+
+        :param username: user whose list it is
+        :param kind: 'following' or 'followers'
+        :param names: usernames of the page
+        """
+        user_id = self.id(username)
+        edges = array("i")
+        for name in names:
+            other_id = self.id(name.lstrip("@"))
+            edges.extend((user_id, other_id) if kind == "following" else (other_id, user_id))
+        edges.tofile(self._edges)
+        self.edges += len(edges) // 2
+
+    def close(self):
+        self._edges.close()
+        self._usernames.close()
+
+
+def load_follow_graph(path, unique=True, mmap=False):
+    """
+    Load a follow graph written by FollowGraphWriter. Requires numpy
+
+    :param path: directory of the graph
+    :param unique: True to drop the edges seen from both ends (A's following and B's followers). Default is True
+    :param mmap: True to memory-map the edges instead of reading them (implies unique=False). Default is False
+    :return: FollowGraph(edges, usernames), edges being a (n, 2) int array of (follower id, followed id)
+        and usernames the list of usernames indexed by id
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("Loading a follow graph requires numpy: pip install numpy")
+    edges_path = os.path.join(path, "edges.int32")
+    if mmap:
+        if os.path.getsize(edges_path):
+            edges = np.memmap(edges_path, dtype=np.intc, mode="r").reshape(-1, 2)
+        else:
+            edges = np.empty((0, 2), dtype=np.intc)
+    else:
+        edges = np.fromfile(edges_path, dtype=np.intc).reshape(-1, 2)
+        if unique:
+            edges = np.unique(edges, axis=0)
+    with open(os.path.join(path, "usernames.txt"), encoding="utf-8") as f:
+        usernames = f.read().splitlines()
+    return FollowGraph(edges, usernames)
+
 
 class Nitter:
-    def __init__(self, instances=None, log_level=1, skip_instance_check=False):
+    def __init__(self, instances=None, log_level=1, skip_instance_check=False, parser="lxml"):
         """
         Nitter scraper
         :param instances: accepts a list of instances or a single instance in this format: "https://{host}:{port}", e.g. "http://localhost:8080
         :param log_level: logging level
         :param skip_instance_check: True if the health check of all instances and the instance change during execution should be skipped
+        :param parser: engine extracting the tweets of the timelines, 'lxml' (single pass, faster) or 'bs4' (BeautifulSoup). Both return the same tweets
         """
+        if parser == "lxml":
+            self.timeline_parser = TimelineParser()
+        elif parser == "bs4":
+            self.timeline_parser = None
+        else:
+            raise ValueError("Invalid parser. Use 'lxml' or 'bs4'.")
         if instances:
             # check instances type is list or str
             if isinstance(instances, list):
@@ -63,6 +1202,9 @@ class Nitter:
             raise ValueError("Could not fetch instances")
         self.working_instances = []
         self.skip_instance_check = skip_instance_check
+        self.scoreboard = InstanceScoreboard(self.instances)
+        self._health_monitor = None
+        self._encrypted_instances = {}
         if skip_instance_check:
             self.working_instances = self.instances
         else:
@@ -78,8 +1220,6 @@ class Nitter:
         logger.setLevel(log_level)
 
         self.retry_count = 0
-        self.cooldown_count = 0
-        self.session_reset = False
         self.instance = ""
         self.r = None
 
@@ -99,22 +1239,51 @@ class Nitter:
         self.r = requests.Session()
         self.r.headers.update(
             {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0",
+                **HEADERS,
                 "Host": self.instance.split("://")[1],
             }
         )
 
-    def _is_instance_encrypted(self):
+    def _is_instance_encrypted(self, soup=None):
         """
-        Check if the current instance uses encrypted media
+        Check if the current instance uses encrypted media. The media of the page being scraped are
+        used if it has any, a profile page is fetched otherwise. The result is kept per instance
 
+        :param soup: page of the current instance. Default is None
         :return: True if encrypted, False otherwise
         """
-        soup = self._get_page("/x")
+        if self.instance not in self._encrypted_instances:
+            encrypted = self._page_encryption(soup) if soup is not None else None
+            if encrypted is None:
+                profile = self._get_page("/x")
 
-        if soup is None:
-            raise ValueError("Invalid instance")
+                if profile is None:
+                    raise ValueError("Invalid instance")
+
+                encrypted = self._is_encrypted_page(profile)
+            self._encrypted_instances[self.instance] = encrypted
+
+        return self._encrypted_instances[self.instance]
+
+    def _page_encryption(self, soup):
+        """
+        Check if the media of a page are encrypted
 
+        :param soup: page
+        :return: True if encrypted, False if not, None if the page has no media
+        """
+        if not isinstance(soup, BeautifulSoup):
+            return self.timeline_parser.media_encrypted(soup)
+        img = soup.find("img", src=lambda src: src and "/pic/" in src)
+        return "/enc/" in img["src"] if img else None
+
+    def _is_encrypted_page(self, soup):
+        """
+        Check if a profile page uses encrypted media
+
+        :param soup: profile page
+        :return: True if encrypted, False otherwise
+        """
         if (
             soup.find("a", class_="profile-card-avatar").find("img")
             and "/enc/"
@@ -138,53 +1307,96 @@ class Nitter:
 
     def _test_all_instances(self, endpoint, no_print=False):
         """
-        Test all Nitter instances when a high number of retries is detected
+        Test all Nitter instances concurrently when a high number of retries is detected
 
         :param endpoint: endpoint to use
         :param no_print: True if no output should be printed
         """
         if not no_print:
             print("High number of retries detected. Testing all instances...")
-        working_instances = []
-
-        for instance in tqdm(self.instances, desc="Testing instances"):
-            self._initialize_session(instance)
-            req_session = requests.Session()
-            req_session.headers.update(
-                {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0"
-                }
-            )
-            try:
-                r = req_session.get(
-                    instance + endpoint,
-                    cookies={"hlsPlayback": "on"},
-                    timeout=10,
-                )
-                if r.ok:
-                    soup = BeautifulSoup(r.text, "lxml")
-                    if soup is not None and len(
-                        soup.find_all("div", class_="timeline-item")
-                    ):
-                        working_instances.append(instance)
-            except:
-                pass
+        working_instances = HealthMonitor(
+            self.scoreboard, self.instances, endpoint=endpoint
+        ).probe_all()
         if not no_print:
             print("New working instances:", ", ".join(working_instances))
         self.working_instances = working_instances
 
+    def _update_working_instances(self, working_instances):
+        # Keep the previous instances if a round of probes finds none, the circuit breakers skip them anyway
+        if working_instances:
+            self.working_instances = working_instances
+
+    def start_health_monitor(self, interval=60, endpoint="/x", timeout=10):
+        """
+        Probe all the instances in a background thread, so the requests are routed with fresh latency and error rates
+
+        :param interval: seconds between two rounds of probes. Default is 60
+        :param endpoint: endpoint to probe. Default is '/x'
+        :param timeout: probe timeout in seconds. Default is 10
+        """
+        self.stop_health_monitor()
+        self._health_monitor = HealthMonitor(
+            self.scoreboard,
+            self.instances,
+            interval=interval,
+            endpoint=endpoint,
+            timeout=timeout,
+            on_probe=None if self.skip_instance_check else self._update_working_instances,
+        ).start()
+
+    def stop_health_monitor(self):
+        """
+        Stop the background health monitor
+        """
+        if self._health_monitor is not None:
+            self._health_monitor.stop()
+            self._health_monitor = None
+
+    def instance_health(self):
+        """
+        Get the health of the instances
+
+        :return: dictionary of the state ('closed' when healthy, 'open' while skipped, 'half-open' when about to be retried), latency (seconds) and error rate of every instance
+        """
+        return self.scoreboard.snapshot()
+
+    def __getstate__(self):
+        # The health monitor thread stays in the main process
+        state = self.__dict__.copy()
+        state["_health_monitor"] = None
+        return state
+
     def _get_new_instance(self, message):
-        instance = self.get_random_instance()
+        instance = self.scoreboard.choose(self.working_instances, exclude={self.instance})
         logging.warning(f"{message}. Trying {instance}")
         return instance
 
-    def _check_error_page(self, soup):
+    def _parse_page(self, text, timeline=False):
+        """
+        Parse a page
+
+        :param text: HTML of the page
+        :param timeline: True for a timeline page, parsed with the timeline parser if there is one
+        :return: BeautifulSoup of the page, or lxml root of the page for the timeline parser
+        """
+        if timeline and self.timeline_parser:
+            return self.timeline_parser.parse(text)
+        return BeautifulSoup(text, "lxml")
+
+    def _check_error_page(self, soup, instance=None):
         """
         Check if the page contains an error. If so, print the error and return None
 
         :param soup: page to check
+        :param instance: instance the page comes from. Default is the current instance
         :return: None if error is found, soup otherwise
         """
+        if not isinstance(soup, BeautifulSoup):
+            message = self.timeline_parser.error_message(soup, instance or self.instance)
+            if message is None:
+                return soup
+            logging.warning(message)
+            return None
         if not soup.find(
             lambda tag: tag.name == "div"
             and (
@@ -201,107 +1413,86 @@ class Nitter:
                 if soup.find("div", class_="timeline-header timeline-protected"):
                     message = "Account is protected"
                 else:
-                    message = f"Empty page on {self.instance}"
+                    message = f"Empty page on {instance or self.instance}"
             logging.warning(message)
             soup = None
         return soup
 
-    def _get_page(self, endpoint, max_retries=5):
+    def _get_page(self, endpoint, max_retries=5, timeline=False):
         """
         Download page from Nitter instance
 
         :param endpoint: endpoint to use
         :param max_retries: max number of retries, default 5
+        :param timeline: True for a timeline page, parsed with the timeline parser if there is one
         :return: page content, or None if max retries reached
         """
-        keep_trying = True
         soup = None
-        while keep_trying and (self.retry_count < max_retries):
+        while self.retry_count < max_retries:
+            start = monotonic()
             try:
                 r = self.r.get(
                     self.instance + endpoint,
-                    cookies={"hlsPlayback": "on", "infiniteScroll": ""},
+                    cookies=COOKIES,
                     timeout=10,
                 )
-            except:
-                if self.retry_count == max_retries // 2:
-                    if not self.skip_instance_check:
-                        self._test_all_instances(endpoint)
-                        if not self.working_instances:
-                            logging.warning(
-                                "All instances are unreachable. Check your request and try again."
-                            )
-                            return None
-                if not self.skip_instance_check:
-                    self._initialize_session(
-                        instance=self._get_new_instance(f"{self.instance} unreachable")
+            except requests.RequestException:
+                r = None
+            if r is not None:
+                soup = self._check_error_page(self._parse_page(r.text, timeline))
+                if r.ok or (r.status_code != 429 and r.status_code < 500):
+                    # Success, or an error that retrying would not fix (e.g. user not found)
+                    self.scoreboard.record(self.instance, True, r.elapsed.total_seconds())
+                    break
+                soup = None
+
+            # Unreachable, rate limited or broken instance
+            self.scoreboard.record(self.instance, False, monotonic() - start)
+            if r is None:
+                message = f"{self.instance} unreachable"
+            else:
+                message = f"Error fetching {self.instance} (HTTP {r.status_code})"
+            if self.retry_count == max_retries // 2 and not self.skip_instance_check:
+                self._test_all_instances(endpoint)
+                if not self.working_instances:
+                    logging.warning(
+                        "All instances are unreachable. Check your request and try again."
                     )
-                self.retry_count += 1
-                self.cooldown_count = 0
-                self.session_reset = True
-                sleep(1)
-                continue
-            soup = BeautifulSoup(r.text, "lxml")
-            if r.ok:
-                self.session_reset = False
-                soup = self._check_error_page(soup)
-                keep_trying = False
+                    self.retry_count = 0
+                    return None
+            if not self.skip_instance_check:
+                self._initialize_session(instance=self._get_new_instance(message))
             else:
-                soup = self._check_error_page(soup)
-                if soup is None:
-                    keep_trying = False
-                else:
-                    if self.retry_count == max_retries // 2:
-                        if not self.skip_instance_check:
-                            self._test_all_instances(endpoint)
-                            if not self.working_instances:
-                                logging.warning(
-                                    "All instances are unreachable. Check your request and try again."
-                                )
-                                soup = None
-                                keep_trying = False
-                        else:
-                            self.retry_count += 1
-                    else:
-                        if "cursor" in endpoint:
-                            if not self.session_reset:
-                                logging.warning(
-                                    "Cooldown reached, trying again in 20 seconds"
-                                )
-                                self.cooldown_count += 1
-                                sleep(20)
-                            if self.cooldown_count >= 5 and not self.session_reset:
-                                if not self.skip_instance_check:
-                                    self._initialize_session()
-                                else:
-                                    self._initialize_session(self.instance)
-                                self.session_reset = True
-                                self.cooldown_count = 0
-                            elif self.session_reset:
-                                if not self.skip_instance_check:
-                                    self._initialize_session(
-                                        self._get_new_instance(
-                                            f"Error fetching {self.instance}"
-                                        )
-                                    )
-                        else:
-                            self.cooldown_count = 0
-                            if not self.skip_instance_check:
-                                self._initialize_session(
-                                    self._get_new_instance(
-                                        f"Error fetching {self.instance}"
-                                    )
-                                )
-                        self.retry_count += 1
-            sleep(2)
-
-        if self.retry_count >= max_retries:
+                logging.warning(message)
+            sleep(_backoff_delay(self.retry_count))
+            self.retry_count += 1
+        else:
             logging.warning("Max retries reached. Check your request and try again.")
             soup = None
         self.retry_count = 0
 
         return soup
 
+    def _get_media_sources(self, attachments):
+        """
+        Collect the media sources of an attachments block
+
+        :param attachments: attachments block
+        :return: src of the images, (data-url, source) of the videos and src of the gifs
+        """
+        return (
+            [img["src"] for img in attachments.find_all("img")],
+            [
+                (video["data-url"], None)
+                if "data-url" in video.attrs
+                else (None, video.find("source")["src"])
+                for video in attachments.find_all("video")
+                # Videos without a class (class_="" no longer matches them since BeautifulSoup 4.13)
+                if not video.get("class")
+            ],
+            [gif.source["src"] for gif in attachments.find_all("video", class_="gif")],
+        )
+
     def _get_quoted_media(self, quoted_tweet, is_encrypted):
         """
         Extract media from a quoted tweet
@@ -310,60 +1501,12 @@ class Nitter:
         :param is_encrypted: True if instance uses encrypted media
         :return: lists of images, videos and gifs, or empty lists if no media is found
         """
-        quoted_pictures, quoted_videos, quoted_gifs = [], [], []
-        if quoted_tweet.find("div", class_="attachments"):
-            if is_encrypted:
-                quoted_pictures = [
-                    "https://pbs.twimg.com/"
-                    + b64decode(img["src"].split("/")[-1].encode("utf-8"))
-                    .decode("utf-8")
-                    .split("?")[0]
-                    for img in quoted_tweet.find("div", class_="attachments").find_all(
-                        "img"
-                    )
-                ]
-                quoted_videos = [
-                    b64decode(video["data-url"].split("/")[-1].encode("utf-8")).decode(
-                        "utf-8"
-                    )
-                    if "data-url" in video.attrs
-                    else video.find("source")["src"]
-                    for video in quoted_tweet.find(
-                        "div", class_="attachments"
-                    ).find_all("video", class_="")
-                ]
-                quoted_gifs = [
-                    "https://"
-                    + b64decode(
-                        gif.source["src"].split("/")[-1].encode("utf-8")
-                    ).decode("utf-8")
-                    for gif in quoted_tweet.find("div", class_="attachments").find_all(
-                        "video", class_="gif"
-                    )
-                ]
-            else:
-                quoted_pictures = [
-                    "https://pbs.twimg.com"
-                    + unquote(img["src"].split("/pic")[1]).split("?")[0]
-                    for img in quoted_tweet.find("div", class_="attachments").find_all(
-                        "img"
-                    )
-                ]
-                quoted_videos = [
-                    unquote("https" + video["data-url"].split("https")[1])
-                    if "data-url" in video.attrs
-                    else unquote(video.find("source")["src"])
-                    for video in quoted_tweet.find(
-                        "div", class_="attachments"
-                    ).find_all("video", class_="")
-                ]
-                quoted_gifs = [
-                    unquote("https://" + gif.source["src"].split("/pic/")[1])
-                    for gif in quoted_tweet.find("div", class_="attachments").find_all(
-                        "video", class_="gif"
-                    )
-                ]
-        return quoted_pictures, quoted_videos, quoted_gifs
+        attachments = quoted_tweet.find("div", class_="attachments")
+        if attachments:
+            return _media_urls(
+                *self._get_media_sources(attachments), is_encrypted, quoted=True
+            )
+        return [], [], []
 
     def _get_tweet_media(self, tweet, is_encrypted):
         """
@@ -373,62 +1516,12 @@ class Nitter:
         :param is_encrypted: True if instance uses encrypted media
         :return: lists of images, videos and gifs, or empty lists if no media is found
         """
-        pictures, videos, gifs = [], [], []
-        if tweet.find("div", class_="tweet-body").find(
+        attachments = tweet.find("div", class_="tweet-body").find(
             "div", class_="attachments", recursive=False
-        ):
-            if is_encrypted:
-                pictures = [
-                    "https://pbs.twimg.com/"
-                    + b64decode(img["src"].split("/")[-1].encode("utf-8"))
-                    .decode("utf-8")
-                    .split("?")[0]
-                    for img in tweet.find("div", class_="tweet-body")
-                    .find("div", class_="attachments", recursive=False)
-                    .find_all("img")
-                ]
-                videos = [
-                    b64decode(video["data-url"].split("/")[-1].encode("utf-8")).decode(
-                        "utf-8"
-                    )
-                    if "data-url" in video.attrs
-                    else video.find("source")["src"]
-                    for video in tweet.find("div", class_="tweet-body")
-                    .find("div", class_="attachments", recursive=False)
-                    .find_all("video", class_="")
-                ]
-                gifs = [
-                    "https://"
-                    + b64decode(
-                        gif.source["src"].split("/")[-1].encode("utf-8")
-                    ).decode("utf-8")
-                    for gif in tweet.find("div", class_="tweet-body")
-                    .find("div", class_="attachments", recursive=False)
-                    .find_all("video", class_="gif")
-                ]
-            else:
-                pictures = [
-                    "https://pbs.twimg.com"
-                    + unquote(img["src"].split("/pic")[1]).split("?")[0]
-                    for img in tweet.find("div", class_="tweet-body")
-                    .find("div", class_="attachments", recursive=False)
-                    .find_all("img")
-                ]
-                videos = [
-                    unquote("https" + video["data-url"].split("https")[1])
-                    if "data-url" in video.attrs
-                    else video.find("source")["src"]
-                    for video in tweet.find("div", class_="tweet-body")
-                    .find("div", class_="attachments", recursive=False)
-                    .find_all("video", class_="")
-                ]
-                gifs = [
-                    unquote("https://" + gif.source["src"].split("/pic/")[1])
-                    for gif in tweet.find("div", class_="tweet-body")
-                    .find("div", class_="attachments", recursive=False)
-                    .find_all("video", class_="gif")
-                ]
-        return pictures, videos, gifs
+        )
+        if attachments:
+            return _media_urls(*self._get_media_sources(attachments), is_encrypted)
+        return [], [], []
 
     def _get_tweet_stats(self, tweet):
         """
@@ -437,35 +1530,12 @@ class Nitter:
         :param tweet: tweet to extract stats from
         :return: dictionary of stats. If a stat is not found, it is set to 0
         """
+        stats = tweet.find_all("span", class_="tweet-stat")
         return {
-            "comments": int(
-                tweet.find_all("span", class_="tweet-stat")[0]
-                .find("div")
-                .text.strip()
-                .replace(",", "")
-                or 0
-            ),
-            "retweets": int(
-                tweet.find_all("span", class_="tweet-stat")[1]
-                .find("div")
-                .text.strip()
-                .replace(",", "")
-                or 0
-            ),
-            "quotes": int(
-                tweet.find_all("span", class_="tweet-stat")[2]
-                .find("div")
-                .text.strip()
-                .replace(",", "")
-                or 0
-            ),
-            "likes": int(
-                tweet.find_all("span", class_="tweet-stat")[3]
-                .find("div")
-                .text.strip()
-                .replace(",", "")
-                or 0
-            ),
+            "comments": _stat_value(stats[0].find("div").text),
+            "retweets": _stat_value(stats[1].find("div").text),
+            "quotes": _stat_value(stats[2].find("div").text),
+            "likes": _stat_value(stats[3].find("div").text),
         }
 
     def _get_user(self, tweet, is_encrypted):
@@ -476,46 +1546,13 @@ class Nitter:
         :param is_encrypted: True if instance uses encrypted media
         :return: dictionary of user
         """
-        avatar = ""
-        profile_id = ""
-        if is_encrypted:
-            try:
-                avatar = "https://pbs.twimg.com/" + b64decode(
-                    tweet.find("img", class_="avatar")["src"]
-                    .split("/")[-1]
-                    .encode("utf-8")
-                ).decode("utf-8")
-            except:
-                avatar = ""
-
-            if tweet.find("img", class_="avatar"):
-                profile_id = (
-                    b64decode(
-                        tweet.find("img", class_="avatar")["src"]
-                        .split("/enc/")[1]
-                        .encode("utf-8")
-                    )
-                    .decode("utf-8")
-                    .split("/profile_images/")[1]
-                    .split("/")[0]
-                )
-        else:
-            avatar = "https://pbs.twimg.com" + unquote(
-                tweet.find("img", class_="avatar")["src"].split("/pic")[1]
-            )
-
-            if tweet.find("img", class_="avatar"):
-                profile_id = (
-                    unquote(tweet.find("img", class_="avatar")["src"])
-                    .split("profile_images/")[1]
-                    .split("/")[0]
-                )
-        return {
-            "name": tweet.find("a", class_="fullname").text.strip(),
-            "username": tweet.find("a", class_="username").text.strip(),
-            "profile_id": profile_id,
-            "avatar": avatar,
-        }
+        avatar = tweet.find("img", class_="avatar")
+        return _user_info(
+            avatar.get("src") if avatar else None,
+            tweet.find("a", class_="fullname").text,
+            tweet.find("a", class_="username").text,
+            is_encrypted,
+        )
 
     def _get_tweet_date(self, tweet):
         """
@@ -654,30 +1691,276 @@ class Nitter:
             "gifs": gifs,
         }
 
-    def _check_date_validity(self, date):
-        """
-        Check if a date is valid
+    def _check_date_validity(self, date):
+        """
+        Check if a date is valid
+
+        :param date: date to check
+        :return: True if date is valid
+        """
+        to_return = True
+        if not match(r"^\d{4}-\d{2}-\d{2}$", date):
+            to_return = False
+        try:
+            year, month, day = [int(number) for number in date.split("-")]
+            datetime(year=year, month=month, day=day)
+        except:
+            to_return = False
+
+        if not (
+            datetime(year=2006, month=3, day=21)
+            < datetime(year=year, month=month, day=day)
+            <= datetime.now()
+        ):
+            to_return = False
+
+        return to_return
+
+    def _build_search_endpoint(
+        self,
+        term,
+        mode,
+        since,
+        until,
+        near,
+        language,
+        to,
+        replies,
+        filters,
+        exclude,
+    ):
+        """
+        Build the endpoint of the first page of a search
+
+        :param term: term to seach for
+        :param mode: search mode.
+        :param since: date to start scraping from.
+        :param until: date to stop scraping at.
+        :param near: location to search near.
+        :param language: language of the tweets.
+        :param to: user to which the tweets are directed.
+        :param replies: True if both tweets and replies are needed.
+        :param filters: list of filters to apply.
+        :param exclude: list of filters to exclude.
+        :return: endpoint of the first page
+        """
+        if mode == "hashtag":
+            endpoint = "/search?f=tweets&q=%23" + term
+        elif mode == "term":
+            endpoint = "/search?f=tweets&q=" + term
+        elif mode == "user":
+            if since or until or filters or exclude or near:
+                endpoint = f"/{term}/search?f=tweets&q="
+            else:
+                endpoint = f"/{term}"
+                if replies and not filters:
+                    endpoint += "/with_replies"
+        else:
+            raise ValueError("Invalid mode. Use 'term', 'hashtag', or 'user'.")
+
+        if language:
+            endpoint += f"+lang%3A{language}"
+
+        if to:
+            endpoint += f"+to%3A{to}"
+
+        if since:
+            if self._check_date_validity(since):
+                endpoint += f"&since={since}"
+            else:
+                raise ValueError(
+                    "Invalid 'since' date. Use the YYYY-MM-DD format and make sure the date is valid."
+                )
+
+        if until:
+            if self._check_date_validity(until):
+                endpoint += f"&until={until}"
+            else:
+                raise ValueError(
+                    "Invalid 'until' date. Use the YYYY-MM-DD format and make sure the date is valid."
+                )
+
+        if near:
+            endpoint += f"&near={near}"
+
+        if filters:
+            for f in filters:
+                if f not in valid_filters:
+                    raise ValueError(
+                        f"Invalid filter '{f}'. Valid filters are: {', '.join(valid_filters)}"
+                    )
+                endpoint += f"&f-{f}=on"
+
+        if exclude:
+            for e in exclude:
+                if e not in valid_filters:
+                    raise ValueError(
+                        f"Invalid exclusion filter '{e}'. Valid filters are: {', '.join(valid_filters)}"
+                    )
+                endpoint += f"&e-{e}=on"
+
+        if mode != "user":
+            if "?" in endpoint:
+                endpoint += "&scroll=false"
+            else:
+                endpoint += "?scroll=false"
+
+        return endpoint
+
+    def _collect_page(self, soup, is_encrypted, already_scraped, number, collected=0):
+        """
+        Extract the tweets and threads of one timeline page
+
+        :param soup: page to extract from
+        :param is_encrypted: True if instance uses encrypted media
+        :param already_scraped: set of the links scraped so far, updated in place
+        :param number: max number of tweets and threads to scrape in total
+        :param collected: number of tweets and threads scraped before this page
+        :return: lists of tweets and threads of the page, and True if the limit was reached
+        """
+        tweets, threads = [], []
+        thread = []
+
+        if isinstance(soup, BeautifulSoup):
+            items = [
+                (tweet, tweet["class"])
+                for tweet in soup.find_all("div", class_="timeline-item")
+            ]
+            extract_tweet = self._extract_tweet
+        else:
+            items = self.timeline_parser.timeline_items(soup)
+            extract_tweet = self.timeline_parser.extract_tweet
+
+        for tweet, classes in items:
+            if len(classes) == 1:
+                to_append = extract_tweet(tweet, is_encrypted)
+                # Extract tweets
+                if collected + len(tweets) + len(threads) < number:
+                    if to_append["link"] not in already_scraped:
+                        tweets.append(to_append)
+                        already_scraped.add(to_append["link"])
+                else:
+                    return tweets, threads, True
+            else:
+                if "thread" in classes:
+                    to_append = extract_tweet(tweet, is_encrypted)
+                    # Extract threads
+                    if to_append["link"] not in already_scraped:
+                        thread.append(to_append)
+                        already_scraped.add(to_append["link"])
+
+                    if len(classes) == 3:
+                        threads.append(thread)
+                        thread = []
+
+        return tweets, threads, False
+
+    def _get_next_page(self, soup, term, mode, since, until):
+        """
+        Get the endpoint of the next page from the 'show more' button
+
+        :param soup: current page
+        :param term: term being searched
+        :param mode: search mode
+        :param since: date to start scraping from
+        :param until: date to stop scraping at
+        :return: endpoint of the next page, or None on the last page
+        """
+        if isinstance(soup, BeautifulSoup):
+            show_more_buttons = soup.find_all("div", class_="show-more")
+            if not show_more_buttons:
+                return None
+            href = show_more_buttons[-1].find("a")["href"]
+        else:
+            href = self.timeline_parser.next_page_href(soup)
+            if href is None:
+                return None
+        if mode == "user":
+            if since or until:
+                return f"/{term}/search?" + href.split("?")[-1]
+            return f"/{term}?" + href.split("?")[-1]
+        return "/search" + href
+
+    def _search_pages(
+        self,
+        term,
+        mode,
+        number,
+        since,
+        until,
+        near,
+        language,
+        to,
+        replies,
+        filters,
+        exclude,
+        max_retries,
+        instance,
+        already_scraped=None,
+        endpoint=None,
+        collected=0,
+    ):
+        """
+        Scrape the specified search term from Nitter page by page
+
+        :param term: term to seach for
+        :param mode: search mode.
+        :param number: number of tweets to scrape.
+        :param since: date to start scraping from.
+        :param until: date to stop scraping at.
+        :param near: location to search near.
+        :param language: language of the tweets.
+        :param to: user to which the tweets are directed.
+        :param replies: True if both tweets and replies are needed.
+        :param filters: list of filters to apply.
+        :param exclude: list of filters to exclude.
+        :param max_retries: max retries to scrape a page.
+        :param instance: Nitter instance to use.
+        :param already_scraped: set (or ScrapeState) of the links to skip, updated in place. Default is a new set
+        :param endpoint: endpoint of the page to start from, e.g. the next page of a checkpoint. Default is the first page
+        :param collected: number of tweets and threads scraped before the start page
+        :return: generator of (tweets, threads, endpoint of the next page or None if it is the last one) for every page
+        """
+        if endpoint is None:
+            endpoint = self._build_search_endpoint(
+                term, mode, since, until, near, language, to, replies, filters, exclude
+            )
+
+        self._initialize_session(instance)
+
+        soup = self._get_page(endpoint, max_retries, timeline=True)
+
+        if soup is None:
+            return
+
+        if already_scraped is None:
+            already_scraped = set()
+
+        number = float("inf") if number == -1 else number
+        while True:
+            # Checked on every page, a failed page can move the search to another instance
+            is_encrypted = self._is_instance_encrypted(soup)
+            page_tweets, page_threads, limit_reached = self._collect_page(
+                soup, is_encrypted, already_scraped, number, collected
+            )
+            collected += len(page_tweets) + len(page_threads)
 
-        :param date: date to check
-        :return: True if date is valid
-        """
-        to_return = True
-        if not match(r"^\d{4}-\d{2}-\d{2}$", date):
-            to_return = False
-        try:
-            year, month, day = [int(number) for number in date.split("-")]
-            datetime(year=year, month=month, day=day)
-        except:
-            to_return = False
+            if limit_reached or (
+                not (since and until) and not (since) and collected >= number
+            ):
+                next_page = None
+            else:
+                next_page = self._get_next_page(soup, term, mode, since, until)
+            yield page_tweets, page_threads, next_page
 
-        if not (
-            datetime(year=2006, month=3, day=21)
-            < datetime(year=year, month=month, day=day)
-            <= datetime.now()
-        ):
-            to_return = False
+            if not next_page:
+                return
+            sleep(uniform(1, 2))
 
-        return to_return
+            # Go to the next page
+            soup = self._get_page(next_page, max_retries, timeline=True)
+            if soup is None:
+                return
 
     def _search(
         self,
@@ -714,151 +1997,193 @@ class Nitter:
         :return: dictionary of tweets and threads for the term.
         """
         tweets = {"tweets": [], "threads": []}
-        if mode == "hashtag":
-            endpoint = "/search?f=tweets&q=%23" + term
-        elif mode == "term":
-            endpoint = "/search?f=tweets&q=" + term
-        elif mode == "user":
-            if since or until or filters or exclude or near:
-                endpoint = f"/{term}/search?f=tweets&q="
-            else:
-                endpoint = f"/{term}"
-                if replies and not filters:
-                    endpoint += "/with_replies"
-        else:
-            raise ValueError("Invalid mode. Use 'term', 'hashtag', or 'user'.")
-
-        self._initialize_session(instance)
-
-        if language:
-            endpoint += f"+lang%3A{language}"
-
-        if to:
-            endpoint += f"+to%3A{to}"
-
-        if since:
-            if self._check_date_validity(since):
-                endpoint += f"&since={since}"
-            else:
-                raise ValueError(
-                    "Invalid 'since' date. Use the YYYY-MM-DD format and make sure the date is valid."
-                )
-
-        if until:
-            if self._check_date_validity(until):
-                endpoint += f"&until={until}"
-            else:
-                raise ValueError(
-                    "Invalid 'until' date. Use the YYYY-MM-DD format and make sure the date is valid."
-                )
-
-        if near:
-            endpoint += f"&near={near}"
-
-        if filters:
-            for f in filters:
-                if f not in valid_filters:
-                    raise ValueError(
-                        f"Invalid filter '{f}'. Valid filters are: {', '.join(valid_filters)}"
-                    )
-                endpoint += f"&f-{f}=on"
-
-        if exclude:
-            for e in exclude:
-                if e not in valid_filters:
-                    raise ValueError(
-                        f"Invalid exclusion filter '{e}'. Valid filters are: {', '.join(valid_filters)}"
-                    )
-                endpoint += f"&e-{e}=on"
+        for page_tweets, page_threads, _ in self._search_pages(
+            term,
+            mode,
+            number,
+            since,
+            until,
+            near,
+            language,
+            to,
+            replies,
+            filters,
+            exclude,
+            max_retries,
+            instance,
+        ):
+            tweets["tweets"].extend(page_tweets)
+            tweets["threads"].extend(page_threads)
 
-        if mode != "user":
-            if "?" in endpoint:
-                endpoint += "&scroll=false"
-            else:
-                endpoint += "?scroll=false"
+            logging.info(
+                f"Current stats for {term}: {len(tweets['tweets'])} tweets, {len(tweets['threads'])} threads..."
+            )
+        return tweets
 
-        soup = self._get_page(endpoint, max_retries)
+    def _search_dispatch(self, args):
+        return self._search(*args)
 
-        if soup is None:
-            return tweets
+    async def _asearch(
+        self,
+        client,
+        term,
+        mode,
+        number,
+        since,
+        until,
+        near,
+        language,
+        to,
+        replies,
+        filters,
+        exclude,
+        max_retries,
+    ):
+        """
+        Scrape one search term with the asyncio client, yielding the tweets and threads page by page
 
-        is_encrypted = self._is_instance_encrypted()
+        :param client: AsyncNitterClient to use
+        :return: async generator of (kind, data) tuples, kind being "tweet" or "thread"
+        """
+        endpoint = self._build_search_endpoint(
+            term, mode, since, until, near, language, to, replies, filters, exclude
+        )
+        soup, instance = await client.get_page(endpoint, max_retries, timeline=True)
 
         already_scraped = set()
+        collected = 0
 
         number = float("inf") if number == -1 else number
-        keep_scraping = True
-        while keep_scraping:
-            thread = []
-
-            for tweet in soup.find_all("div", class_="timeline-item"):
-                if len(tweet["class"]) == 1:
-                    to_append = self._extract_tweet(tweet, is_encrypted)
-                    # Extract tweets
-                    if len(tweets["tweets"]) + len(tweets["threads"]) < number:
-                        if self._get_tweet_link(tweet) not in already_scraped:
-                            tweets["tweets"].append(to_append)
-                            already_scraped.add(self._get_tweet_link(tweet))
-                    else:
-                        keep_scraping = False
-                        break
-                else:
-                    if "thread" in tweet["class"]:
-                        to_append = self._extract_tweet(tweet, is_encrypted)
-                        # Extract threads
-                        if self._get_tweet_link(tweet) not in already_scraped:
-                            thread.append(to_append)
-                            already_scraped.add(self._get_tweet_link(tweet))
-
-                        if len(tweet["class"]) == 3:
-                            tweets["threads"].append(thread)
-                            thread = []
-
-            logging.info(
-                f"Current stats for {term}: {len(tweets['tweets'])} tweets, {len(tweets['threads'])} threads..."
+        while soup is not None:
+            is_encrypted = await client.is_encrypted(instance, soup)
+            page_tweets, page_threads, limit_reached = self._collect_page(
+                soup, is_encrypted, already_scraped, number, collected
             )
-            if (
-                not (since and until)
-                and not (since)
-                and len(tweets["tweets"]) + len(tweets["threads"]) >= number
-            ):
-                keep_scraping = False
-            else:
-                sleep(uniform(1, 2))
-
-                # Go to the next page
-                show_more_buttons = soup.find_all("div", class_="show-more")
-                if soup.find_all("div", class_="show-more"):
-                    if mode == "user":
-                        if since or until:
-                            next_page = (
-                                f"/{term}/search?"
-                                + show_more_buttons[-1].find("a")["href"].split("?")[-1]
-                            )
-                        else:
-                            next_page = (
-                                f"/{term}?"
-                                + show_more_buttons[-1].find("a")["href"].split("?")[-1]
-                            )
-                    else:
-                        next_page = "/search" + show_more_buttons[-1].find("a")["href"]
-                    soup = self._get_page(next_page, max_retries)
-                    if soup is None:
-                        keep_scraping = False
+            collected += len(page_tweets) + len(page_threads)
+            for tweet in page_tweets:
+                yield "tweet", tweet
+            for thread in page_threads:
+                yield "thread", thread
+
+            logging.info(f"Current stats for {term}: {collected} tweets and threads...")
+            if limit_reached or (not since and collected >= number):
+                break
+
+            # Go to the next page, the instance rate limiter replaces the fixed sleep
+            next_page = self._get_next_page(soup, term, mode, since, until)
+            if not next_page:
+                break
+            soup, instance = await client.get_page(next_page, max_retries, timeline=True)
+
+    async def aget_tweets(
+        self,
+        terms,
+        mode="term",
+        number=-1,
+        since=None,
+        until=None,
+        near=None,
+        language=None,
+        to=None,
+        replies=False,
+        filters=None,
+        exclude=None,
+        max_retries=5,
+        instances=None,
+        max_concurrency=50,
+        instance_interval=1.0,
+        timeout=10,
+    ):
+        """
+        Scrape any number of terms concurrently from one process with asyncio and httpx.
+        Use it with `async for item in nitter.aget_tweets(terms): ...`
+
+        :param terms: string/s to search for
+        :param mode: search mode. Default is 'term', can also be 'hashtag' or 'user'
+        :param number: number of tweets to scrape per term. Default is -1 (to not set a limit).
+        :param since: date to start scraping from, formatted as YYYY-MM-DD. Default is None
+        :param until: date to stop scraping at, formatted as YYYY-MM-DD. Default is None
+        :param near: near location of the tweets. Default is None (anywhere)
+        :param language: language of the tweets. Default is None (any language)
+        :param to: user to which the tweets are directed. Default is None (any user)
+        :param replies: True if both tweets and replies are needed. If 'filters' or 'exclude' are set, this option will be overridden. Default is False
+        :param filters: list of filters to apply. Default is None
+        :param exclude: list of filters to exclude. Default is None
+        :param max_retries: max retries to scrape a page. Default is 5
+        :param instances: instance or list of instances to spread the requests over. Default is the working instances
+        :param max_concurrency: max number of requests in flight across all instances. Default is 50
+        :param instance_interval: average number of seconds between two requests to the same instance. Default is 1
+        :param timeout: request timeout in seconds. Default is 10
+        :return: async generator of ScrapedTweet(term, kind, data) tuples, in the order they are scraped
+        """
+        terms = [terms] if isinstance(terms, str) else terms
+        if isinstance(instances, str):
+            instances = [instances]
+        instances = instances or self.working_instances
+        if not instances:
+            raise ValueError("No working instances available.")
+
+        # Bounded, so the scrapers wait when the consumer falls behind
+        results = asyncio.Queue(maxsize=max(1000, max_concurrency))
+        done = object()
+
+        async with AsyncNitterClient(
+            self, instances, max_concurrency, instance_interval, timeout
+        ) as client:
+
+            async def scrape(term):
+                try:
+                    async for kind, data in self._asearch(
+                        client,
+                        term,
+                        mode,
+                        number,
+                        since,
+                        until,
+                        near,
+                        language,
+                        to,
+                        replies,
+                        filters,
+                        exclude,
+                        max_retries,
+                    ):
+                        await results.put(ScrapedTweet(term, kind, data))
+                except Exception as e:
+                    await results.put(e)
                 else:
-                    keep_scraping = False
-        return tweets
+                    await results.put(done)
 
-    def _search_dispatch(self, args):
-        return self._search(*args)
+            tasks = [asyncio.ensure_future(scrape(term.strip())) for term in terms]
+            try:
+                remaining = len(tasks)
+                while remaining:
+                    item = await results.get()
+                    if item is done:
+                        remaining -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield item
+            finally:
+                # Stop the other scrapers when the consumer stops early or a scraper failed
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _aget_tweets_dicts(self, terms, **kwargs):
+        tweets = {term.strip(): {"tweets": [], "threads": []} for term in terms}
+        async for item in self.aget_tweets(terms, **kwargs):
+            tweets[item.term][item.kind + "s"].append(item.data)
+        return [tweets[term.strip()] for term in terms]
 
     def get_random_instance(self):
         """
-        Get a random Nitter instance
+        Get a Nitter instance, routing to the fastest healthy working instances
 
-        :return: URL of random Nitter instance
+        :return: URL of the Nitter instance
         """
-        return random.choice(self.working_instances)
+        return self.scoreboard.choose(self.working_instances)
 
     def get_tweet_by_id(self, username, tweet_id, instance=None, max_retries=5):
         """
@@ -883,7 +2208,7 @@ class Nitter:
         if soup is None:
             return None
 
-        is_encrypted = self._is_instance_encrypted()
+        is_encrypted = self._is_instance_encrypted(soup)
 
         tweet = soup.find("div", class_="timeline-item")
         if tweet:
@@ -907,6 +2232,9 @@ class Nitter:
         exclude=None,
         max_retries=5,
         instance=None,
+        use_async=False,
+        max_concurrency=50,
+        instance_interval=1.0,
     ):
         """
         Scrape the specified term from Nitter
@@ -924,8 +2252,32 @@ class Nitter:
         :param exclude: list of filters to exclude. Default is None
         :param max_retries: max retries to scrape a page. Default is 5
         :param instance: Nitter instance to use. Default is None
+        :param use_async: True to scrape multiple terms with asyncio from this process instead of one process per term, lifting the limit on the number of terms. Cannot be used from a running event loop (e.g. a notebook), use `aget_tweets` there. Default is False
+        :param max_concurrency: max number of requests in flight with use_async. Default is 50
+        :param instance_interval: average number of seconds between two requests to the same instance with use_async. Default is 1
         :return: dictionary or array with dictionaries (in case of multiple terms) of the tweets and threads for the provided terms
         """
+        if use_async and type(terms) != str and len(terms) > 1:
+            return asyncio.run(
+                self._aget_tweets_dicts(
+                    terms,
+                    mode=mode,
+                    number=number,
+                    since=since,
+                    until=until,
+                    near=near,
+                    language=language,
+                    to=to,
+                    replies=replies,
+                    filters=filters,
+                    exclude=exclude,
+                    max_retries=max_retries,
+                    instances=instance,
+                    max_concurrency=max_concurrency,
+                    instance_interval=instance_interval,
+                )
+            )
+
         if type(terms) == str:
             term = terms.strip()
 
@@ -965,7 +2317,7 @@ class Nitter:
         else:
             if len(terms) > cpu_count():
                 raise ValueError(
-                    f"Too many terms. You can search at most {cpu_count()} terms."
+                    f"Too many terms. You can search at most {cpu_count()} terms, or use use_async=True."
                 )
 
             args = [
@@ -991,6 +2343,114 @@ class Nitter:
 
             return results
 
+    def scrape_to_file(
+        self,
+        terms,
+        path,
+        mode="term",
+        number=-1,
+        since=None,
+        until=None,
+        near=None,
+        language=None,
+        to=None,
+        replies=False,
+        filters=None,
+        exclude=None,
+        max_retries=5,
+        instance=None,
+        state_path=None,
+        resume=True,
+    ):
+        """
+        Scrape the specified terms into a file page by page, without keeping the tweets in memory.
+        After every page the cursor of the next page is checkpointed, so a job that crashed or
+        stopped on max retries resumes where it stopped when run again with the same arguments.
+
+        :param terms: string/s to search for, scraped one after the other
+        :param path: output path, a JSON lines file ('.jsonl') or a directory of Parquet files ('.parquet', requires pyarrow). Every line or row is a scraped item with its 'term', 'kind' ('tweet' or 'thread') and 'data' (the tweet dictionary or the list of tweets of the thread)
+        :param mode: search mode. Default is 'term', can also be 'hashtag' or 'user'
+        :param number: number of tweets to scrape per term. Default is -1 (to not set a limit).
+        :param since: date to start scraping from, formatted as YYYY-MM-DD. Default is None
+        :param until: date to stop scraping at, formatted as YYYY-MM-DD. Default is None
+        :param near: near location of the tweets. Default is None (anywhere)
+        :param language: language of the tweets. Default is None (any language)
+        :param to: user to which the tweets are directed. Default is None (any user)
+        :param replies: True if both tweets and replies are needed. If 'filters' or 'exclude' are set, this option will be overridden. Default is False
+        :param filters: list of filters to apply. Default is None
+        :param exclude: list of filters to exclude. Default is None
+        :param max_retries: max retries to scrape a page. Default is 5
+        :param instance: Nitter instance to use. Default is None
+        :param state_path: SQLite file of the checkpoints and of the index of the scraped links, tweets already in the index are skipped. Default is the output path + '.state.sqlite'
+        :param resume: False to start the searches over instead of resuming them (the scraped links are still skipped). Default is True
+        :return: dictionary of the number of tweets and threads written per term
+        """
+        terms = [terms] if isinstance(terms, str) else terms
+        if path.rstrip("/").endswith(".parquet"):
+            sink = ParquetSink(path)
+        else:
+            sink = JsonlSink(path)
+        state = ScrapeState(state_path or path.rstrip("/") + ".state.sqlite")
+        written = {}
+        try:
+            # Drop what was written after the last checkpoint by a crashed job
+            offset = state.sink_offset()
+            if offset is not None:
+                sink.truncate(offset)
+
+            for term in terms:
+                term = term.strip()
+                job = json.dumps(
+                    [mode, term, number, since, until, near, language, to, replies, filters, exclude]
+                )
+                checkpoint = state.get_checkpoint(job) if resume else None
+                if not resume:
+                    state.reset(job)
+                if checkpoint and checkpoint["done"]:
+                    logging.info(f"{term} already scraped, skipping")
+                    written[term] = 0
+                    continue
+                if checkpoint:
+                    logging.info(f"Resuming {term} after {checkpoint['collected']} tweets and threads")
+                    endpoint, collected = checkpoint["endpoint"], checkpoint["collected"]
+                else:
+                    endpoint, collected = None, 0
+
+                written[term] = 0
+                pages = self._search_pages(
+                    term,
+                    mode,
+                    number,
+                    since,
+                    until,
+                    near,
+                    language,
+                    to,
+                    replies,
+                    filters,
+                    exclude,
+                    max_retries,
+                    instance,
+                    already_scraped=state,
+                    endpoint=endpoint,
+                    collected=collected,
+                )
+                for page_tweets, page_threads, next_page in pages:
+                    # Threads whose tweets were all scraped before are empty
+                    items = [ScrapedTweet(term, "tweet", tweet) for tweet in page_tweets] + [
+                        ScrapedTweet(term, "thread", thread) for thread in page_threads if thread
+                    ]
+                    offset = sink.write(items) if items else sink.offset
+                    collected += len(page_tweets) + len(page_threads)
+                    written[term] += len(items)
+                    state.commit(job, next_page, collected, offset)
+                    logging.info(f"Current stats for {term}: {collected} tweets and threads written...")
+        finally:
+            state.rollback()
+            state.close()
+            sink.close()
+        return written
+
     def _profile_info(self, username, max_retries, instance):
         """
         Gets the profile information for a user.
@@ -1006,7 +2466,16 @@ class Nitter:
         if soup is None:
             return None
 
-        is_encrypted = self._is_instance_encrypted()
+        return self._parse_profile(soup, self._is_instance_encrypted(soup))
+
+    def _parse_profile(self, soup, is_encrypted):
+        """
+        Extract the profile information of a profile page
+
+        :param soup: profile page
+        :param is_encrypted: True if instance uses encrypted media
+        :return: dictionary of the profile's information
+        """
         # Extract id if the banner exists, no matter if the instance uses base64 or not
         if soup.find("div", class_="profile-banner").find("img") and is_encrypted:
             profile_id = (
@@ -1112,7 +2581,16 @@ class Nitter:
     def _search_profile_dispatch(self, args):
         return self.get_profile_info(*args)
 
-    def get_profile_info(self, username, max_retries=5, instance=None, mode='simple'):
+    def get_profile_info(
+        self,
+        username,
+        max_retries=5,
+        instance=None,
+        mode='simple',
+        use_async=False,
+        max_concurrency=50,
+        instance_interval=1.0,
+    ):
         """
         Get profile information for a user or a list of users
 
@@ -1120,6 +2598,9 @@ class Nitter:
         :param max_retries: max retries to scrape a page. Default is 5
         :param instance: Nitter instance to use. Default is None
         :param mode: Mode of fetching profile info. 'simple' for basic info, 'detail' for detailed info including following and followers lists. Default is 'simple'
+        :param use_async: True to fetch the profiles, and the following and followers lists in parallel, with the asyncio mode (requires httpx, no limit on the number of usernames). Default is False
+        :param max_concurrency: max number of requests in flight with use_async. Default is 50
+        :param instance_interval: average number of seconds between two requests to the same instance with use_async. Default is 1
         :return: dictionary of the profile's information or list of dictionaries if username is a list. The dictionary contains the following keys:
             - image: URL of the profile image
             - name: Full name of the user
@@ -1138,6 +2619,18 @@ class Nitter:
             - following_list: List of usernames the profile is following (only in 'detail' mode)
             - followers_list: List of usernames following the profile (only in 'detail' mode)
         """
+        if use_async:
+            profiles = asyncio.run(
+                self._aget_profiles(
+                    [username] if isinstance(username, str) else username,
+                    max_retries,
+                    mode,
+                    instances=instance,
+                    max_concurrency=max_concurrency,
+                    instance_interval=instance_interval,
+                )
+            )
+            return profiles[0] if isinstance(username, str) or len(username) == 1 else profiles
 
         def _get_follow_list(endpoint):
             follow_list = []
@@ -1180,3 +2673,200 @@ class Nitter:
             with Pool(len(username)) as p:
                 results = list(p.map(self._search_profile_dispatch, args))
             return results
+
+    def _get_follow_page(self, soup):
+        """
+        :param soup: following or followers page
+        :return: (list of the usernames of the page, cursor of the next page or None on the last page)
+        """
+        if isinstance(soup, BeautifulSoup):
+            names = [user.text.strip() for user in soup.find_all("a", class_="username")]
+            show_more_buttons = soup.find_all("div", class_="show-more")
+            href = show_more_buttons[-1].find("a")["href"] if show_more_buttons else None
+        else:
+            names = self.timeline_parser.usernames(soup)
+            href = self.timeline_parser.next_page_href(soup)
+        return names, href.split("cursor=")[-1] if href and "cursor=" in href else None
+
+    async def _afollow_pages(self, client, username, kind, max_retries, max_pages):
+        """
+        Fetch a following or followers list page by page with the asyncio client
+
+        :param client: AsyncNitterClient to use
+        :param username: user whose list to fetch
+        :param kind: 'following' or 'followers'
+        :param max_retries: max retries to scrape a page
+        :param max_pages: max number of pages, None for all of them
+        :return: async generator of the usernames of every page, with their '@'
+        """
+        cursor = None
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            endpoint = f"/{username}/{kind}?cursor={cursor}" if cursor else f"/{username}/{kind}"
+            soup, _ = await client.get_page(endpoint, max_retries, timeline=True)
+            if soup is None:
+                return
+            names, cursor = self._get_follow_page(soup)
+            if not names:
+                return
+            yield names
+            pages += 1
+            if not cursor:
+                return
+
+    async def _acrawl_follows(
+        self, client, usernames, depth, lists, max_users, max_pages, max_retries, on_page
+    ):
+        """
+        Crawl the follow graph breadth first from some users. The users of the frontier are crawled
+        concurrently, each with its lists fetched in parallel, and every user is crawled once
+
+        :param client: AsyncNitterClient to use
+        :param usernames: users to start from
+        :param depth: number of expansions, 0 to only fetch the lists of the starting users
+        :param lists: lists to fetch and follow, 'following' and/or 'followers'
+        :param max_users: max number of users to crawl, None for no limit
+        :param max_pages: max number of pages per list, None for all of them
+        :param max_retries: max retries to scrape a page
+        :param on_page: function called with (username, kind, usernames of the page) for every page
+        :return: number of users crawled
+        """
+        frontier = asyncio.Queue()
+        visited = set()
+
+        def visit(username, level):
+            if username not in visited and (max_users is None or len(visited) < max_users):
+                visited.add(username)
+                frontier.put_nowait((username, level))
+
+        for username in usernames:
+            visit(username.strip().lstrip("@"), 0)
+
+        async def crawl_list(username, kind, level):
+            async for names in self._afollow_pages(client, username, kind, max_retries, max_pages):
+                on_page(username, kind, names)
+                if level < depth:
+                    for name in names:
+                        visit(name.lstrip("@"), level + 1)
+
+        async def worker():
+            while True:
+                username, level = await frontier.get()
+                try:
+                    await asyncio.gather(*(crawl_list(username, kind, level) for kind in lists))
+                finally:
+                    frontier.task_done()
+
+        # The client caps the requests in flight, the workers only need to keep it busy
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(1, client.max_concurrency // 2))]
+        finished = asyncio.ensure_future(frontier.join())
+        try:
+            done, _ = await asyncio.wait([finished, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # A worker only stops on an error
+                task.result()
+        finally:
+            for task in [finished, *workers]:
+                task.cancel()
+            await asyncio.gather(finished, *workers, return_exceptions=True)
+        return len(visited)
+
+    async def acrawl_follow_graph(
+        self,
+        usernames,
+        path,
+        depth=1,
+        lists=("following", "followers"),
+        max_users=None,
+        max_pages=None,
+        max_retries=5,
+        instances=None,
+        max_concurrency=50,
+        instance_interval=1.0,
+        timeout=10,
+    ):
+        """
+        Crawl the follow graph around some users with asyncio and httpx, writing the edges to disk as they are found.
+        Load the graph with load_follow_graph(path)
+
+        :param usernames: username/s to start from
+        :param path: directory of the graph (see FollowGraphWriter)
+        :param depth: number of expansions, 0 to only fetch the lists of the starting users. Default is 1
+        :param lists: lists to fetch and follow. Default is ('following', 'followers')
+        :param max_users: max number of users to crawl. Default is None (no limit)
+        :param max_pages: max number of pages per list. Default is None (all of them)
+        :param max_retries: max retries to scrape a page. Default is 5
+        :param instances: instance or list of instances to spread the requests over. Default is the working instances
+        :param max_concurrency: max number of requests in flight across all instances. Default is 50
+        :param instance_interval: average number of seconds between two requests to the same instance. Default is 1
+        :param timeout: request timeout in seconds. Default is 10
+        :return: dictionary with the number of users crawled, of usernames and of edges written
+        """
+        usernames = [usernames] if isinstance(usernames, str) else usernames
+        if isinstance(instances, str):
+            instances = [instances]
+        instances = instances or self.working_instances
+        if not instances:
+            raise ValueError("No working instances available.")
+
+        writer = FollowGraphWriter(path)
+        try:
+            async with AsyncNitterClient(
+                self, instances, max_concurrency, instance_interval, timeout
+            ) as client:
+                crawled = await self._acrawl_follows(
+                    client, usernames, depth, lists, max_users, max_pages, max_retries, writer.add_page
+                )
+        finally:
+            writer.close()
+        return {"users": crawled, "usernames": len(writer.ids), "edges": writer.edges}
+
+    def crawl_follow_graph(self, usernames, path, depth=1, **kwargs):
+        """
+        Synchronous version of acrawl_follow_graph, see its parameters
+        """
+        return asyncio.run(self.acrawl_follow_graph(usernames, path, depth, **kwargs))
+
+    async def _aget_profiles(
+        self, usernames, max_retries, mode, instances=None, max_concurrency=50, instance_interval=1.0, timeout=10
+    ):
+        """
+        Get the profile information of users concurrently, like get_profile_info
+
+        :return: list of dictionaries of the profiles' information, None for the profiles that could not be fetched
+        """
+        if isinstance(instances, str):
+            instances = [instances]
+        instances = instances or self.working_instances
+        if not instances:
+            raise ValueError("No working instances available.")
+
+        async with AsyncNitterClient(
+            self, instances, max_concurrency, instance_interval, timeout
+        ) as client:
+
+            async def profile(username):
+                username = username.strip()
+                soup, instance = await client.get_page(
+                    f"/{sub(r'[^A-Za-z0-9_+-:]', '', username)}", max_retries
+                )
+                if soup is None:
+                    return None
+                profile_info = self._parse_profile(soup, await client.is_encrypted(instance, soup))
+                if mode == "detail":
+                    follow_lists = {"following": [], "followers": []}
+                    await self._acrawl_follows(
+                        client,
+                        [username],
+                        0,
+                        ("following", "followers"),
+                        None,
+                        None,
+                        max_retries,
+                        lambda user, kind, names: follow_lists[kind].extend(names),
+                    )
+                    profile_info["following_list"] = follow_lists["following"]
+                    profile_info["followers_list"] = follow_lists["followers"]
+                return profile_info
+
+            return await asyncio.gather(*(profile(username) for username in usernames))
@@ -0,0 +1,74 @@
+"""
+Benchmark the asyncio mode (`aget_tweets`) against the multiprocessing mode (`get_tweets`)
+on local fake Nitter instances.
+
+    python benchmarks/bench_async.py --terms 200 --instances 4 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+from multiprocessing import cpu_count
+
+from fake_nitter import load_nitter_module, start_instances
+
+
+def bench_sync(Nitter, instances, terms):
+    scraper = Nitter(instances=[instance.url for instance in instances], skip_instance_check=True, log_level=0)
+    start = time.perf_counter()
+    # The multiprocessing mode uses a single instance for all the terms
+    instance = instances[0].url
+    results = scraper.get_tweets(terms, instance=instance) if len(terms) > 1 else [scraper.get_tweets(terms[0], instance=instance)]
+    elapsed = time.perf_counter() - start
+    return sum(len(r["tweets"]) + len(r["threads"]) for r in results), elapsed
+
+
+def bench_async(Nitter, instances, terms, max_concurrency, instance_interval):
+    scraper = Nitter(instances=[instance.url for instance in instances], skip_instance_check=True, log_level=0)
+
+    async def run():
+        items = 0
+        async for _ in scraper.aget_tweets(
+            terms, max_concurrency=max_concurrency, instance_interval=instance_interval
+        ):
+            items += 1
+        return items
+
+    start = time.perf_counter()
+    items = asyncio.run(run())
+    return items, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=200, help="Terms scraped by the asyncio mode")
+    parser.add_argument("--sync-terms", type=int, default=min(4, cpu_count()), help="Terms scraped by the multiprocessing mode (0 to skip it)")
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Response latency of the fake instances in seconds")
+    parser.add_argument("--pages", type=int, default=3, help="Timeline pages per term")
+    parser.add_argument("--max-concurrency", type=int, default=50)
+    parser.add_argument("--instance-interval", type=float, default=0.02, help="Seconds between two requests to the same instance")
+    args = parser.parse_args()
+
+    Nitter = load_nitter_module().Nitter
+    instances = start_instances(args.instances, latency=args.latency, pages=args.pages)
+    try:
+        if args.sync_terms:
+            terms = [f"sync{i}" for i in range(args.sync_terms)]
+            items, elapsed = bench_sync(Nitter, instances, terms)
+            print(f"multiprocessing: {len(terms)} terms, {items} items in {elapsed:.2f}s "
+                  f"({len(terms) / elapsed:.2f} terms/s, {items / elapsed:.1f} items/s)")
+
+        for instance in instances:
+            instance.requests.clear()
+        terms = [f"term{i}" for i in range(args.terms)]
+        items, elapsed = bench_async(Nitter, instances, terms, args.max_concurrency, args.instance_interval)
+        requests = sum(instance.total_requests for instance in instances)
+        print(f"asyncio:         {len(terms)} terms, {items} items in {elapsed:.2f}s "
+              f"({len(terms) / elapsed:.2f} terms/s, {items / elapsed:.1f} items/s, {requests} requests)")
+    finally:
+        for instance in instances:
+            instance.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark the follow graph crawler on local fake Nitter instances: 'detail' profiles fetched
+serially against the asyncio mode, then a depth-N crawl written to an on-disk edge list, checked
+against the follow lists served by the fake instances.
+
+    python benchmarks/bench_crawler.py --profiles 8 --depth 2 --instances 4 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from fake_nitter import follow_list, load_nitter_module, start_instances
+
+
+def expected_graph(seed, depth):
+    # Breadth first over the fake follow lists, as the crawler should see them
+    edges, frontier, visited = set(), [seed], {seed}
+    for level in range(depth + 1):
+        next_frontier = []
+        for user in frontier:
+            for kind in ("following", "followers"):
+                for other in follow_list(user, kind):
+                    edges.add((user, other) if kind == "following" else (other, user))
+                    if level < depth and other not in visited:
+                        visited.add(other)
+                        next_frontier.append(other)
+        frontier = next_frontier
+    return edges, visited
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=8, help="Profiles fetched in 'detail' mode")
+    parser.add_argument("--depth", type=int, default=2, help="Depth of the crawl")
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Response latency of the fake instances in seconds")
+    parser.add_argument("--max-concurrency", type=int, default=50)
+    parser.add_argument("--instance-interval", type=float, default=0.01, help="Seconds between two requests to the same instance")
+    args = parser.parse_args()
+
+    module = load_nitter_module()
+    instances = start_instances(args.instances, latency=args.latency)
+    urls = [instance.url for instance in instances]
+    try:
+        scraper = module.Nitter(instances=urls, skip_instance_check=True, log_level=0)
+        users = [f"user{i}" for i in range(args.profiles)]
+
+        start = time.perf_counter()
+        serial = [scraper.get_profile_info(user, instance=urls[0], mode="detail") for user in users]
+        serial_time = time.perf_counter() - start
+        start = time.perf_counter()
+        concurrent = scraper.get_profile_info(users, mode="detail", use_async=True, instance=urls,
+                                              max_concurrency=args.max_concurrency,
+                                              instance_interval=args.instance_interval)
+        async_time = time.perf_counter() - start
+        assert serial == concurrent, "The asyncio mode returned other profiles"
+        print(f"detail profiles: {args.profiles} users, serial {serial_time:.2f}s, "
+              f"asyncio {async_time:.2f}s ({serial_time / async_time:.1f}x), identical output")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph")
+            start = time.perf_counter()
+            stats = scraper.crawl_follow_graph("user0", path, depth=args.depth, instances=urls,
+                                               max_concurrency=args.max_concurrency,
+                                               instance_interval=args.instance_interval)
+            elapsed = time.perf_counter() - start
+            requests = sum(instance.total_requests for instance in instances)
+            print(f"crawl depth {args.depth}: {stats['users']} users, {stats['edges']} edges in {elapsed:.2f}s "
+                  f"({stats['users'] / elapsed:.0f} users/s, {requests} requests)")
+
+            graph = module.load_follow_graph(path)
+            edges = {(graph.usernames[a], graph.usernames[b]) for a, b in graph.edges.tolist()}
+            expected_edges, expected_users = expected_graph("user0", args.depth)
+            assert edges == expected_edges, "The crawled edges differ from the fake follow lists"
+            assert stats["users"] == len(expected_users)
+
+            on_disk = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            as_lists = sum(sys.getsizeof("@" + a) + sys.getsizeof("@" + b) + 16 for a, b in expected_edges)
+            print(f"edge list: {len(graph.edges)} unique edges, {len(graph.usernames)} usernames, "
+                  f"{on_disk / 1024:.0f} KiB on disk (~{as_lists / 1024:.0f} KiB as lists of strings), "
+                  f"matches the fake follow lists")
+    finally:
+        for instance in instances:
+            instance.stop()
+
+
+if __name__ == "__main__":
+    main()
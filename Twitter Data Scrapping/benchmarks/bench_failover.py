@@ -0,0 +1,91 @@
+"""
+Routing and failover benchmark on local fake Nitter instances: a fast, a slow, a flaky (rate
+limited half of the time) and a hung instance (answers after the request timeout), plus a fast
+instance that is killed in the middle of the run.
+
+    python benchmarks/bench_failover.py --terms 60
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from fake_nitter import load_nitter_module, start_instances
+
+
+def describe(instances, names):
+    return ", ".join(f"{names[instance.url]} {instance.total_requests}" for instance in instances)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=60, help="Terms scraped by the asyncio run")
+    parser.add_argument("--pages", type=int, default=50, help="Pages fetched by the sync run")
+    args = parser.parse_args()
+
+    Nitter = load_nitter_module().Nitter
+    fast, slow, flaky, hung, killed = (
+        start_instances(1, latency=0.01, pages=3)[0],
+        start_instances(1, latency=0.3, pages=3)[0],
+        start_instances(1, latency=0.01, failure_rate=0.5, pages=3)[0],
+        start_instances(1, latency=0.01, pages=3)[0],
+        start_instances(1, latency=0.01, pages=3)[0],
+    )
+    instances = [fast, slow, flaky, hung, killed]
+    names = {fast.url: "fast", slow.url: "slow", flaky.url: "flaky", hung.url: "hung", killed.url: "killed"}
+    try:
+        # The hung instance passes the first check, then stops answering in time
+        start = time.perf_counter()
+        scraper = Nitter(instances=[instance.url for instance in instances], log_level=0)
+        print(f"Checked {len(instances)} instances concurrently in {time.perf_counter() - start:.2f}s, "
+              f"working: {', '.join(names[url] for url in scraper.working_instances)}")
+        hung.latency = 15
+
+        # Sync pages, routed to the fastest healthy instances
+        for instance in instances:
+            instance.requests.clear()
+        start = time.perf_counter()
+        routed = Counter()
+        for page in range(args.pages):
+            scraper._initialize_session(scraper.get_random_instance())
+            routed[names[scraper.instance]] += 1
+            if page == args.pages // 2:
+                killed.stop()
+            scraper._get_page(f"/search?f=tweets&q=sync{page}", timeline=True)
+        print(f"sync: {args.pages} pages in {time.perf_counter() - start:.1f}s, first choice {dict(routed)}, "
+              f"requests: {describe(instances, names)}")
+
+        # Asyncio terms, the killed instance comes back and the fast one dies halfway
+        killed.start(port=killed.port)
+        for instance in instances:
+            instance.requests.clear()
+
+        async def run():
+            items, terms = 0, set()
+            async for item in scraper.aget_tweets(
+                [f"term{i}" for i in range(args.terms)],
+                instances=scraper.instances,
+                instance_interval=0.01,
+                timeout=2,
+            ):
+                items += 1
+                terms.add(item.term)
+                if items == 500:
+                    fast.stop()
+            return items, terms
+
+        start = time.perf_counter()
+        items, terms = asyncio.run(run())
+        print(f"asyncio: {len(terms)}/{args.terms} terms, {items} items in {time.perf_counter() - start:.1f}s, "
+              f"requests: {describe(instances, names)}")
+
+        for url, health in scraper.instance_health().items():
+            latency = f"{health['latency'] * 1000:.0f} ms" if health["latency"] is not None else "-"
+            print(f"  {names[url]:>6}: {health['state']:<9} latency {latency:>7}, error rate {health['error_rate']:.0%}")
+    finally:
+        for instance in instances:
+            instance.stop()
+
+
+if __name__ == "__main__":
+    main()
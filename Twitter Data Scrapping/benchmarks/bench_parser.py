@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the timeline extraction engines ('bs4' and 'lxml') on the saved HTML
+fixtures. Both engines must return the same tweets, threads and next page for every fixture.
+
+    python benchmarks/bench_parser.py                    # benchmark every fixture
+    python benchmarks/bench_parser.py --write-fixtures   # regenerate the fake Nitter fixtures
+"""
+import argparse
+import glob
+import os
+import time
+
+from fake_nitter import load_nitter_module, render_timeline
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def write_fixtures(page_size=100):
+    for encrypted in (False, True):
+        path = os.path.join(FIXTURES_DIR, f"timeline_{'encrypted' if encrypted else 'plain'}.html")
+        html = render_timeline("fixture", 1, pages=2, page_size=page_size, encrypted=encrypted,
+                               show_more_href="?f=tweets&q=fixture&cursor=NEXT")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"Wrote {path}")
+
+
+def run(scraper, html, is_encrypted):
+    page = scraper._parse_page(html, timeline=True)
+    tweets, threads, _ = scraper._collect_page(page, is_encrypted, set(), float("inf"))
+    return tweets, threads, scraper._get_next_page(page, "fixture", "term", None, None)
+
+
+def bench(scraper, html, is_encrypted, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run(scraper, html, is_encrypted)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--write-fixtures", action="store_true", help="Regenerate the fake Nitter fixtures")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per fixture and engine")
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        write_fixtures()
+        return
+
+    Nitter = load_nitter_module().Nitter
+    scrapers = {
+        engine: Nitter(instances=["http://localhost"], skip_instance_check=True, log_level=0, parser=engine)
+        for engine in ("bs4", "lxml")
+    }
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        is_encrypted = "encrypted" in os.path.basename(path)
+
+        results = {engine: run(scraper, html, is_encrypted) for engine, scraper in scrapers.items()}
+        assert results["bs4"] == results["lxml"], f"The engines disagree on {path}"
+
+        timings = {engine: bench(scraper, html, is_encrypted, args.repeat) for engine, scraper in scrapers.items()}
+        tweets, threads, _ = results["lxml"]
+        print(f"{os.path.basename(path)}: {len(tweets)} tweets, {len(threads)} threads, identical output | "
+              f"bs4 {timings['bs4'] * 1000:.1f} ms/page, lxml {timings['lxml'] * 1000:.1f} ms/page "
+              f"({timings['bs4'] / timings['lxml']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Count the HTTP requests of the scraper on a local fake Nitter instance, by kind of page: search
+terms, single tweet lookups and profiles, with plain and encrypted media. Every call should fetch
+its own pages only, the encryption of the media is read from them.
+
+    python benchmarks/bench_requests.py --terms 10 --lookups 20 --profiles 10
+"""
+import argparse
+import asyncio
+import time
+
+from fake_nitter import load_nitter_module, start_instances
+
+
+def count(instance, run):
+    instance.requests.clear()
+    start = time.perf_counter()
+    run()
+    return dict(instance.requests), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=10, help="Search terms scraped one by one")
+    parser.add_argument("--lookups", type=int, default=20, help="Tweets fetched by ID")
+    parser.add_argument("--profiles", type=int, default=10, help="Profiles fetched")
+    parser.add_argument("--pages", type=int, default=2, help="Timeline pages per term")
+    args = parser.parse_args()
+
+    module = load_nitter_module()
+    # No politeness delay between the pages of the local instances
+    module.sleep = lambda seconds: None
+    for encrypted in (False, True):
+        instance = start_instances(1, pages=args.pages, encrypted=encrypted)[0]
+        try:
+            scraper = module.Nitter(instances=[instance.url], skip_instance_check=True, log_level=0)
+            runs = {
+                "search": (args.terms, lambda: [
+                    scraper.get_tweets(f"term{i}", instance=instance.url) for i in range(args.terms)
+                ]),
+                "lookup": (args.lookups, lambda: [
+                    scraper.get_tweet_by_id("user", 1000 + i, instance=instance.url) for i in range(args.lookups)
+                ]),
+                "profile": (args.profiles, lambda: [
+                    scraper.get_profile_info(f"user{i}", instance=instance.url) for i in range(args.profiles)
+                ]),
+                "async search": (args.terms, lambda: asyncio.run(scraper._aget_tweets_dicts(
+                    [f"aterm{i}" for i in range(args.terms)], instances=[instance.url], instance_interval=0
+                ))),
+            }
+            for name, (calls, run) in runs.items():
+                requests, elapsed = count(instance, run)
+                total = sum(requests.values())
+                print(f"{'encrypted' if encrypted else 'plain':>9} {name:<12}: {calls} calls, {total} requests "
+                      f"({total / calls:.1f} per call, {requests.get('encryption-check', 0)} encryption checks) "
+                      f"in {elapsed:.2f}s")
+        finally:
+            instance.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Resume check of the streaming mode (`scrape_to_file`) on a local fake Nitter instance: the
+instance is killed in the middle of the job, a half written line is appended to the output
+(a crash between a write and its checkpoint), then the job is run again and must end with the
+same tweets as an uninterrupted run, without duplicates.
+
+    python benchmarks/bench_resume.py --terms 3 --pages 6
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from fake_nitter import load_nitter_module, start_instances
+
+
+def read_links(path):
+    links = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            item = json.loads(line)
+            links.append(item["data"]["link"] if item["kind"] == "tweet" else item["data"][0]["link"])
+    return links
+
+
+def kill_after(instance, requests):
+    def watch():
+        while instance.requests["search"] < requests:
+            time.sleep(0.005)
+        instance.stop()
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=6, help="Timeline pages per term")
+    parser.add_argument("--kill-after", type=int, default=8, help="Search pages served before the instance is killed")
+    args = parser.parse_args()
+
+    module = load_nitter_module()
+    # No politeness delay between the pages of the local instance
+    module.sleep = lambda seconds: None
+    instance = start_instances(1, pages=args.pages)[0]
+    terms = [f"term{i}" for i in range(args.terms)]
+    try:
+        scraper = module.Nitter(instances=[instance.url], skip_instance_check=True, log_level=0)
+        with tempfile.TemporaryDirectory() as directory:
+            reference = os.path.join(directory, "reference.jsonl")
+            start = time.perf_counter()
+            scraper.scrape_to_file(terms, reference, instance=instance.url, max_retries=3)
+            expected = read_links(reference)
+            print(f"uninterrupted: {len(expected)} items in {time.perf_counter() - start:.2f}s")
+
+            output = os.path.join(directory, "output.jsonl")
+            kill_after(instance, instance.requests["search"] + args.kill_after)
+            written = scraper.scrape_to_file(terms, output, instance=instance.url, max_retries=3)
+            print(f"killed after {args.kill_after} pages: {sum(written.values())} items written")
+            with open(output, "ab") as f:
+                f.write(b'{"term": "term0", "kind": "tweet", "da')
+
+            instance.start(port=instance.port)
+            requests = instance.requests["search"]
+            written = scraper.scrape_to_file(terms, output, instance=instance.url, max_retries=3)
+            print(f"resumed: {sum(written.values())} items written, "
+                  f"{instance.requests['search'] - requests} search pages fetched")
+
+            links = read_links(output)
+            assert len(links) == len(set(links)), "Duplicate tweets after the resume"
+            assert sorted(links) == sorted(expected), "The resumed job differs from the uninterrupted one"
+            print(f"resumed output: {len(links)} items, no duplicates, identical to the uninterrupted run")
+    finally:
+        instance.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Local fake Nitter instances for benchmarks (no network access needed).
+
+Serves deterministic timelines (search, user), single tweets, profiles and
+following/followers lists with the markup the scraper parses, including threads,
+quotes, media, and both plain (/pic/...) and encrypted (/pic/enc/...) media URLs.
+Every instance counts its requests and can inject latency, errors and downtime.
+
+    from fake_nitter import start_instances, load_nitter_module
+    instances = start_instances(3, latency=0.05)
+    Nitter = load_nitter_module().Nitter
+    scraper = Nitter(instances=[instance.url for instance in instances], skip_instance_check=True)
+"""
+import base64
+import hashlib
+import importlib.util
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+NITTER_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Nitter Source Code.py")
+
+WORDS = ("data science model tweet python open source release thread launch benchmark "
+         "graph cache latency scraper timeline instance parser async search user").split()
+
+
+def load_nitter_module():
+    """Import `Nitter Source Code.py` (its file name is not importable with a plain import)"""
+    if "nitter_source_code" in sys.modules:
+        return sys.modules["nitter_source_code"]
+    spec = importlib.util.spec_from_file_location("nitter_source_code", NITTER_SOURCE)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so the scraper can be pickled for its worker processes
+    sys.modules["nitter_source_code"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# Define the media URL helpers (same formats as Nitter, with or without base64 encryption)
+def _b64(text):
+    # The scraper splits encrypted URLs on "/", so pick a variant whose base64 has none
+    for variant in range(1000):
+        candidate = text if variant == 0 else f"{text}{'&' if '?' in text else '?'}v={variant}"
+        encoded = base64.b64encode(candidate.encode("utf-8")).decode("utf-8")
+        if "/" not in encoded:
+            return encoded
+    raise ValueError(f"Could not encode {text}")
+
+
+def pic_url(path, encrypted):
+    """URL of an image served through the instance (path like 'media/abc.jpg?name=small')"""
+    if encrypted:
+        return "/pic/enc/" + _b64(path)
+    return "/pic/" + quote(path, safe="")
+
+
+def avatar_url(profile_id, name, encrypted):
+    if encrypted:
+        return "/pic/enc/" + _b64(f"pbs.twimg.com/profile_images/{profile_id}/{name}_bigger.jpg")
+    return "/pic/" + quote(f"profile_images/{profile_id}/{name}_bigger.jpg", safe="")
+
+
+def video_url(video_id, encrypted):
+    url = f"https://video.twimg.com/ext_tw_video/{video_id}/pu/pl/{video_id}.m3u8"
+    if encrypted:
+        return "/video/enc/" + _b64(url)
+    return "/video/" + quote(url, safe="")
+
+
+def gif_url(gif_id, encrypted):
+    path = f"video.twimg.com/tweet_video/{gif_id}.mp4"
+    if encrypted:
+        return "/pic/enc/" + _b64(path)
+    return "/pic/" + quote(path, safe="")
+
+
+# Define the deterministic content
+def _rng(*parts):
+    return random.Random(hashlib.md5("\0".join(map(str, parts)).encode("utf-8")).hexdigest())
+
+
+def _number(rng):
+    value = rng.choice([0, 0, rng.randint(1, 999), rng.randint(1000, 99999)])
+    return f"{value:,}" if value else ""
+
+
+def _user(rng):
+    name = f"user{rng.randint(0, 9999)}"
+    return name, f"{name.title()} {rng.choice(WORDS).title()}", str(rng.randint(10**17, 10**18))
+
+
+def _media(rng, tweet_id, encrypted):
+    kind = rng.choice(["image", "image", "images", "video", "video_source", "gif"])
+    if kind in ("image", "images"):
+        images = "".join(
+            f'<div class="attachment image"><a class="still-image" href="/pic/orig/media%2F{tweet_id}_{i}.jpg" target="_blank">'
+            f'<img src="{pic_url(f"media/{tweet_id}_{i}.jpg?name=small&format=webp", encrypted)}" alt="" loading="lazy"></a></div>'
+            for i in range(1 if kind == "image" else rng.randint(2, 4))
+        )
+        return f'<div class="attachments"><div class="gallery-row" style="">{images}</div></div>'
+    if kind == "video":
+        return (f'<div class="attachments card"><div class="gallery-video"><div class="attachment video-container">'
+                f'<img src="{pic_url(f"ext_tw_video_thumb/{tweet_id}/pu/img/thumb.jpg", encrypted)}" alt="">'
+                f'<video poster="{pic_url(f"ext_tw_video_thumb/{tweet_id}/pu/img/thumb.jpg", encrypted)}" '
+                f'data-url="{video_url(tweet_id, encrypted)}" data-autoload="false"></video>'
+                f'<div class="video-overlay" onclick="playVideo(this)"><div class="overlay-circle"><span class="overlay-triangle"></span></div></div>'
+                f'</div></div></div>')
+    if kind == "video_source":
+        return (f'<div class="attachments card"><div class="gallery-video"><div class="attachment video-container">'
+                f'<video poster="{pic_url(f"amplify_video_thumb/{tweet_id}/img/thumb.jpg", encrypted)}" controls="">'
+                f'<source src="https://video.twimg.com/amplify_video/{tweet_id}/vid/720x720/{tweet_id}.mp4" type="video/mp4"></video>'
+                f'</div></div></div>')
+    return (f'<div class="attachments media-gif"><div class="gallery-gif" style="max-height: unset; "><div class="attachment">'
+            f'<video class="gif" poster="{pic_url(f"tweet_video_thumb/{tweet_id}.jpg", encrypted)}" autoplay="" muted="" loop="">'
+            f'<source src="{gif_url(tweet_id, encrypted)}" type="video/mp4"></video></div></div></div>')
+
+
+def _name_row(username, fullname, tweet_id, rng, avatar=None):
+    avatar_html = f'<img class="avatar round mini" src="{avatar}" alt="" loading="lazy">' if avatar else ""
+    date = f"{rng.choice(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'])} {rng.randint(1, 28)}, {rng.randint(2015, 2024)} · {rng.randint(1, 12)}:{rng.randint(0, 59):02d} {rng.choice(['AM', 'PM'])} UTC"
+    return (f'<div class="tweet-name-row"><div class="fullname-and-username">{avatar_html}'
+            f'<a class="fullname" href="/{username}" title="{fullname}">{fullname}</a>'
+            f'<a class="username" href="/{username}" title="@{username}">@{username}</a></div>'
+            f'<span class="tweet-date"><a href="/{username}/status/{tweet_id}#m" title="{date}">{rng.randint(1, 23)}h</a></span></div>')
+
+
+def _text(rng, tweet_id):
+    words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+    extras = []
+    if rng.random() < 0.4:
+        extras.append(f'<a href="https://example.com/articles/{tweet_id}">example.com/articles/{tweet_id}</a>')
+    if rng.random() < 0.3:
+        tag = rng.choice(WORDS)
+        extras.append(f'<a href="/search?q=%23{tag}">#{tag}</a>')
+    if rng.random() < 0.2:
+        extras.append(f'<a href="/{_user(rng)[0]}">@mention</a>')
+    if rng.random() < 0.2:
+        extras.append("\nsecond line &amp; more")
+    return words + " " + " ".join(extras)
+
+
+def render_tweet(seed, encrypted=False, classes="timeline-item ", username=None):
+    """Render one timeline item, the content only depends on `seed`"""
+    rng = _rng("tweet", seed)
+    tweet_id = rng.randint(10**18, 2 * 10**18)
+    user, fullname, profile_id = _user(rng)
+    username = username or user
+    parts = [f'<div class="{classes}" data-username="{username}">',
+             f'<a class="tweet-link" href="/{username}/status/{tweet_id}#m"></a>',
+             '<div class="tweet-body"><div>']
+    if rng.random() < 0.1:
+        parts.append(f'<div class="retweet-header"><span><div class="icon-container"><span class="icon-retweet" title=""></span> {fullname} retweeted</div></span></div>')
+    if rng.random() < 0.05:
+        parts.append('<div class="pinned"><span><div class="icon-container"><span class="icon-pin" title=""></span> Pinned Tweet</div></span></div>')
+    parts.append(f'<div class="tweet-header"><a class="tweet-avatar" href="/{username}">'
+                 f'<img class="avatar round" src="{avatar_url(profile_id, rng.choice(WORDS), encrypted)}" alt="" loading="lazy"></a>'
+                 + _name_row(username, fullname, tweet_id, rng) + '</div></div>')
+    if rng.random() < 0.2:
+        replied = [_user(rng)[0] for _ in range(rng.randint(1, 3))]
+        parts.append('<div class="replying-to">Replying to ' + " ".join(f'<a href="/{name}">@{name}</a>' for name in replied) + '</div>')
+    parts.append(f'<div class="tweet-content media-body" dir="auto">{_text(rng, tweet_id)}</div>')
+    if rng.random() < 0.15:
+        parts.append(f'<div class="card"><a class="card-container" href="https://news.example.com/{tweet_id}">'
+                     f'<div class="card-content-container"><div class="card-content"><h2 class="card-title">{rng.choice(WORDS)}</h2>'
+                     f'<span class="card-destination">news.example.com</span></div></div></a></div>')
+    if rng.random() < 0.35:
+        parts.append(_media(rng, tweet_id, encrypted))
+    quote_roll = rng.random()
+    if quote_roll < 0.03:
+        parts.append('<div class="quote unavailable"><div class="unavailable-quote">This tweet is unavailable</div></div>')
+    elif quote_roll < 0.2:
+        quoted_id = rng.randint(10**18, 2 * 10**18)
+        quoted_user, quoted_name, quoted_profile = _user(rng)
+        quote_media = f'<div class="quote-media-container">{_media(rng, quoted_id, encrypted)}</div>' if rng.random() < 0.4 else ""
+        parts.append(f'<div class="quote quote-big"><a class="quote-link" href="/{quoted_user}/status/{quoted_id}#m"></a>'
+                     + _name_row(quoted_user, quoted_name, quoted_id, rng, avatar_url(quoted_profile, "q", encrypted))
+                     + f'<div class="quote-text" dir="auto">{_text(rng, quoted_id)}</div>{quote_media}</div>')
+    parts.append('<div class="tweet-stats">' + "".join(
+        f'<span class="tweet-stat"><div class="icon-container"><span class="icon-{icon}" title=""></span> {_number(rng)}</div></span>'
+        for icon in ("comment", "retweet", "quote", "heart")
+    ) + '</div></div></div>')
+    return "".join(parts)
+
+
+def render_timeline(key, page, pages=5, page_size=20, encrypted=False, show_more_href=None, username=None):
+    """Render one timeline page (mix of single tweets and threads) with its show-more link"""
+    rng = _rng("timeline", key, page)
+    items = []
+    count = 0
+    while count < page_size:
+        seed = f"{key}:{page}:{count}"
+        if rng.random() < 0.1:
+            length = rng.randint(2, 4)
+            for position in range(length):
+                classes = "timeline-item thread" + (" thread-last" if position == length - 1 else "")
+                items.append(render_tweet(f"{seed}:{position}", encrypted, classes, username))
+            count += length
+        else:
+            items.append(render_tweet(seed, encrypted, username=username))
+            count += 1
+    if page < pages and show_more_href:
+        items.append(f'<div class="show-more"><a href="{show_more_href}">Load more</a></div>')
+    else:
+        items.append('<div class="timeline-footer"><h2 class="timeline-end">No more items</h2></div>')
+    return _html(f'<div class="timeline">{"".join(items)}</div>')
+
+
+def render_profile_card(username, encrypted=False):
+    rng = _rng("profile", username)
+    profile_id = str(rng.randint(10**8, 10**10))
+    return (f'<div class="profile-banner"><a href="/pic/orig/profile_banners%2F{profile_id}%2F1500x500" target="_blank">'
+            f'<img src="{pic_url(("pbs.twimg.com/" if encrypted else "") + f"profile_banners/{profile_id}/1500x500", encrypted)}" alt=""></a></div>'
+            f'<div class="profile-tab"><div class="profile-card"><a class="profile-card-avatar" href="/pic/orig/avatar" target="_blank">'
+            f'<img src="{pic_url(f"pbs.twimg.com/profile_images/{profile_id}/avatar_400x400.jpg", encrypted)}" alt=""></a>'
+            f'<div class="profile-card-tabs-name"><a class="profile-card-fullname" href="/{username}" title="{username.title()}">{username.title()}</a>'
+            f'<a class="profile-card-username" href="/{username}" title="@{username}">@{username}</a></div>'
+            f'<div class="profile-card-extra"><div class="profile-bio"><p dir="auto">{" ".join(rng.choice(WORDS) for _ in range(12))}</p></div>'
+            f'<div class="profile-location"><span><span class="icon-location" title=""></span></span><span>Jakarta</span></div>'
+            f'<div class="profile-website"><span><span class="icon-link" title=""></span><a href="https://{username}.example.com">{username}.example.com</a></span></div>'
+            f'<div class="profile-joindate"><span title="10:00 AM - 1 Jan 2015"><span class="icon-calendar" title=""></span> Joined January 2015</span></div></div>'
+            f'<div class="profile-card-extra-links"><ul class="profile-statlist">'
+            + "".join(f'<li class="{stat}"><span class="profile-stat-header">{stat.title()}</span><span class="profile-stat-num">{rng.randint(0, 99999):,}</span></li>'
+                      for stat in ("posts", "following", "followers", "likes"))
+            + '</ul></div></div>'
+            f'<div class="photo-rail-card"><div class="photo-rail-header"><a href="/{username}/media"><div class="icon-container">'
+            f'<span class="icon-picture" title=""></span>{rng.randint(0, 9999):,} Photos and videos</div></a></div></div></div>')
+
+
+def follow_list(username, kind, universe=500, size=None):
+    """Deterministic following/followers list of a user, drawn from `universe` usernames"""
+    rng = _rng("follow", username, kind)
+    size = rng.randint(5, 60) if size is None else size
+    return [f"user{rng.randrange(universe)}" for _ in range(size)]
+
+
+def render_follow_page(username, kind, page, page_size=20, universe=500):
+    users = follow_list(username, kind, universe)
+    chunk = users[(page - 1) * page_size:page * page_size]
+    items = [
+        f'<div class="timeline-item "><a class="tweet-link" href="/{user}"></a><div class="tweet-body profile-result">'
+        f'<div class="tweet-header"><a class="tweet-avatar" href="/{user}"><img class="avatar round" src="/pic/profile_images%2F1%2F{user}_bigger.jpg" alt=""></a>'
+        f'<div class="tweet-name-row"><div class="fullname-and-username"><a class="fullname" href="/{user}" title="{user.title()}">{user.title()}</a>'
+        f'<a class="username" href="/{user}" title="@{user}">@{user}</a></div></div></div></div></div>'
+        for user in chunk
+    ]
+    if page * page_size < len(users):
+        items.append(f'<div class="show-more"><a href="?cursor=c{page + 1}">Load more</a></div>')
+    return _html(f'<div class="timeline">{"".join(items)}</div>')
+
+
+def render_error(message):
+    return _html(f'<div class="error-panel"><span>{message}</span></div>')
+
+
+def _html(body):
+    return ("<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>nitter</title></head><body>"
+            f'<nav><div class="inner-nav"><a class="site-name" href="/">nitter</a></div></nav>'
+            f'<div class="container">{body}</div></body></html>')
+
+
+# Define the server
+class FakeNitterInstance:
+    """
+    One fake Nitter instance on a local port
+
+    :param latency: seconds added to every response
+    :param failure_rate: share of requests answered with a 429 rate limit error page
+    :param pages: number of timeline pages of every search term / user
+    :param page_size: timeline items per page
+    :param encrypted: True to serve base64 encrypted media URLs
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, pages=5, page_size=20, encrypted=False, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.pages = pages
+        self.page_size = page_size
+        self.encrypted = encrypted
+        self.requests = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    def start(self, port=0):
+        instance = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if instance._server is None:
+                    # Stopped: drop the kept-alive connections too
+                    self.close_connection = True
+                    return
+                status, body = instance.handle(self.path)
+                data = body.encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout)
+                    self.close_connection = True
+
+        ThreadingHTTPServer.daemon_threads = True
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.request_queue_size = 1024
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Shut the instance down (connections are refused or dropped afterwards)"""
+        if self._server:
+            server, self._server = self._server, None
+            server.shutdown()
+            server.server_close()
+
+    def _count(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+            return self._rng.random()
+
+    def handle(self, target):
+        parts = urlsplit(target)
+        path, query = parts.path, parse_qs(parts.query, keep_blank_values=True)
+        page = int(query.get("cursor", ["c1"])[0].lstrip("c") or 1)
+        segments = [segment for segment in path.split("/") if segment]
+
+        if path == "/search":
+            kind = "search"
+        elif path == "/x":
+            kind = "encryption-check"
+        elif len(segments) >= 2 and segments[1] == "status":
+            kind = "status"
+        elif len(segments) == 2 and segments[1] in ("following", "followers"):
+            kind = "follow"
+        elif segments:
+            kind = "user"
+        else:
+            kind = "other"
+
+        roll = self._count(kind)
+        if self.latency:
+            time.sleep(self.latency)
+        if roll < self.failure_rate:
+            return 429, render_error("Instance has been rate limited.")
+
+        if kind == "search":
+            term = query.get("q", [""])[0]
+            href = f"?f=tweets&q={quote(term)}&cursor=c{page + 1}"
+            return 200, render_timeline(f"search:{term}", page, self.pages, self.page_size, self.encrypted, href)
+        if kind == "encryption-check":
+            return 200, render_timeline("x", 1, 1, 5, self.encrypted).replace(
+                '<div class="timeline">', render_profile_card("x", self.encrypted) + '<div class="timeline">', 1)
+        if kind == "status":
+            return 200, _html(f'<div class="conversation"><div class="main-thread"><div class="main-tweet">'
+                              f'{render_tweet(f"status:{segments[2]}", self.encrypted, username=segments[0])}</div></div></div>')
+        if kind == "follow":
+            return 200, render_follow_page(segments[0], segments[1], page)
+        if kind == "user":
+            username = segments[0]
+            timeline = render_timeline(f"user:{username}", page, self.pages, self.page_size, self.encrypted, f"?cursor=c{page + 1}", username)
+            if page == 1:
+                timeline = timeline.replace('<div class="timeline">', render_profile_card(username, self.encrypted) + '<div class="timeline">', 1)
+            return 200, timeline
+        return 404, render_error("Page not found")
+
+
+def start_instances(count, **kwargs):
+    """Start `count` fake instances on free local ports"""
+    return [FakeNitterInstance(seed=index, **kwargs).start() for index in range(count)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve fake Nitter instances until interrupted")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--encrypted", action="store_true")
+    args = parser.parse_args()
+
+    servers = start_instances(args.count, latency=args.latency, failure_rate=args.failure_rate, encrypted=args.encrypted)
+    print("Fake instances:", ", ".join(server.url for server in servers))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
@@ -51,7 +51,7 @@ def main():
     render_rag_explanation()
     
     # Sidebar configuration
-    model_name, chunk_size, overlap, reduction_method, collection_name = render_sidebar()
+    model_name, chunk_size, overlap, reduction_method, collection_name, index_backend, chunk_unit = render_sidebar()
     
     st.divider()
     
@@ -63,7 +63,7 @@ def main():
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        render_input_section(model_name, chunk_size, overlap, collection_name)
+        render_input_section(model_name, chunk_size, overlap, collection_name, index_backend, chunk_unit)
     
     with col2:
         render_query_section(model_name)
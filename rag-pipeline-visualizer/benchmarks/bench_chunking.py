@@ -0,0 +1,130 @@
+"""
+Time and memory of chunking a large text: the previous chunk_text against split_text.
+
+The bundled data/ samples are repeated up to --mb Mi characters. The previous chunk_text converted the
+word budgets to characters (x6) and ran LangChain's RecursiveCharacterTextSplitter, returning a list
+of strings; split_text counts words (or tokens) and returns a Chunks of offsets into the text. Every
+run happens in a fresh process, which reports its peak memory (max RSS) above the text it was given
+and the memory held by the chunks it returned. The comparison needs langchain-text-splitters.
+
+    python benchmarks/bench_chunking.py --mb 100
+    python benchmarks/bench_chunking.py --mb 10 --tokenizer sentence-transformers/all-MiniLM-L6-v2
+"""
+import argparse
+import importlib
+import multiprocessing
+import resource
+import sys
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# src/core as a bare package: its __init__ imports streamlit and the models, the benchmark only needs the chunker
+_core = types.ModuleType("core")
+_core.__path__ = [str(ROOT / "src" / "core")]
+sys.modules["core"] = _core
+chunking = importlib.import_module("core.chunking")
+
+
+def previous_chunk_text(text, chunk_size, overlap):
+    # The previous chunk_text, without the markdown cleaning
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size * 6,
+        chunk_overlap=overlap * 6,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", ", ", " ", ""],
+        is_separator_regex=False,
+    )
+    return [chunk.strip() for chunk in splitter.split_text(text) if chunk.strip()]
+
+
+def repeated_chunks(chunks):
+    # Chunks lying inside the one before them, whose text is only the overlap of the previous chunk
+    return np.flatnonzero((chunks.starts[1:] >= chunks.starts[:-1]) & (chunks.ends[1:] <= chunks.ends[:-1])) + 1
+
+
+def check_overlap():
+    # Paragraphs longer than a chunk: separators inside the overlap must not end the next chunk
+    text = "\n\n".join(" ".join(f"w{p}_{i}" for i in range(150)) + "." for p in range(6))
+    for chunks in (chunking.split_text(text, 100, 20),
+                   chunking.split_text("one two three four five six seven. eight nine ten eleven twelve", 3, 1)):
+        assert not len(repeated_chunks(chunks)), f"Chunks {repeated_chunks(chunks).tolist()} repeat the previous one"
+
+
+def chunks_size(chunks):
+    if isinstance(chunks, chunking.Chunks):
+        return chunks.starts.nbytes + chunks.ends.nbytes
+    return sys.getsizeof(chunks) + sum(sys.getsizeof(chunk) for chunk in chunks)
+
+
+def make_text(megabytes):
+    samples = "\n\n".join(path.read_text(encoding="utf-8") for path in sorted((ROOT / "data").glob("*.txt")))
+    # One allocation of the final size, so that it is also the peak memory before chunking
+    repeats, rest = divmod(megabytes * 2**20, len(samples))
+    return "".join([samples] * repeats + [samples[:rest]])
+
+
+def run(args):
+    name, megabytes, chunk_size, overlap, tokenizer_name, queue = args
+    text = make_text(megabytes)
+    tokenizer = None
+    if tokenizer_name:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if name == "previous":
+        chunks = previous_chunk_text(text, chunk_size, overlap)
+    else:
+        chunks = chunking.split_text(text, chunk_size, overlap, unit=name, tokenizer=tokenizer)
+        assert not len(repeated_chunks(chunks)), "A chunk only repeats the previous one"
+    elapsed = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    words = [len(chunks[i].split()) for i in range(0, len(chunks), max(len(chunks) // 1000, 1))]
+    queue.put((elapsed, peak * 1024, len(chunks), chunks_size(chunks), sum(words) / len(words), max(words)))
+
+
+def measure(name, label, args):
+    # A fresh process per run, so that max RSS is the peak of this run only (the parent never holds the text,
+    # whose memory would count in the max RSS of the children it forks)
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run, args=((name, args.mb, args.chunk_size, args.overlap, args.tokenizer, queue),))
+    process.start()
+    elapsed, peak, count, held, mean_words, max_words = queue.get()
+    process.join()
+    print(f"  {label:<40} {elapsed:7.2f}s {args.mb / elapsed:6.1f} Mi chars/s  peak +{peak / 2**20:4.0f} MiB  "
+          f"{count} chunks held in {held / 2**20:6.1f} MiB  words/chunk mean {mean_words:.0f} max {max_words}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=100, help="Size of the text in Mi characters")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Words (or tokens) per chunk")
+    parser.add_argument("--overlap", type=int, default=20)
+    parser.add_argument("--tokenizer", help="Also split by tokens of this Hugging Face tokenizer")
+    parser.add_argument("--skip-previous", action="store_true", help="Only run split_text")
+    args = parser.parse_args()
+
+    check_overlap()
+    print(f"{args.mb} Mi characters of data/ samples, chunks of {args.chunk_size} words, overlap {args.overlap}")
+    before = None
+    if not args.skip_previous:
+        before = measure("previous", "RecursiveCharacterTextSplitter (x6 chars)", args)
+    elapsed = measure("words", "split_text (words)", args)
+    if before:
+        print(f"  split_text is {before / elapsed:.1f}x faster")
+    if args.tokenizer:
+        measure("tokens", f"split_text (tokens of {args.tokenizer})", args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Throughput of clean_markdown_text on the bundled data/ samples, scaled up.
+
+The samples are concatenated and repeated --scale times (300 times is about 10 MB), then cleaned
+by the previous implementation (one re.sub over the whole text per removal), by
+clean_markdown_text, and by iter_clean_markdown streaming the lines of a file. Every result must be
+identical to the previous one. The peak memory of reading and cleaning the file is measured
+separately with tracemalloc, which slows everything down.
+
+Streaming only holds one block of lines at a time while no markdown construct is left open at its
+end. The fenced code of LangGraph_Overview.txt leaves a single backtick open, which the previous
+regexes pair with the first backtick of the next repetition: with that sample, blocks have to grow
+over most of the text to give the same output, and the largest block is reported.
+
+    python benchmarks/bench_clean_markdown.py --scale 300
+    python benchmarks/bench_clean_markdown.py --scale 300 --exclude LangGraph_Overview.txt
+"""
+import argparse
+import importlib
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# src/core as a bare package: its __init__ imports streamlit and the models, the benchmark only needs the cleaner
+_core = types.ModuleType("core")
+_core.__path__ = [str(ROOT / "src" / "core")]
+sys.modules["core"] = _core
+text_processing = importlib.import_module("core.text_processing")
+
+
+def previous_clean_markdown_text(text):
+    # The previous implementation, kept as the reference output
+    text = re.sub(r'^#+\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^[\-=\*]{3,}\s*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\*\*([^\*]+)\*\*', r'\1', text)
+    text = re.sub(r'__([^_]+)__', r'\1', text)
+    text = re.sub(r'\*([^\*]+)\*', r'\1', text)
+    text = re.sub(r'_([^_]+)_', r'\1', text)
+    text = re.sub(r'`([^`]+)`', r'\1', text)
+    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+    text = re.sub(r'!\[[^\]]*\]\([^\)]+\)', '', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'^[\s]*[\-\*•]\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^[\s]*\d+\.\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    text = re.sub(r' {2,}', ' ', text)
+    return text.strip()
+
+
+def largest_block(path):
+    # Size of the largest block iter_clean_markdown had to clean at once
+    clean_block = text_processing._clean_block
+    sizes = []
+    text_processing._clean_block = lambda text, last: sizes.append(len(text)) or clean_block(text, last)
+    try:
+        clean_file(path)
+    finally:
+        text_processing._clean_block = clean_block
+    return max(sizes)
+
+
+def clean_file(path):
+    with open(path, encoding="utf-8") as f:
+        return sum(len(piece) for piece in text_processing.iter_clean_markdown(f))
+
+
+def clean_file_previous(path):
+    with open(path, encoding="utf-8") as f:
+        return len(previous_clean_markdown_text(f.read()))
+
+
+def timed(function, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def peak_memory(function, *args):
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=300, help="Times the data/ samples are repeated")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each implementation, the best is reported")
+    parser.add_argument("--exclude", nargs="*", default=[], help="Samples of data/ left out")
+    args = parser.parse_args()
+
+    samples = [path.read_text(encoding="utf-8") for path in sorted((ROOT / "data").glob("*.txt"))
+               if path.name not in args.exclude]
+    text = "\n".join(samples) * args.scale
+    size_mb = len(text.encode("utf-8")) / 2**20
+    print(f"{len(samples)} samples x {args.scale}: {size_mb:.1f} MiB, {text.count(chr(10))} lines")
+
+    expected, before = timed(previous_clean_markdown_text, text, repeat=args.repeat)
+    print(f"  previous (re.sub passes):    {size_mb / before:6.1f} MiB/s")
+    cleaned, elapsed = timed(text_processing.clean_markdown_text, text, repeat=args.repeat)
+    assert cleaned == expected, "clean_markdown_text changed the output"
+    print(f"  clean_markdown_text:         {size_mb / elapsed:6.1f} MiB/s ({before / elapsed:.1f}x), identical output")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "samples.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        del text
+        with open(path, encoding="utf-8") as f:
+            streamed = "".join(text_processing.iter_clean_markdown(f))
+        assert streamed == expected, "iter_clean_markdown changed the output"
+        del streamed, expected, cleaned
+
+        length, elapsed = timed(clean_file, path, repeat=args.repeat)
+        print(f"  iter_clean_markdown on file: {size_mb / elapsed:6.1f} MiB/s ({before / elapsed:.1f}x), identical output")
+        print(f"  largest block cleaned at once: {largest_block(path) / 2**20:.2f} Mi characters")
+        print(f"  peak memory reading and cleaning the file: previous {peak_memory(clean_file_previous, path) / 2**20:.1f} MiB, "
+              f"streamed {peak_memory(clean_file, path) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
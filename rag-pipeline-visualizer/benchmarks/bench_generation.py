@@ -0,0 +1,183 @@
+"""
+Latency of the generation stage against a local fake OpenAI-compatible server.
+
+The server answers /v1/chat/completions like the OpenAI API, blocking or streamed (server-sent
+events, with the usage in a last chunk), after --first-token-ms of "prompt processing" and
+--token-ms per generated token. The previous generate_response (a new client per call and a
+blocking request) is compared with stream_response on the shared client: the time until the
+first text can be shown, the total latency and the tokens/s. Both must return the same answer.
+
+With --serve the fake server only runs, to try the app without an API key:
+
+    python benchmarks/bench_generation.py --questions 20 --tokens 200
+    python benchmarks/bench_generation.py --serve --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake streamlit run app.py
+"""
+import argparse
+import importlib
+import json
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from openai import OpenAI
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# src/core as a bare package: its __init__ imports the models, the benchmark only needs the LLM calls
+_core = types.ModuleType("src.core")
+_core.__path__ = [str(ROOT / "src" / "core")]
+sys.modules["src.core"] = _core
+llm = importlib.import_module("src.core.llm")
+
+SYSTEM_PROMPT = """You are a helpful AI assistant. Use the provided context to answer the user's question accurately and comprehensively. 
+If the context doesn't contain relevant information, acknowledge this and provide the best answer you can based on your knowledge.
+Always cite which parts of the context you used in your answer."""
+
+WORDS = "the retrieved context says that chunks are embedded compared and passed to the model".split()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests, like the API
+    protocol_version = "HTTP/1.1"
+    tokens = 100
+    first_token_delay = 0.2
+    token_delay = 0.01
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        count = min(self.tokens, request.get("max_tokens") or self.tokens)
+        pieces = [WORDS[i % len(WORDS)] + " " for i in range(count)]
+        prompt_tokens = sum(len(message["content"].split()) for message in request["messages"])
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": count, "total_tokens": prompt_tokens + count}
+        model = request["model"]
+
+        time.sleep(self.first_token_delay)
+        if not request.get("stream"):
+            time.sleep(self.token_delay * (count - 1))
+            body = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(data):
+            event = f"data: {data}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+
+        def chunk(choices, usage=None):
+            return json.dumps({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0,
+                               "model": model, "choices": choices, "usage": usage})
+
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.token_delay)
+            send(chunk([{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]))
+        send(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send(chunk([], usage))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_server(port, tokens, first_token_ms, token_ms):
+    FakeOpenAIHandler.tokens = tokens
+    FakeOpenAIHandler.first_token_delay = first_token_ms / 1000
+    FakeOpenAIHandler.token_delay = token_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def previous_generate_response(base_url, query, retrieved_chunks, model="gpt-4o-mini"):
+    # The previous generate_response: a new client for every call and a blocking request
+    client = OpenAI(api_key="fake", base_url=base_url)
+    context_text = "\n\n".join(f"[Context {i+1}]:\n{chunk}" for i, chunk in enumerate(retrieved_chunks))
+    user_message = (f"Context Information:\n{'='*80}\n{context_text}\n{'='*80}\n\nUser Question: {query}\n\n"
+                    "Please answer the question based on the context provided above.")
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message}
+        ],
+        temperature=0.7,
+        max_tokens=1000
+    )
+    return response.choices[0].message.content, response.usage.completion_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens of every answer")
+    parser.add_argument("--first-token-ms", type=float, default=200, help="Delay of the server before the first token")
+    parser.add_argument("--token-ms", type=float, default=10, help="Delay of the server between tokens")
+    parser.add_argument("--serve", action="store_true", help="Only run the fake server")
+    parser.add_argument("--port", type=int, default=0, help="Port of the fake server (0 for any free port)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.tokens, args.first_token_ms, args.token_ms)
+    if args.serve:
+        print(f"Fake OpenAI-compatible server on {base_url}, Ctrl+C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    chunks = [f"Chunk {i}: " + " ".join(WORDS * 5) for i in range(5)]
+    queries = [f"What happens to chunk {i}?" for i in range(args.questions)]
+    print(f"{args.questions} questions, {args.tokens} tokens per answer, first token after {args.first_token_ms:.0f} ms, "
+          f"{args.token_ms:.0f} ms per token")
+
+    start = time.perf_counter()
+    before = [previous_generate_response(base_url, query, chunks) for query in queries]
+    before_time = (time.perf_counter() - start) / len(queries)
+    print(f"  previous (new client, blocking):   first text after {before_time * 1000:6.0f} ms, "
+          f"total {before_time * 1000:6.0f} ms, {args.tokens / before_time:6.1f} tokens/s")
+
+    client = OpenAI(api_key="fake", base_url=base_url)
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        stream = llm.stream_response(query, chunks, client=client)
+        for _ in stream:
+            pass
+        results.append(stream.result)
+    elapsed = (time.perf_counter() - start) / len(queries)
+    assert [result["response"] for result in results] == [answer for answer, _ in before], "Streaming changed the answers"
+    assert all(result["usage"]["completion_tokens"] == tokens for result, (_, tokens) in zip(results, before))
+
+    first_token = sum(result["timing"]["time_to_first_token"] for result in results) / len(results)
+    tokens_per_second = sum(result["timing"]["tokens_per_second"] for result in results) / len(results)
+    print(f"  stream_response (shared client):   first text after {first_token * 1000:6.0f} ms, "
+          f"total {elapsed * 1000:6.0f} ms, {tokens_per_second:6.1f} tokens/s while streaming, same answers")
+    print(f"  the first text shows {before_time / first_token:.1f}x sooner")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
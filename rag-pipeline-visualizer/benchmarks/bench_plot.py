@@ -0,0 +1,100 @@
+"""
+Build time and browser payload of the 3D embedding plot for growing corpora.
+
+Synthetic 3D layouts (points around topic centers, like a reduced embedding cloud) are plotted
+with the previous create_3d_plot (per-point Python lists and a text label on every marker) and
+with the current one, which aggregates the chunks on a grid past --max-points. The payload is
+the JSON of the figure, which Streamlit sends to the browser; the browser time grows with it. The
+app shows estimate_payload_size instead, which has to stay close to it.
+
+    python benchmarks/bench_plot.py --sizes 1000 10000 200000
+"""
+import argparse
+import importlib
+import sys
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+import plotly.graph_objects as go
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# src/core as a bare package: its __init__ imports the embedding models, the benchmark only needs the plot
+_core = types.ModuleType("src.core")
+_core.__path__ = [str(ROOT / "src" / "core")]
+sys.modules["src.core"] = _core
+visualization = importlib.import_module("src.core.visualization")
+chunking = importlib.import_module("src.core.chunking")
+
+
+def previous_create_3d_plot(reduced_embeddings, chunks, selected_indices, query_point):
+    # The previous chunk trace: Python lists per point and a text label drawn on every marker
+    labels = [chunk[:50] + "..." if len(chunk) > 50 else chunk for chunk in chunks]
+    colors = ['#667eea'] * len(chunks)
+    sizes = [8] * len(chunks)
+    for idx in selected_indices:
+        colors[idx] = '#ff6b6b'
+        sizes[idx] = 12
+    fig = go.Figure()
+    fig.add_trace(go.Scatter3d(
+        x=reduced_embeddings[:, 0], y=reduced_embeddings[:, 1], z=reduced_embeddings[:, 2],
+        mode='markers+text',
+        marker=dict(size=sizes, color=colors, opacity=0.8, line=dict(color='white', width=0.5)),
+        text=[f"Chunk {i}" for i in range(len(chunks))],
+        hovertemplate='<b>Chunk %{text}</b><br>X: %{x:.3f}<br>Y: %{y:.3f}<br>Z: %{z:.3f}<br><extra></extra>',
+        customdata=labels,
+        name='Chunks'
+    ))
+    fig.add_trace(go.Scatter3d(x=[query_point[0]], y=[query_point[1]], z=[query_point[2]], mode='markers',
+                               marker=dict(size=15, color='#ffd93d', symbol='diamond'), name='Query'))
+    return fig
+
+
+def synthetic_layout(count, rng, topics=50):
+    centers = 3 * rng.standard_normal((topics, 3))
+    return centers[rng.integers(topics, size=count)] + 0.5 * rng.standard_normal((count, 3))
+
+
+def measure(create, *args):
+    start = time.perf_counter()
+    fig = create(*args)
+    built = time.perf_counter() - start
+    payload = len(fig.to_json())
+    return fig, built, time.perf_counter() - start, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 200000], help="Numbers of chunks")
+    parser.add_argument("--max-points", type=int, default=5000, help="Chunks above which they are aggregated")
+    parser.add_argument("--skip-previous", action="store_true", help="Only plot with the current create_3d_plot")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for count in args.sizes:
+        reduced = synthetic_layout(count, rng)
+        # Chunks of 10 words over one text, as chunk_text returns them
+        chunks = chunking.split_text(" ".join(f"word{i}" for i in range(count * 10)), 10)
+        selected = rng.choice(count, size=5, replace=False).tolist()
+        query = reduced[selected[0]] + 0.1
+
+        print(f"{count} chunks")
+        if not args.skip_previous:
+            _, built, total, payload = measure(previous_create_3d_plot, reduced, chunks, selected, query)
+            print(f"  previous:       built in {built * 1000:7.0f} ms, serialized after {total * 1000:7.0f} ms, "
+                  f"payload {payload / 2**20:7.2f} MiB, {count} markers with text labels")
+        fig, built, total, payload = measure(visualization.create_3d_plot, reduced, chunks, selected, query,
+                                             args.max_points)
+        assert {int(i) for i in fig.data[1].customdata[:, 0]} == set(selected), "A retrieved chunk is missing"
+        estimate = visualization.estimate_payload_size(fig)
+        assert abs(estimate - payload) <= 0.1 * payload + 16 * 1024, f"Payload estimated at {estimate}, not {payload}"
+        print(f"  create_3d_plot: built in {built * 1000:7.0f} ms, serialized after {total * 1000:7.0f} ms, "
+              f"payload {payload / 2**20:7.2f} MiB (estimated {estimate / 2**20:.2f}), {len(fig.data[0].x)} markers "
+              f"({fig.data[0].name})")
+
+
+if __name__ == "__main__":
+    main()
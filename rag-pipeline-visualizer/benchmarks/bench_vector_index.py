@@ -0,0 +1,130 @@
+"""
+Recall vs latency of the vector index backends on synthetic embeddings.
+
+The embeddings are drawn around random topic centers in a low dimensional space, then projected
+and normalized, like the sentence embeddings of a corpus. For every corpus size the exact backend
+gives the true top-k, then the HNSW and IVF-PQ backends are built and searched with a sweep of
+their search parameters (ef_search, and nprobe with and without re-ranking the product-quantized
+candidates). Every row reports the build time, the size of the saved index (and of the codes that
+IVF-PQ keeps in memory), the latency per query (one by one and batched) and the recall@k against
+the exact results.
+
+    python benchmarks/bench_vector_index.py --sizes 10000 100000 --dim 384 --queries 500
+"""
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Loaded by path: the src.core package imports streamlit and the models, the benchmark only needs the indexes
+_spec = importlib.util.spec_from_file_location(
+    "vector_index", Path(__file__).resolve().parent.parent / "src" / "core" / "vector_index.py"
+)
+vector_index = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(vector_index)
+
+
+def synthetic_embeddings(count, dim, topics, rng, latent_dim=64):
+    # Sentence embeddings vary along far fewer directions than they have dimensions: points around
+    # topic centers in a small latent space, projected to dim, plus isotropic noise
+    centers = rng.standard_normal((topics, latent_dim), dtype=np.float32)
+    latent = centers[rng.integers(topics, size=count)] + 0.5 * rng.standard_normal((count, latent_dim), dtype=np.float32)
+    projection = np.random.default_rng(1).standard_normal((latent_dim, dim), dtype=np.float32)
+    vectors = latent @ projection + 0.5 * rng.standard_normal((count, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall(found, expected):
+    k = expected.shape[1]
+    return np.mean([len(set(a[a >= 0]) & set(b)) / k for a, b in zip(found, expected)])
+
+
+def saved_size(index):
+    with tempfile.TemporaryDirectory() as path:
+        index.save(path)
+        loaded = vector_index.VectorIndex.load(path)
+        assert len(loaded) == len(index)
+        sizes = {name: os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)}
+    size = f"{sum(sizes.values()) / 2**20:7.1f} MiB"
+    if "ivfpq.faiss" in sizes:
+        size += f" (codes {sizes['ivfpq.faiss'] / 2**20:.1f} MiB)"
+    return size
+
+
+def measure(name, index, build_time, queries, expected, k, single_queries):
+    start = time.perf_counter()
+    for query in queries[:single_queries]:
+        index.search(query[None], k)
+    single = (time.perf_counter() - start) / single_queries
+    start = time.perf_counter()
+    ids, _ = index.search(queries, k)
+    batched = (time.perf_counter() - start) / len(queries)
+    print(f"  {name:<26} build {build_time:6.2f}s  {saved_size(index):<28}"
+          f"{single * 1000:7.3f} ms/query  {batched * 1000:7.3f} ms/query batched  recall@{k} {recall(ids, expected):.3f}")
+
+
+def build(backend, dim, vectors, **params):
+    start = time.perf_counter()
+    index = vector_index.create_vector_index(backend, dim, **params)
+    for batch in range(0, len(vectors), 10_000):
+        index.add(vectors[batch:batch + 10_000])
+    return index, time.perf_counter() - start
+
+
+def check_empty_search(dim=32):
+    # k=0 gives (q, 0) arrays on every backend, ivfpq once trained included
+    rng = np.random.default_rng(0)
+    vectors = synthetic_embeddings(512, dim, 8, rng)
+    for backend, params in (("exact", {}), ("hnsw", {}), ("ivfpq", {"nlist": 4, "m": 8, "nbits": 4, "train_size": 256})):
+        index, _ = build(backend, dim, vectors, **params)
+        ids, similarities = index.search(vectors[:3], 0)
+        assert ids.shape == similarities.shape == (3, 0), f"{backend}: k=0 returned {ids.shape}"
+    assert index._index is not None, "ivfpq was not trained"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="Corpus sizes")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding size (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--single-queries", type=int, default=100, help="Queries also searched one by one")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=200, help="Topic centers of the synthetic embeddings")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 10], help="IVF-PQ candidates re-scored per result")
+    args = parser.parse_args()
+
+    check_empty_search()
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        vectors = synthetic_embeddings(size + args.queries, args.dim, args.topics, rng)
+        vectors, queries = vectors[:size], vectors[size:]
+        print(f"{size} vectors x {args.dim} dims, {args.queries} queries, top-{args.k}")
+
+        exact, build_time = build("exact", args.dim, vectors)
+        expected, _ = exact.search(queries, args.k)
+        measure("exact", exact, build_time, queries, expected, args.k, args.single_queries)
+
+        hnsw, build_time = build("hnsw", args.dim, vectors)
+        for ef in args.ef_search:
+            hnsw.ef_search = ef
+            measure(f"hnsw ef_search={ef}", hnsw, build_time, queries, expected, args.k, args.single_queries)
+
+        if size < vector_index.IVFPQIndex(args.dim).train_size:
+            print(f"  ivfpq skipped: {size} vectors are too few to train it, they would be searched exactly")
+            continue
+        ivfpq, build_time = build("ivfpq", args.dim, vectors, rerank=max(args.rerank))
+        for rerank in args.rerank:
+            for nprobe in args.nprobe:
+                ivfpq.nprobe, ivfpq.rerank = nprobe, rerank
+                measure(f"ivfpq nprobe={nprobe} rerank={rerank}", ivfpq, build_time, queries, expected, args.k,
+                        args.single_queries)
+
+
+if __name__ == "__main__":
+    main()
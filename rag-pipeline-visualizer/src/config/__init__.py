@@ -3,20 +3,34 @@
 from .settings import (
     MODEL_OPTIONS,
     SAMPLE_TEXTS,
+    VECTOR_INDEX_OPTIONS,
+    CHUNK_UNIT_OPTIONS,
     DEFAULT_CHUNK_SIZE,
     DEFAULT_OVERLAP,
     DEFAULT_COLLECTION_NAME,
     DEFAULT_N_RESULTS,
-    DEFAULT_REDUCTION_METHOD
+    DEFAULT_REDUCTION_METHOD,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MAX_MB,
+    PLOT_MAX_POINTS,
+    PROMPT_TOKEN_BUDGET,
+    MAX_COMPLETION_TOKENS
 )
 
 __all__ = [
     'MODEL_OPTIONS',
     'SAMPLE_TEXTS',
+    'VECTOR_INDEX_OPTIONS',
+    'CHUNK_UNIT_OPTIONS',
     'DEFAULT_CHUNK_SIZE',
     'DEFAULT_OVERLAP',
     'DEFAULT_COLLECTION_NAME',
     'DEFAULT_N_RESULTS',
-    'DEFAULT_REDUCTION_METHOD'
+    'DEFAULT_REDUCTION_METHOD',
+    'EMBEDDING_CACHE_DIR',
+    'EMBEDDING_CACHE_MAX_MB',
+    'PLOT_MAX_POINTS',
+    'PROMPT_TOKEN_BUDGET',
+    'MAX_COMPLETION_TOKENS'
 ]
 
@@ -10,9 +10,24 @@ MODEL_OPTIONS = {
     "paraphrase-multilingual (Multilingual)": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 }
 
+# Chunk size units (label -> unit of src.core.chunking.split_text)
+CHUNK_UNIT_OPTIONS = {
+    "Words": "words",
+    "Tokens (embedding model)": "tokens"
+}
+
+# Vector store options (label -> backend of src.core.vector_store.build_vector_store)
+VECTOR_INDEX_OPTIONS = {
+    "Exact (NumPy)": "exact",
+    "HNSW (hnswlib)": "hnsw",
+    "IVF-PQ (faiss)": "ivfpq",
+    "ChromaDB": "chroma"
+}
+
 # Get the project root directory (assuming settings.py is in src/config/)
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
+CACHE_DIR = PROJECT_ROOT / ".cache"
 
 
 def load_sample_text(filename: str) -> str:
@@ -50,3 +65,13 @@ DEFAULT_COLLECTION_NAME = "rag_embeddings"
 DEFAULT_N_RESULTS = 3
 DEFAULT_REDUCTION_METHOD = "PCA"
 
+# Embedding cache (vectors kept on disk per model, LRU-evicted past this size)
+EMBEDDING_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR", CACHE_DIR / "embeddings"))
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+
+# 3D plot: past this many chunks, nearby points are drawn as one marker per grid cell
+PLOT_MAX_POINTS = int(os.getenv("PLOT_MAX_POINTS", "5000"))
+
+# Generation: tokens of the prompt (system prompt, packed context and question) and of the answer
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+MAX_COMPLETION_TOKENS = int(os.getenv("MAX_COMPLETION_TOKENS", "1000"))
@@ -1,22 +1,47 @@
 """Core functionality package"""
 
-from .models import load_model
-from .text_processing import chunk_text
-from .vector_store import create_chromadb_collection
-from .visualization import reduce_dimensions, create_3d_plot
+from .models import load_model, embed_chunks, get_embedding_cache
+from .text_processing import chunk_text, clean_markdown_text, iter_clean_markdown
+from .chunking import Chunks, split_text
+from .vector_store import create_chromadb_collection, build_vector_store, query_vector_store
+from .vector_index import VectorIndex, ExactIndex, HNSWIndex, IVFPQIndex, create_vector_index
+from .visualization import reduce_dimensions, create_3d_plot, estimate_payload_size, get_fitted_reducer, FittedReducer
 from .session_state import initialize_session_state, reset_embeddings_state
-from .llm import generate_response, construct_rag_prompt, get_openai_client
+from .llm import (
+    generate_response, stream_response, ResponseStream, construct_rag_prompt, count_prompt_tokens,
+    get_openai_client, get_token_encoder
+)
 
 __all__ = [
     'load_model',
+    'embed_chunks',
+    'get_embedding_cache',
     'chunk_text',
+    'clean_markdown_text',
+    'iter_clean_markdown',
+    'Chunks',
+    'split_text',
     'create_chromadb_collection',
+    'build_vector_store',
+    'query_vector_store',
+    'VectorIndex',
+    'ExactIndex',
+    'HNSWIndex',
+    'IVFPQIndex',
+    'create_vector_index',
     'reduce_dimensions',
+    'get_fitted_reducer',
+    'FittedReducer',
     'create_3d_plot',
+    'estimate_payload_size',
     'initialize_session_state',
     'reset_embeddings_state',
     'generate_response',
+    'stream_response',
+    'ResponseStream',
     'construct_rag_prompt',
-    'get_openai_client'
+    'count_prompt_tokens',
+    'get_openai_client',
+    'get_token_encoder'
 ]
 
@@ -0,0 +1,195 @@
+"""Offset-based text chunking with word or token budgets
+
+Chunks are cut in one forward pass over the text. Every chunk holds at most
+`chunk_size` units (words, or tokens of a tokenizer) and ends on the best
+separator of its last unit window, tried in the order of SEPARATORS like
+LangChain's RecursiveCharacterTextSplitter: paragraph, line, sentence, clause,
+word, or a hard cut. Consecutive chunks share up to `overlap` units.
+
+Chunks are not copied out of the text: a Chunks object keeps the text once
+with the start/end offsets of every chunk, and slices a chunk when it is read.
+"""
+
+import re
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Callable, Iterator, Tuple
+
+import numpy as np
+
+# Cut points, best first
+SEPARATORS = ["\n\n", "\n", ". ", ", ", " ", ""]
+
+# Characters of the text whose units are found at a time (tokenizers hold several objects per token)
+_WINDOW = 1 << 20
+_TOKEN_WINDOW = 1 << 16
+
+# str.isspace() of every code point, whitespace all being below U+3001, and False for anything above
+_IS_SPACE = np.array([chr(code).isspace() for code in range(0x3001)] + [False])
+_SPACE = re.compile(r'\s')
+
+
+class Chunks(Sequence):
+    """Chunks of a text, stored as start/end offsets and sliced on access
+
+    Behaves as a read-only list of strings: len(), indexing, iteration.
+    Slicing returns another Chunks over the same text.
+
+    Attributes:
+        text: The whole text the chunks were cut from
+        starts: (n,) int64 array, offset of the first character of every chunk
+        ends: (n,) int64 array, offset after the last character of every chunk
+    """
+
+    def __init__(self, text: str, starts, ends):
+        self.text = text
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Chunks(self.text, self.starts[index], self.ends[index])
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self.text
+        for start, end in zip(self.starts.tolist(), self.ends.tolist()):
+            yield text[start:end]
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """Start and end offsets of a chunk in the text"""
+        return int(self.starts[index]), int(self.ends[index])
+
+    def __repr__(self) -> str:
+        return f"Chunks({len(self)} chunks of a {len(self.text)} character text)"
+
+
+def _word_starts(text: str, start: int, stop: int) -> np.ndarray:
+    """Offsets of the words (runs of non-whitespace) that start in text[start:stop]"""
+    # One character before the window tells whether its first character starts a word
+    before = max(start - 1, 0)
+    codes = np.frombuffer(text[before:stop].encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    # Up to U+0020 only tab to carriage return, the separators U+001C..U+001F and the space are whitespace:
+    # the other control characters and non-ASCII characters are rare, and looked up in the table
+    space = codes <= 32
+    irregular = np.flatnonzero((codes - 9 > 4) & ((codes <= 27) | (codes > 127)))
+    if len(irregular):
+        space[irregular] = _IS_SPACE[np.minimum(codes[irregular], len(_IS_SPACE) - 1)]
+    if start == 0:
+        space = np.concatenate(([True], space))
+        before = -1
+    return np.flatnonzero(space[:-1] & ~space[1:]) + (before + 1)
+
+
+def _token_finder(tokenizer) -> Callable[[str, int, int], np.ndarray]:
+    """Offsets of the tokens that start in text[start:stop], for a Hugging Face tokenizer"""
+    def token_starts(text: str, start: int, stop: int) -> np.ndarray:
+        encoding = tokenizer(text[start:stop], add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return np.array([begin for begin, end in encoding["offset_mapping"] if end > begin], dtype=np.int64) + start
+    return token_starts
+
+
+class _UnitOffsets:
+    """Start offsets of the units of a text, found a window at a time as the chunker moves forward"""
+
+    def __init__(self, text: str, find_units: Callable[[str, int, int], np.ndarray], window: int):
+        self.text = text
+        self.find_units = find_units
+        self.window = window
+        self.offsets = []   # A list rather than an array: it is read one offset at a time
+        self.first = 0      # Index of offsets[0] among all the units of the text
+        self.scanned = 0    # Units are known up to this character
+
+    def load(self, count: int, keep_from: int) -> int:
+        """Find units until there are `count` of them or the text ends, forgetting those before `keep_from`
+
+        Returns:
+            Number of units found so far
+        """
+        while self.first + len(self.offsets) < count and self.scanned < len(self.text):
+            # Windows end on whitespace, so that no word or token is cut in two
+            space = _SPACE.search(self.text, self.scanned + self.window)
+            stop = space.start() if space else len(self.text)
+            self.offsets = self.offsets[keep_from - self.first:] + self.find_units(self.text, self.scanned, stop).tolist()
+            self.first = keep_from
+            self.scanned = stop
+        return self.first + len(self.offsets)
+
+
+def split_text(text: str, chunk_size: int, overlap: int = 0, unit: str = "words", tokenizer=None,
+               separators=SEPARATORS) -> Chunks:
+    """Cut a text into chunks of at most chunk_size words or tokens
+
+    Args:
+        text: Text to split
+        chunk_size: Maximum number of units per chunk
+        overlap: Number of units repeated at the start of the next chunk
+        unit: "words" (runs of non-whitespace) or "tokens" (of `tokenizer`)
+        tokenizer: Hugging Face tokenizer (fast, with offsets) counting the tokens
+        separators: Cut points, best first; "" allows cutting anywhere between units
+
+    Returns:
+        Chunks over the text, stripped of surrounding whitespace
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError(f"Overlap ({overlap}) must be smaller than the chunk size ({chunk_size})")
+    if unit == "words":
+        units = _UnitOffsets(text, _word_starts, _WINDOW)
+    elif unit == "tokens":
+        if tokenizer is None:
+            raise ValueError("A tokenizer is required to count tokens")
+        units = _UnitOffsets(text, _token_finder(tokenizer), _TOKEN_WINDOW)
+    else:
+        raise ValueError(f"Unknown chunk unit: {unit}")
+
+    starts, ends = [], []
+    first = 0
+    # First unit that the previous chunk did not hold (the chunk starts before it by the overlap)
+    new = 0
+    # The offsets are read directly, offsets[i - base] being the start of unit i
+    offsets, base = units.offsets, units.first
+    while True:
+        available = base + len(offsets)
+        if available <= first + chunk_size:
+            available = units.load(first + chunk_size + 1, first)
+            offsets, base = units.offsets, units.first
+        if first >= available:
+            break
+        start = offsets[first - base]
+        if available <= first + chunk_size:
+            cut = len(text)
+        else:
+            # The chunk can go up to the start of its (chunk_size + 1)th unit: cut after the best separator before it
+            limit = offsets[first + chunk_size - base]
+            cut = limit
+            # Separators in the overlap would end the chunk where the previous one ended: only cut after a new unit
+            after = offsets[new - base] + 1
+            for separator in separators:
+                if not separator:
+                    break
+                found = text.rfind(separator, after, limit)
+                if found >= 0:
+                    cut = found + len(separator)
+                    break
+
+        end = cut
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        starts.append(start)
+        ends.append(end)
+        if cut >= len(text):
+            break
+        # The cut is at most the start of unit first + chunk_size
+        following = new = base + bisect_left(offsets, cut, first - base, first + chunk_size - base)
+        # A chunk shorter than the overlap is not repeated
+        first = following - overlap if following - overlap > first else following
+        # Start on a word, not inside one (a token can be the end of a word)
+        while first < following and not text[offsets[first - base] - 1].isspace():
+            first += 1
+
+    return Chunks(text, starts, ends)
@@ -0,0 +1,214 @@
+"""Persistent content-addressed embedding cache
+
+Embeddings are keyed by (model name, hash of the whitespace-normalized chunk)
+and stored in a memory-mapped float32 matrix on disk, one store per model.
+When a store grows past its byte budget the least recently used vectors are
+evicted and their slots reused.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def normalize_chunk(chunk: str) -> str:
+    """Collapse whitespace so cosmetic edits do not invalidate the cache"""
+    return " ".join(chunk.split())
+
+
+def chunk_key(model_name: str, chunk: str) -> str:
+    """Content hash used as the cache key for a chunk under a given model"""
+    payload = f"{model_name}\0{normalize_chunk(chunk)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class _ModelStore:
+    """Vectors of a single model: a float32 memmap plus a JSON slot index"""
+
+    INITIAL_CAPACITY = 256
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.vectors_path = directory / "vectors.f32"
+        self.index_path = directory / "index.json"
+
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self.clock = 0
+        self.entries: Dict[str, List[int]] = {}  # key -> [slot, last_used]
+        self.free_slots: List[int] = []
+        self.vectors: Optional[np.memmap] = None
+        self.dirty = False
+
+        self._load()
+
+    def _load(self):
+        if not self.index_path.exists() or not self.vectors_path.exists():
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.dim = index["dim"]
+            self.capacity = index["capacity"]
+            self.clock = index["clock"]
+            self.entries = index["entries"]
+            expected = self.capacity * self.dim * 4
+            if os.path.getsize(self.vectors_path) < expected:
+                raise ValueError("Vector file is smaller than the index expects")
+        except (OSError, ValueError, KeyError, TypeError):
+            # A corrupt store is just a cold cache
+            self.dim, self.capacity, self.clock, self.entries = None, 0, 0, {}
+            return
+
+        self.vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim)
+        )
+        used = {slot for slot, _ in self.entries.values()}
+        self.free_slots = [slot for slot in range(self.capacity) if slot not in used]
+
+    @property
+    def max_rows(self) -> int:
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    def _grow(self, needed: int):
+        """Extend the memmap so at least `needed` more slots are free"""
+        new_capacity = max(self.capacity * 2, self.INITIAL_CAPACITY, self.capacity + needed)
+        new_capacity = min(new_capacity, self.max_rows)
+        if new_capacity <= self.capacity:
+            return
+
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+
+        self.vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim)
+        )
+        self.free_slots.extend(range(self.capacity, new_capacity))
+        self.capacity = new_capacity
+
+    def _evict(self, needed: int):
+        """Free `needed` slots by dropping the least recently used entries"""
+        victims = sorted(self.entries.items(), key=lambda item: item[1][1])[:needed]
+        for key, (slot, _) in victims:
+            del self.entries[key]
+            self.free_slots.append(slot)
+
+    def get(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        if self.vectors is None:
+            return found
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            self.clock += 1
+            entry[1] = self.clock
+            found[key] = np.array(self.vectors[entry[0]])
+            self.dirty = True
+        return found
+
+    def put(self, keys: Sequence[str], embeddings: np.ndarray):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {embeddings.shape[1]}")
+
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self.entries]
+        # Never try to hold more than the store can fit in one batch
+        new_keys = new_keys[-self.max_rows:]
+        rows = {key: i for i, key in enumerate(keys)}
+
+        if len(self.free_slots) < len(new_keys):
+            self._grow(len(new_keys) - len(self.free_slots))
+        if len(self.free_slots) < len(new_keys):
+            self._evict(len(new_keys) - len(self.free_slots))
+
+        for key in new_keys:
+            slot = self.free_slots.pop()
+            self.vectors[slot] = embeddings[rows[key]]
+            self.clock += 1
+            self.entries[key] = [slot, self.clock]
+        self.dirty = True
+
+    def flush(self):
+        if not self.dirty or self.dim is None:
+            return
+        if self.vectors is not None:
+            self.vectors.flush()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"dim": self.dim, "capacity": self.capacity, "clock": self.clock, "entries": self.entries},
+                f,
+            )
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+
+class EmbeddingCache:
+    """On-disk embedding cache shared by every session of the app"""
+
+    def __init__(self, cache_dir, max_bytes_per_model: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes_per_model = max_bytes_per_model
+        self._stores: Dict[str, _ModelStore] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, model_name: str) -> _ModelStore:
+        if model_name not in self._stores:
+            folder = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+            self._stores[model_name] = _ModelStore(self.cache_dir / folder, self.max_bytes_per_model)
+        return self._stores[model_name]
+
+    def encode(self, model, model_name: str, chunks: List[str]) -> Dict[str, object]:
+        """Embed chunks, only running the model on chunks not already cached
+
+        Args:
+            model: Loaded sentence transformer model
+            model_name: Name of the model, part of the cache key
+            chunks: Text chunks to embed
+
+        Returns:
+            Dictionary with the float32 embeddings matrix (in chunk order) and
+            the number of cache hits and misses for this call
+        """
+        keys = [chunk_key(model_name, chunk) for chunk in chunks]
+
+        with self._lock:
+            store = self._store(model_name)
+            cached = store.get(keys)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in cached))
+        if missing:
+            first_chunk = {}
+            for key, chunk in zip(keys, chunks):
+                first_chunk.setdefault(key, chunk)
+            encoded = model.encode([first_chunk[key] for key in missing], show_progress_bar=False)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            cached.update(zip(missing, encoded))
+
+        with self._lock:
+            if missing:
+                store.put(missing, encoded)
+            store.flush()
+            missing_keys = set(missing)
+            hits = sum(1 for key in keys if key not in missing_keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        embeddings = np.stack([cached[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+        return {"embeddings": embeddings, "hits": hits, "misses": len(keys) - hits}
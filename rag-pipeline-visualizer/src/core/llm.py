@@ -1,19 +1,27 @@
 """LLM integration for RAG generation"""
 
 import os
+import time
 import streamlit as st
+import tiktoken
 from openai import OpenAI
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
 from dotenv import load_dotenv
 
+from src.config import PROMPT_TOKEN_BUDGET, MAX_COMPLETION_TOKENS
+
 # Load environment variables (for local development)
 load_dotenv()
 
 
+@st.cache_resource
 def get_openai_client():
-    """Get OpenAI client instance
+    """Get the shared OpenAI client instance
     
-    Supports both local .env files and Streamlit Cloud secrets
+    Supports both local .env files and Streamlit Cloud secrets. The client is
+    created once per process: its connection pool keeps the connection to the
+    API open from one generation to the next. OPENAI_BASE_URL points it to
+    another OpenAI-compatible server.
     """
     # Try Streamlit secrets first (for cloud deployment)
     try:
@@ -27,83 +35,250 @@ def get_openai_client():
     return OpenAI(api_key=api_key)
 
 
-def construct_rag_prompt(query: str, retrieved_chunks: List[str], system_prompt: str = None) -> Dict[str, any]:
-    """Construct augmented prompt with retrieved context
+@st.cache_resource
+def get_token_encoder(model: str) -> tiktoken.Encoding:
+    """Get the tiktoken encoder of a model, loaded once per model
+    
+    Models unknown to tiktoken use o200k_base, the encoding of the GPT-4o family.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_prompt_tokens(system_prompt: str, user_message: str, model: str = "gpt-4o-mini") -> int:
+    """Number of prompt tokens of a system and a user message, as counted by the API"""
+    encoder = get_token_encoder(model)
+    # Every message is wrapped in 3 tokens, and 3 more start the answer
+    return 3 + sum(3 + len(encoder.encode(text, disallowed_special=())) for text in (system_prompt, user_message))
+
+
+def _format_user_message(query: str, passages: List[str]):
+    # Returns the context and the whole user message
+    context_text = "\n\n".join([
+        f"[Context {i+1}]:\n{passage}" 
+        for i, passage in enumerate(passages)
+    ])
+    user_message = f"""Context Information:
+{'='*80}
+{context_text}
+{'='*80}
+
+User Question: {query}
+
+Please answer the question based on the context provided above."""
+    return context_text, user_message
+
+
+def _passages(chunks: List[str], spans: Optional[List[Tuple[int, int]]], chosen: List[int]) -> List[str]:
+    """Texts of the chosen chunks, in the order they were chosen
+    
+    Chunks overlapping in the source text are merged into one passage, so
+    their overlap is sent once; without spans, only repeated chunks are.
+    """
+    if spans is None:
+        return list(dict.fromkeys(chunks[i] for i in chosen))
+    
+    # Merge the chunks by start offset: (start, end, text, rank of the first chosen member)
+    merged = []
+    for rank, i in sorted(enumerate(chosen), key=lambda item: spans[item[1]]):
+        start, end = spans[i]
+        if merged and start < merged[-1][1]:
+            previous_start, previous_end, text, first_rank = merged[-1]
+            if end > previous_end:
+                text += chunks[i][previous_end - start:]
+            merged[-1] = (previous_start, max(end, previous_end), text, min(rank, first_rank))
+        else:
+            merged.append((start, end, chunks[i], rank))
+    return [text for _, _, text, _ in sorted(merged, key=lambda passage: passage[3])]
+
+
+def construct_rag_prompt(query: str, retrieved_chunks: List[str], system_prompt: str = None,
+                         similarities: Optional[List[float]] = None, spans: Optional[List[Tuple[int, int]]] = None,
+                         token_budget: Optional[int] = PROMPT_TOKEN_BUDGET, model: str = "gpt-4o-mini") -> Dict[str, any]:
+    """Construct augmented prompt with retrieved context, packed within a token budget
+    
+    The chunks are added most similar first, as long as the whole prompt stays
+    within token_budget; a chunk that does not fit is left out and the next
+    ones are still tried. Chunks overlapping in the text are merged.
     
     Args:
         query: User query
         retrieved_chunks: List of retrieved text chunks
         system_prompt: Optional custom system prompt
+        similarities: Similarity of every chunk to the query (retrieval order by default)
+        spans: (start, end) offsets of every chunk in the text, to merge overlapping chunks
+        token_budget: Maximum prompt tokens, None for no limit
+        model: OpenAI model whose tokenizer counts the tokens
         
     Returns:
-        Dictionary with system_prompt, context, user_query, and full_prompt
+        Dictionary with system_prompt, context, user_query, full_user_message,
+        num_chunks and the token counts of the packing
     """
     if system_prompt is None:
         system_prompt = """You are a helpful AI assistant. Use the provided context to answer the user's question accurately and comprehensively. 
 If the context doesn't contain relevant information, acknowledge this and provide the best answer you can based on your knowledge.
 Always cite which parts of the context you used in your answer."""
     
-    # Format retrieved context
-    context_text = "\n\n".join([
-        f"[Context {i+1}]:\n{chunk}" 
-        for i, chunk in enumerate(retrieved_chunks)
-    ])
+    order = range(len(retrieved_chunks))
+    if similarities is not None:
+        order = sorted(order, key=lambda i: -similarities[i])
     
-    # Construct full prompt
-    user_message = f"""Context Information:
-{'='*80}
-{context_text}
-{'='*80}
-
-User Question: {query}
-
-Please answer the question based on the context provided above."""
+    # Greedy packing: the passages, message and tokens of the chunks chosen so far
+    chosen, dropped = [], 0
+    passages = []
+    context_text, user_message = _format_user_message(query, passages)
+    prompt_tokens = count_prompt_tokens(system_prompt, user_message, model)
+    for i in order:
+        candidate = _passages(retrieved_chunks, spans, chosen + [i])
+        if candidate == passages:
+            # Already sent in full by the other chunks
+            chosen.append(i)
+            continue
+        candidate_context, candidate_message = _format_user_message(query, candidate)
+        tokens = count_prompt_tokens(system_prompt, candidate_message, model)
+        if token_budget is not None and tokens > token_budget:
+            dropped += 1
+            continue
+        chosen.append(i)
+        passages, context_text, user_message, prompt_tokens = candidate, candidate_context, candidate_message, tokens
+    
+    # Every chunk verbatim, as without packing
+    unpacked_tokens = count_prompt_tokens(system_prompt, _format_user_message(query, retrieved_chunks)[1], model)
     
     return {
         "system_prompt": system_prompt,
         "context": context_text,
         "user_query": query,
         "full_user_message": user_message,
-        "num_chunks": len(retrieved_chunks)
+        "num_chunks": len(chosen),
+        "num_passages": len(passages),
+        "dropped_chunks": dropped,
+        "token_budget": token_budget,
+        "prompt_tokens": prompt_tokens,
+        "unpacked_prompt_tokens": unpacked_tokens,
+        "tokens_saved": unpacked_tokens - prompt_tokens
     }
 
 
-def generate_response(query: str, retrieved_chunks: List[str], system_prompt: str = None, model: str = "gpt-4o-mini") -> Dict[str, any]:
-    """Generate response using OpenAI with retrieved context
+class ResponseStream:
+    """Streamed answer of the LLM: iterating it yields the text as it is generated
+
+    Can be passed to st.write_stream. Once it has been consumed, `result` holds
+    the same dictionary as generate_response.
+    """
+
+    def __init__(self, client: OpenAI, prompt_data: Dict[str, any], model: str = "gpt-4o-mini",
+                 temperature: float = 0.7, max_tokens: int = MAX_COMPLETION_TOKENS):
+        self.client = client
+        self.prompt_data = prompt_data
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.result = None
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.prompt_data["system_prompt"]},
+                {"role": "user", "content": self.prompt_data["full_user_message"]}
+            ],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        parts = []
+        first_token = None
+        usage = None
+        for chunk in stream:
+            # The usage comes in a last chunk without choices
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            parts.append(chunk.choices[0].delta.content)
+            yield parts[-1]
+        latency = time.perf_counter() - start
+
+        if usage is not None:
+            usage = {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens
+            }
+        else:
+            # Servers that do not report the usage of a stream send about one token per chunk
+            usage = {"prompt_tokens": 0, "completion_tokens": len(parts), "total_tokens": len(parts)}
+        if first_token is None:
+            first_token = latency
+        # Tokens per second while generating, after the first one
+        generating = latency - first_token
+        self.result = {
+            "prompt_data": self.prompt_data,
+            "response": "".join(parts),
+            "model": self.model,
+            "usage": usage,
+            "timing": {
+                "time_to_first_token": first_token,
+                "total_latency": latency,
+                "tokens_per_second": (usage["completion_tokens"] - 1) / generating if generating > 0 else 0.0
+            }
+        }
+
+
+def stream_response(query: str, retrieved_chunks: List[str], system_prompt: str = None, model: str = "gpt-4o-mini",
+                    client: OpenAI = None, similarities: Optional[List[float]] = None,
+                    spans: Optional[List[Tuple[int, int]]] = None, token_budget: Optional[int] = PROMPT_TOKEN_BUDGET,
+                    max_tokens: int = MAX_COMPLETION_TOKENS) -> ResponseStream:
+    """Stream the response of OpenAI with retrieved context
     
     Args:
         query: User query
         retrieved_chunks: List of retrieved text chunks
         system_prompt: Optional custom system prompt
         model: OpenAI model to use
+        client: OpenAI client, the shared one by default
+        similarities: Similarity of every chunk to the query, see construct_rag_prompt
+        spans: Offsets of every chunk in the text, see construct_rag_prompt
+        token_budget: Maximum prompt tokens, None for no limit
+        max_tokens: Maximum tokens of the response
         
     Returns:
-        Dictionary with prompt_data and response
+        ResponseStream yielding the text of the response, then holding the result of generate_response
     """
-    client = get_openai_client()
-    
-    # Construct augmented prompt
-    prompt_data = construct_rag_prompt(query, retrieved_chunks, system_prompt)
-    
-    # Call OpenAI API
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": prompt_data["system_prompt"]},
-            {"role": "user", "content": prompt_data["full_user_message"]}
-        ],
-        temperature=0.7,
-        max_tokens=1000
-    )
-    
-    return {
-        "prompt_data": prompt_data,
-        "response": response.choices[0].message.content,
-        "model": model,
-        "usage": {
-            "prompt_tokens": response.usage.prompt_tokens,
-            "completion_tokens": response.usage.completion_tokens,
-            "total_tokens": response.usage.total_tokens
-        }
-    }
+    prompt_data = construct_rag_prompt(query, retrieved_chunks, system_prompt, similarities, spans, token_budget, model)
+    return ResponseStream(client or get_openai_client(), prompt_data, model, max_tokens=max_tokens)
+
 
+def generate_response(query: str, retrieved_chunks: List[str], system_prompt: str = None, model: str = "gpt-4o-mini",
+                      client: OpenAI = None, similarities: Optional[List[float]] = None,
+                      spans: Optional[List[Tuple[int, int]]] = None, token_budget: Optional[int] = PROMPT_TOKEN_BUDGET,
+                      max_tokens: int = MAX_COMPLETION_TOKENS) -> Dict[str, any]:
+    """Generate response using OpenAI with retrieved context
+    
+    Args:
+        query: User query
+        retrieved_chunks: List of retrieved text chunks
+        system_prompt: Optional custom system prompt
+        model: OpenAI model to use
+        client: OpenAI client, the shared one by default
+        similarities: Similarity of every chunk to the query, see construct_rag_prompt
+        spans: Offsets of every chunk in the text, see construct_rag_prompt
+        token_budget: Maximum prompt tokens, None for no limit
+        max_tokens: Maximum tokens of the response
+        
+    Returns:
+        Dictionary with prompt_data, response, usage and timing
+    """
+    stream = stream_response(query, retrieved_chunks, system_prompt, model, client, similarities, spans,
+                             token_budget, max_tokens)
+    for _ in stream:
+        pass
+    return stream.result
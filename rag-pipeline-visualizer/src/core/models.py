@@ -1,7 +1,10 @@
 """Model loading and embedding generation"""
 
 import streamlit as st
+from typing import Dict, List
 from sentence_transformers import SentenceTransformer
+from src.config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB
+from .embedding_cache import EmbeddingCache
 
 
 @st.cache_resource
@@ -9,3 +12,21 @@ def load_model(model_name: str):
     """Load the sentence transformer model"""
     return SentenceTransformer(model_name)
 
+
+@st.cache_resource
+def get_embedding_cache():
+    """Get the process-wide on-disk embedding cache"""
+    return EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+
+
+def embed_chunks(model_name: str, chunks: List[str]) -> Dict[str, object]:
+    """Embed text chunks, reusing cached vectors for unchanged chunks
+    
+    Args:
+        model_name: Name of the sentence transformer model
+        chunks: Text chunks to embed
+        
+    Returns:
+        Dictionary with the embeddings array and the cache hits/misses of this call
+    """
+    return get_embedding_cache().encode(load_model(model_name), model_name, chunks)
@@ -22,6 +22,8 @@ def initialize_session_state():
         st.session_state.last_query = ""
     if 'current_model' not in st.session_state:
         st.session_state.current_model = None
+    if 'embedding_cache_stats' not in st.session_state:
+        st.session_state.embedding_cache_stats = None
     
     # Augmentation section
     if 'augmented_prompt' not in st.session_state:
@@ -44,6 +46,7 @@ def reset_embeddings_state():
     st.session_state.collection = None
     st.session_state.chunks = []
     st.session_state.embeddings = []
+    st.session_state.embedding_cache_stats = None
     st.session_state.query_results = None
     st.session_state.query_embedding = None
     st.session_state.last_query = ""
@@ -1,91 +1,280 @@
 """Text processing utilities"""
 
 import re
-from typing import List
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .chunking import Chunks, split_text
+
+
+# Blocks of whole lines cleaned at a time by iter_clean_markdown
+_BLOCK_SIZE = 1 << 16
+
+
+def _line_start_patterns(body: str, flags: int = 0) -> Tuple[re.Pattern, re.Pattern]:
+    """Compile the multiline pattern ^body as a match at the start of the text and a search for a newline followed by body
+
+    The literal newline lets the regex engine jump from line to line instead of
+    trying every position. A match that ends at a line start is chained with the
+    matches that start there, which re.sub would otherwise miss after consuming
+    their newline.
+
+    Args:
+        body: Pattern matched at the start of a line
+        flags: Extra regex flags
+
+    Returns:
+        Compiled patterns, to be used with _remove_line_starts
+    """
+    chained = r'(?:%s)(?:(?<=\n)(?:%s))*' % (body, body)
+    return re.compile(chained, flags), re.compile(r'\n' + chained, flags)
+
+
+def _remove_line_starts(patterns: Tuple[re.Pattern, re.Pattern], text: str) -> str:
+    """Remove the matches of _line_start_patterns, like re.sub('^body', '', text, flags=re.MULTILINE)"""
+    at_start, after_newline = patterns
+    match = at_start.match(text)
+    if match:
+        text = text[match.end():]
+    return after_newline.sub('\n', text)
+
+
+# Line start removals of clean_markdown_text: headers, horizontal rules, bullets and numbered lists
+_HEADER = _line_start_patterns(r'#+\s+')
+_HORIZONTAL_RULE = _line_start_patterns(r'[\-=\*]{3,}\s*$', re.MULTILINE)
+_BULLET = _line_start_patterns(r'[\s]*[\-\*•]\s+')
+_NUMBERED = _line_start_patterns(r'[\s]*\d+\.\s+')
+
+# The same removals on the last non blank line of a block, with all the whitespace after it:
+# the match could go on in the next block
+_HEADER_AT_END = re.compile(r'#+\s+\Z')
+_HORIZONTAL_RULE_AT_END = re.compile(r'[\-=\*]{3,}\s*\Z')
+_BULLET_AT_END = re.compile(r'\s*[\-\*•]\s+\Z')
+_NUMBERED_AT_END = re.compile(r'\s*\d+\.\s+\Z')
+
+
+def _ends_open(rest: str, opening: str, closing: str) -> bool:
+    """Whether the last opening delimiter of a text has no closing delimiter after it"""
+    return rest.rfind(opening) > rest.rfind(closing)
+
+
+def _ends_in_double(rest: str, marker: str) -> bool:
+    """Whether the last marker of a text is the second of a pair, so **text or __text is left open"""
+    last = rest.rfind(marker)
+    return last > 0 and rest[last - 1] == marker
+
+
+# Inline removals of clean_markdown_text, in order: the first character of a match, the pattern,
+# with the kept text captured so that ''.join(pattern.split(text)) is the cleaned text, and whether
+# the text after the last match could start a match that ends in the next block
+_INLINE = [
+    ('*', re.compile(r'\*\*([^\*]+)\*\*'), lambda rest: _ends_in_double(rest, '*')),
+    ('_', re.compile(r'__([^_]+)__'), lambda rest: _ends_in_double(rest, '_')),
+    ('*', re.compile(r'\*([^\*]+)\*'), lambda rest: '*' in rest),
+    ('_', re.compile(r'_([^_]+)_'), lambda rest: '_' in rest),
+    ('`', re.compile(r'`([^`]+)`'), lambda rest: '`' in rest),
+    ('[', re.compile(r'\[([^\]]+)\]\([^\)]+\)'),
+     lambda rest: _ends_open(rest, '[', ']') or _ends_open(rest, '](', ')')),
+    ('![', re.compile(r'!\[[^\]]*\]\([^\)]+\)'),
+     lambda rest: _ends_open(rest, '![', ']') or _ends_open(rest, '](', ')')),
+    ('<', re.compile(r'<[^>]+>'), lambda rest: _ends_open(rest, '<', '>')),
+]
+
+_BLANK_LINES = re.compile(r'\n\n\n+')
+
+
+def _last_line(text: str) -> str:
+    """The last non blank line of a text and the whitespace after it"""
+    return text[text.rfind('\n', 0, len(text.rstrip())) + 1:]
+
+
+def _clean_block(text: str, last: bool) -> Optional[str]:
+    """Remove the markdown of a block of whole lines, as clean_markdown_text does before its whitespace cleanup
+
+    Args:
+        text: Lines of the document, ending with a newline unless they are the last ones
+        last: Whether the block ends the document
+
+    Returns:
+        The cleaned block, or None if a removal could match differently once the
+        following lines are appended (an unclosed ** or a list marker on the last
+        line, blank lines before a bullet...): the block must then be extended
+    """
+    if '#' in text:
+        if not last and _HEADER_AT_END.match(_last_line(text)):
+            return None
+        text = _remove_line_starts(_HEADER, text)
+
+    if not last and _HORIZONTAL_RULE_AT_END.match(_last_line(text)):
+        return None
+    text = _remove_line_starts(_HORIZONTAL_RULE, text)
+
+    for first, pattern, ends_open in _INLINE:
+        if first in text:
+            parts = pattern.split(text)
+            if not last and ends_open(parts[-1]):
+                return None
+            text = ''.join(parts)
+
+    for pattern, at_end in ((_BULLET, _BULLET_AT_END), (_NUMBERED, _NUMBERED_AT_END)):
+        if not last:
+            # Leading whitespace of a list item can start on any blank line above it
+            content_end = len(text.rstrip())
+            if (content_end == 0 and text) or text.count('\n', content_end) > 1 or at_end.match(_last_line(text)):
+                return None
+        text = _remove_line_starts(pattern, text)
+
+    return text
+
+
+def _find_cut(text: str, start: int, stop: int) -> int:
+    """Position after the last newline of text[start:stop], preferably one ending a non blank line
+
+    Falls back to the first newline after stop for a long line, and returns -1 if there is none.
+    """
+    cut = text.rfind('\n', start, stop)
+    while cut > start and text[cut - 1].isspace():
+        cut = text.rfind('\n', start, cut)
+    if cut <= start:
+        cut = text.rfind('\n', start, stop)
+        if cut < 0:
+            cut = text.find('\n', stop)
+    return cut + 1 if cut >= 0 else -1
+
+
+def _join(pieces: List[str]) -> str:
+    """Join pieces of text, emptying the list so that only the joined copy stays in memory"""
+    text = ''.join(pieces)
+    pieces.clear()
+    return text
+
+
+def _clean_blocks(chunks: Iterable[str], block_size: int) -> Iterator[str]:
+    """Cut the text of chunks into blocks of whole lines and yield them cleaned by _clean_block"""
+    pending, start = '', 0
+    # Text read since pending, small pieces joined into strings of about block_size
+    read, pieces, size, pieces_size = [], [], 0, 0
+    target = block_size
+    for piece in chunks:
+        pieces.append(piece)
+        pieces_size += len(piece)
+        if pieces_size < block_size:
+            continue
+        read.append(''.join(pieces))
+        size += pieces_size
+        pieces, pieces_size = [], 0
+        if len(pending) - start + size < target:
+            continue
+
+        pending = ''.join([text for text in (pending[start:], *read) if text])
+        start, read, size = 0, [], 0
+        while len(pending) - start >= target:
+            cut = _find_cut(pending, start, start + target)
+            if cut < 0:
+                target *= 2
+                break
+            cleaned = _clean_block(pending[start:cut], last=False)
+            if cleaned is None:
+                target *= 2
+                continue
+            yield cleaned
+            start = cut
+            target = block_size
+
+    rest = [text for text in (pending[start:], *read, *pieces) if text]
+    del pending, read, pieces
+    yield _clean_block(_join(rest), last=True)
+
+
+def _squeeze_whitespace(blocks: Iterable[str], block_size: int) -> Iterator[str]:
+    """Collapse blank lines and spaces, strip every line and the whole text, block by block"""
+    pending, newlines, started = '', '', False
+    # A block that had to grow is squeezed a slice at a time, like the others
+    pieces = (block[i:i + block_size] for block in blocks for i in range(0, len(block), block_size))
+    for piece in chain(pieces, [None]):
+        if piece is not None:
+            pending += piece
+            # Keep the last run of newlines, which the next piece can lengthen, with the line after it
+            cut = pending.rfind('\n')
+            while cut > 0 and pending[cut - 1] == '\n':
+                cut -= 1
+            if cut <= 0:
+                continue
+            text, pending = pending[:cut], pending[cut:]
+        else:
+            text = pending
+
+        text = _BLANK_LINES.sub('\n\n', text)
+        text = '\n'.join(line.strip() for line in text.split('\n'))
+        while '  ' in text:
+            text = text.replace('  ', ' ')
+
+        # Lines are stripped, so the text only starts and ends with newlines: drop the leading ones and
+        # hold the trailing ones back until more text follows them
+        if not started:
+            text = text.lstrip('\n')
+            started = bool(text)
+        content = text.rstrip('\n')
+        if content:
+            yield newlines + content
+            newlines = text[len(content):]
+        else:
+            newlines += text
+
+
+def iter_clean_markdown(chunks: Iterable[str], block_size: int = _BLOCK_SIZE) -> Iterator[str]:
+    """Clean markdown formatting and symbols from a stream of text
+
+    The text is cleaned in blocks of whole lines, so a file or any iterator of
+    strings is cleaned without holding the whole document in memory, with the
+    same result as clean_markdown_text on the joined text. A block only grows
+    past block_size while a markdown construct is still open at its end, such
+    as an unclosed `*`.
+
+    Args:
+        chunks: Pieces of the text, such as the lines of a file opened in text mode
+        block_size: Approximate number of characters cleaned at a time
+
+    Yields:
+        Successive pieces of the cleaned text
+    """
+    for cleaned in _squeeze_whitespace(_clean_blocks(chunks, block_size), block_size):
+        if cleaned:
+            yield cleaned
 
 
 def clean_markdown_text(text: str) -> str:
     """Clean markdown formatting and symbols from text
-    
+
+    Removes headers, horizontal rules, bold/italic markers, inline code markers,
+    links and images, HTML tags and list markers, then collapses blank lines
+    and spaces and strips every line.
+
     Args:
         text: Raw text potentially containing markdown
-        
+
     Returns:
         Cleaned text with markdown removed
     """
-    # Remove markdown headers (# ## ### etc.)
-    text = re.sub(r'^#+\s+', '', text, flags=re.MULTILINE)
-    
-    # Remove horizontal rules (--- === ***)
-    text = re.sub(r'^[\-=\*]{3,}\s*$', '', text, flags=re.MULTILINE)
-    
-    # Remove bold/italic markers (**text** or *text* or __text__ or _text_)
-    text = re.sub(r'\*\*([^\*]+)\*\*', r'\1', text)
-    text = re.sub(r'__([^_]+)__', r'\1', text)
-    text = re.sub(r'\*([^\*]+)\*', r'\1', text)
-    text = re.sub(r'_([^_]+)_', r'\1', text)
-    
-    # Remove inline code markers (`code`)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
-    
-    # Remove links [text](url) -> text
-    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
-    
-    # Remove image references ![alt](url)
-    text = re.sub(r'!\[[^\]]*\]\([^\)]+\)', '', text)
-    
-    # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
-    
-    # Remove bullet points and list markers (-, *, •, 1., 2., etc.)
-    text = re.sub(r'^[\s]*[\-\*•]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^[\s]*\d+\.\s+', '', text, flags=re.MULTILINE)
-    
-    # Remove multiple consecutive blank lines (keep max 2 for paragraph separation)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    # Remove leading/trailing whitespace from each line
-    text = '\n'.join(line.strip() for line in text.split('\n'))
-    
-    # Remove multiple spaces
-    text = re.sub(r' {2,}', ' ', text)
-    
-    return text.strip()
-
-
-def chunk_text(text: str, chunk_size: int = 100, overlap: int = 20, clean_markdown: bool = True) -> List[str]:
-    """Split text into overlapping chunks using RecursiveCharacterTextSplitter
-    
+    return ''.join(iter_clean_markdown((text,)))
+
+
+def chunk_text(text: str, chunk_size: int = 100, overlap: int = 20, clean_markdown: bool = True,
+               unit: str = "words", tokenizer=None) -> Chunks:
+    """Split text into overlapping chunks of at most chunk_size words or tokens
+
     Args:
         text: Input text to chunk
-        chunk_size: Number of words per chunk (converted to approximate characters)
-        overlap: Number of overlapping words between chunks (converted to approximate characters)
+        chunk_size: Number of words (or tokens) per chunk
+        overlap: Number of overlapping words (or tokens) between chunks
         clean_markdown: Whether to clean markdown formatting before chunking (default: True)
-        
+        unit: "words", or "tokens" of `tokenizer`
+        tokenizer: Tokenizer of the embedding model, to count tokens
+
     Returns:
-        List of text chunks
+        Chunks: a list-like of chunk strings, kept as offsets into the (cleaned) text
     """
     # Clean markdown if requested
     if clean_markdown:
         text = clean_markdown_text(text)
-    
-    # Convert word-based sizes to character-based (avg ~5 chars per word + space)
-    char_chunk_size = chunk_size * 6
-    char_overlap = overlap * 6
-    
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=char_chunk_size,
-        chunk_overlap=char_overlap,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", ", ", " ", ""],
-        is_separator_regex=False,
-    )
-    
-    chunks = splitter.split_text(text)
-    
-    # Final cleanup: remove any empty or whitespace-only chunks
-    chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
-    
-    return chunks
 
+    return split_text(text, chunk_size, overlap, unit, tokenizer)
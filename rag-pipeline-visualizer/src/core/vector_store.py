@@ -1,32 +1,106 @@
-"""ChromaDB vector store operations"""
+"""Vector store operations: ChromaDB collections and in-process vector indexes"""
 
 import chromadb
-import tempfile
+import numpy as np
+import streamlit as st
+from typing import Dict, Sequence
+from .chunking import Chunks
+from .vector_index import VectorIndex, create_vector_index
+
+
+@st.cache_resource
+def get_chromadb_client():
+    """Get the process-wide in-memory ChromaDB client"""
+    # Use the new EphemeralClient for in-memory storage
+    # or PersistentClient for disk storage
+    return chromadb.EphemeralClient()
 
 
 def create_chromadb_collection(collection_name: str = "rag_embeddings"):
     """Create or get ChromaDB collection
-    
+
     Args:
         collection_name: Name of the collection to create
-        
+
     Returns:
         ChromaDB collection instance
     """
-    # Use the new EphemeralClient for in-memory storage
-    # or PersistentClient for disk storage
-    client = chromadb.EphemeralClient()
-    
+    client = get_chromadb_client()
+
     # Delete existing collection if it exists
     try:
         client.delete_collection(collection_name)
-    except:
+    except Exception:
         pass
-    
+
     collection = client.create_collection(
         name=collection_name,
         metadata={"hnsw:space": "cosine"}
     )
-    
+
     return collection
 
+
+def build_vector_store(backend: str, embeddings: np.ndarray, chunks: Sequence[str],
+                       collection_name: str = "rag_embeddings"):
+    """Store chunk embeddings in a ChromaDB collection or a vector index
+
+    Args:
+        backend: "chroma" or a vector index backend ("exact", "hnsw", "ivfpq")
+        embeddings: (n, dim) array of chunk embeddings
+        chunks: Text chunks, in the order of the embeddings (only their count is
+            stored, query_vector_store reads the texts from the chunks)
+        collection_name: Name of the ChromaDB collection
+
+    Returns:
+        ChromaDB collection or VectorIndex holding the embeddings
+    """
+    if backend == "chroma":
+        collection = create_chromadb_collection(collection_name)
+        collection.add(
+            embeddings=embeddings.tolist(),
+            ids=[f"chunk_{i}" for i in range(len(chunks))]
+        )
+        return collection
+
+    index = create_vector_index(backend, embeddings.shape[1])
+    index.add(embeddings)
+    return index
+
+
+def query_vector_store(store, chunks: Sequence[str], query_embedding: np.ndarray, n_results: int) -> Dict[str, list]:
+    """Find the chunks most similar to a query
+
+    Args:
+        store: ChromaDB collection or VectorIndex built by build_vector_store
+        chunks: Text chunks the store was built from
+        query_embedding: Embedding of the query
+        n_results: Number of chunks to return
+
+    Returns:
+        Results in the ChromaDB query format: lists of ids, documents and
+        cosine distances, with one inner list for the query, and the
+        (start, end) spans of the documents when chunks is a Chunks
+    """
+    if not isinstance(store, VectorIndex):
+        results = store.query(
+            query_embeddings=[np.asarray(query_embedding).tolist()],
+            n_results=n_results,
+            include=["distances"]
+        )
+        found = [(int(chunk_id.split("_")[1]), distance)
+                 for chunk_id, distance in zip(results["ids"][0], results["distances"][0])]
+    else:
+        ids, similarities = store.search(np.asarray(query_embedding)[None], n_results)
+        found = [(int(i), 1 - float(s)) for i, s in zip(ids[0], similarities[0]) if i >= 0]
+
+    # Only the retrieved chunks are sliced out of the text
+    results = {
+        "ids": [[f"chunk_{i}" for i, _ in found]],
+        "documents": [[chunks[i] for i, _ in found]],
+        "distances": [[distance for _, distance in found]]
+    }
+    if isinstance(chunks, Chunks):
+        # Where the chunks are in the text, to merge overlapping ones in the prompt
+        results["spans"] = [[chunks.span(i) for i, _ in found]]
+    return results
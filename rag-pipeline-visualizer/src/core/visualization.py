@@ -1,11 +1,112 @@
 """Visualization and dimensionality reduction utilities"""
 
+import hashlib
 import numpy as np
+import streamlit as st
+import plotly
 import plotly.graph_objects as go
 from sklearn.decomposition import PCA
 import umap
 from typing import List, Optional
 
+from src.config import PLOT_MAX_POINTS
+
+# Plotly 6 sends numeric arrays base64-encoded, earlier versions as JSON numbers of about this many characters
+_BASE64_ARRAYS = int(plotly.__version__.split(".")[0]) >= 6
+_JSON_NUMBER_BYTES = 20
+
+
+class FittedReducer:
+    """Dimensionality reducer fitted once on the chunk embeddings
+    
+    The layout of the chunks is computed at fit time and new points (e.g. the
+    query embedding) are placed with `transform()` so the chunks never move.
+    """
+    
+    def __init__(self, method: str = "pca", n_components: int = 3):
+        if method not in ("pca", "umap"):
+            raise ValueError("Method must be 'pca' or 'umap'")
+        self.method = method
+        self.n_components = n_components
+        self.reducer = None
+        self.embedding_ = None
+    
+    def fit(self, embeddings: np.ndarray):
+        """Fit the reducer and store the reduced chunk coordinates
+        
+        Args:
+            embeddings: High-dimensional embeddings
+            
+        Returns:
+            The fitted reducer
+        """
+        # Adjust n_components if we have fewer samples
+        n_samples = embeddings.shape[0]
+        actual_components = min(self.n_components, n_samples)
+        
+        if self.method == "pca":
+            self.reducer = PCA(n_components=actual_components)
+        else:
+            # UMAP needs at least 2 samples
+            if n_samples < 2:
+                # If only 1 sample, pad with zeros for visualization
+                self.reducer = None
+                self.embedding_ = np.zeros((n_samples, self.n_components))
+                return self
+            self.reducer = umap.UMAP(n_components=actual_components, random_state=42)
+        
+        self.embedding_ = self._pad(self.reducer.fit_transform(embeddings))
+        return self
+    
+    def transform(self, points: np.ndarray) -> np.ndarray:
+        """Project new points into the fitted low-dimensional space
+        
+        Args:
+            points: High-dimensional points, shape (n_points, n_features)
+            
+        Returns:
+            Reduced points array
+        """
+        points = np.atleast_2d(points)
+        if self.reducer is None:
+            return np.zeros((points.shape[0], self.n_components))
+        return self._pad(self.reducer.transform(points))
+    
+    def _pad(self, reduced: np.ndarray) -> np.ndarray:
+        # If we got fewer dimensions than requested, pad with zeros
+        if reduced.shape[1] < self.n_components:
+            padding = np.zeros((reduced.shape[0], self.n_components - reduced.shape[1]))
+            reduced = np.hstack([reduced, padding])
+        return reduced
+
+
+def embeddings_fingerprint(embeddings: np.ndarray) -> str:
+    """Content hash of an embedding matrix, used as a reducer cache key"""
+    embeddings = np.ascontiguousarray(embeddings)
+    digest = hashlib.sha1(embeddings.view(np.uint8))
+    digest.update(str((embeddings.shape, embeddings.dtype.str)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _fit_reducer(fingerprint: str, method: str, n_components: int, _embeddings: np.ndarray) -> FittedReducer:
+    return FittedReducer(method, n_components).fit(_embeddings)
+
+
+def get_fitted_reducer(embeddings: np.ndarray, method: str = "pca", n_components: int = 3) -> FittedReducer:
+    """Get a reducer fitted on the embeddings, cached per (matrix fingerprint, method)
+    
+    Args:
+        embeddings: High-dimensional embeddings
+        method: Reduction method ('pca' or 'umap')
+        n_components: Number of dimensions to reduce to
+        
+    Returns:
+        FittedReducer instance
+    """
+    embeddings = np.asarray(embeddings)
+    return _fit_reducer(embeddings_fingerprint(embeddings), method, n_components, embeddings)
+
 
 def reduce_dimensions(embeddings: np.ndarray, method: str = "pca", n_components: int = 3):
     """Reduce embedding dimensions for visualization
@@ -18,45 +119,77 @@ def reduce_dimensions(embeddings: np.ndarray, method: str = "pca", n_components:
     Returns:
         Reduced embeddings array
     """
-    # Adjust n_components if we have fewer samples
-    n_samples = embeddings.shape[0]
-    actual_components = min(n_components, n_samples)
-    
-    if method == "pca":
-        reducer = PCA(n_components=actual_components)
-    elif method == "umap":
-        # UMAP needs at least 2 samples
-        if n_samples < 2:
-            # If only 1 sample, pad with zeros for visualization
-            reduced = np.zeros((n_samples, n_components))
-            return reduced
-        reducer = umap.UMAP(n_components=actual_components, random_state=42)
-    else:
-        raise ValueError("Method must be 'pca' or 'umap'")
+    return get_fitted_reducer(embeddings, method, n_components).embedding_
+
+
+def aggregate_to_grid(points: np.ndarray, max_cells: int):
+    """Group points by the cells of a regular 3D grid with at most max_cells occupied cells
     
-    reduced = reducer.fit_transform(embeddings)
+    The number of cells per axis is the largest one found (by doubling, then
+    bisection) that keeps the occupied cells within max_cells.
     
-    # If we got fewer dimensions than requested, pad with zeros
-    if reduced.shape[1] < n_components:
-        padding = np.zeros((n_samples, n_components - reduced.shape[1]))
-        reduced = np.hstack([reduced, padding])
+    Args:
+        points: Point coordinates, shape (n_points, 3)
+        max_cells: Maximum number of occupied cells
+        
+    Returns:
+        Tuple of (centroids of the occupied cells, number of points in every cell,
+        index of the first point of every cell)
+    """
+    low = points.min(axis=0)
+    extent = points.max(axis=0) - low
+    extent[extent == 0] = 1
+    unit = (points - low) / extent
     
-    return reduced
+    def cell_keys(resolution):
+        cells = np.minimum((unit * resolution).astype(np.int64), resolution - 1)
+        return (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+    
+    # Occupied cells grow with the resolution (not strictly: the grids are not nested)
+    best, too_fine = 1, 2
+    while too_fine < 2 ** 20 and len(np.unique(cell_keys(too_fine))) <= max_cells:
+        best, too_fine = too_fine, too_fine * 2
+    while too_fine - best > 1:
+        middle = (best + too_fine) // 2
+        if len(np.unique(cell_keys(middle))) <= max_cells:
+            best = middle
+        else:
+            too_fine = middle
+    
+    _, first, inverse, counts = np.unique(cell_keys(best), return_index=True, return_inverse=True, return_counts=True)
+    centroids = np.column_stack([np.bincount(inverse, weights=points[:, axis]) / counts for axis in range(3)])
+    return centroids, counts, first
+
+
+def _previews(chunks: List[str], indices: np.ndarray) -> np.ndarray:
+    # Hover text of some chunks, only those are sliced out of the text
+    previews = np.empty(len(indices), dtype=object)
+    for position, index in enumerate(indices.tolist()):
+        chunk = chunks[index]
+        previews[position] = chunk[:50] + "..." if len(chunk) > 50 else chunk
+    return previews
 
 
 def create_3d_plot(
     reduced_embeddings: np.ndarray, 
     chunks: List[str], 
     selected_indices: Optional[List[int]] = None, 
-    query_point: Optional[np.ndarray] = None
+    query_point: Optional[np.ndarray] = None,
+    max_points: int = PLOT_MAX_POINTS
 ):
     """Create interactive 3D scatter plot
     
+    Past max_points chunks the plot switches to a level of detail view: the
+    chunks are aggregated on a 3D grid and every occupied cell is drawn as
+    one marker at the centroid of its chunks, sized by their number. The
+    retrieved chunks and the query are always drawn as they are.
+    
     Args:
         reduced_embeddings: 3D embeddings to visualize
         chunks: Original text chunks
         selected_indices: Indices of selected/retrieved chunks
         query_point: Query point coordinates in 3D space
+        max_points: Number of chunks above which they are aggregated
         
     Returns:
         Plotly figure object
@@ -65,43 +198,91 @@ def create_3d_plot(
     if reduced_embeddings.shape[1] < 3:
         padding = np.zeros((reduced_embeddings.shape[0], 3 - reduced_embeddings.shape[1]))
         reduced_embeddings = np.hstack([reduced_embeddings, padding])
-    
-    # Truncate chunk labels for display
-    labels = [chunk[:50] + "..." if len(chunk) > 50 else chunk for chunk in chunks]
-    
-    # Create colors based on selection
-    colors = ['#667eea'] * len(chunks)
-    sizes = [8] * len(chunks)
-    
-    if selected_indices:
-        for idx in selected_indices:
-            colors[idx] = '#ff6b6b'
-            sizes[idx] = 12
+    # Single precision is plenty on screen and halves the coordinates sent to the browser
+    points = np.asarray(reduced_embeddings, dtype=np.float32)
+    selected = np.unique(np.asarray(selected_indices or [], dtype=np.int64))
     
     # Main scatter plot
     fig = go.Figure()
     
-    # Add chunk points
-    fig.add_trace(go.Scatter3d(
-        x=reduced_embeddings[:, 0],
-        y=reduced_embeddings[:, 1],
-        z=reduced_embeddings[:, 2],
-        mode='markers+text',
-        marker=dict(
-            size=sizes,
-            color=colors,
-            opacity=0.8,
-            line=dict(color='white', width=0.5)
-        ),
-        text=[f"Chunk {i}" for i in range(len(chunks))],
-        hovertemplate='<b>Chunk %{text}</b><br>' +
-                      'X: %{x:.3f}<br>' +
-                      'Y: %{y:.3f}<br>' +
-                      'Z: %{z:.3f}<br>' +
-                      '<extra></extra>',
-        customdata=labels,
-        name='Chunks'
-    ))
+    # Add chunk points, labelled on hover only
+    if len(points) > max_points:
+        centroids, counts, first = aggregate_to_grid(points, max_points)
+        customdata = np.empty((len(counts), 3), dtype=object)
+        customdata[:, 0] = counts
+        customdata[:, 1] = first
+        customdata[:, 2] = _previews(chunks, first)
+        fig.add_trace(go.Scatter3d(
+            x=centroids[:, 0].astype(np.float32),
+            y=centroids[:, 1].astype(np.float32),
+            z=centroids[:, 2].astype(np.float32),
+            mode='markers',
+            marker=dict(
+                # Larger for the cells holding more chunks (log scale)
+                size=np.minimum(4 + 2 * np.log2(counts), 16),
+                color='#667eea',
+                opacity=0.8
+            ),
+            hovertemplate='<b>%{customdata[0]} chunks</b><br>' +
+                          'e.g. Chunk %{customdata[1]}: %{customdata[2]}<br>' +
+                          'X: %{x:.3f}<br>' +
+                          'Y: %{y:.3f}<br>' +
+                          'Z: %{z:.3f}<br>' +
+                          '<extra></extra>',
+            customdata=customdata,
+            name=f'Chunks ({len(points):,} in {len(counts):,} cells)'
+        ))
+    else:
+        indices = np.arange(len(points))
+        customdata = np.empty((len(points), 2), dtype=object)
+        customdata[:, 0] = indices
+        customdata[:, 1] = _previews(chunks, indices)
+        fig.add_trace(go.Scatter3d(
+            x=points[:, 0],
+            y=points[:, 1],
+            z=points[:, 2],
+            mode='markers',
+            marker=dict(
+                size=8,
+                color='#667eea',
+                opacity=0.8,
+                line=dict(color='white', width=0.5)
+            ),
+            hovertemplate='<b>Chunk %{customdata[0]}</b><br>' +
+                          '%{customdata[1]}<br>' +
+                          'X: %{x:.3f}<br>' +
+                          'Y: %{y:.3f}<br>' +
+                          'Z: %{z:.3f}<br>' +
+                          '<extra></extra>',
+            customdata=customdata,
+            name='Chunks'
+        ))
+    
+    # Retrieved chunks, drawn over the others
+    if len(selected):
+        customdata = np.empty((len(selected), 2), dtype=object)
+        customdata[:, 0] = selected
+        customdata[:, 1] = _previews(chunks, selected)
+        fig.add_trace(go.Scatter3d(
+            x=points[selected, 0],
+            y=points[selected, 1],
+            z=points[selected, 2],
+            mode='markers',
+            marker=dict(
+                size=12,
+                color='#ff6b6b',
+                opacity=0.9,
+                line=dict(color='white', width=0.5)
+            ),
+            hovertemplate='<b>Chunk %{customdata[0]}</b><br>' +
+                          '%{customdata[1]}<br>' +
+                          'X: %{x:.3f}<br>' +
+                          'Y: %{y:.3f}<br>' +
+                          'Z: %{z:.3f}<br>' +
+                          '<extra></extra>',
+            customdata=customdata,
+            name='Retrieved'
+        ))
     
     # Add query point if exists
     if query_point is not None:
@@ -141,3 +322,31 @@ def create_3d_plot(
     
     return fig
 
+
+def estimate_payload_size(fig) -> int:
+    """Approximate size in bytes of the figure sent to the browser
+    
+    Summed from the trace arrays instead of serializing the figure a second
+    time: the coordinates and marker sizes at their encoded size, the hover
+    data at the length of their texts. The layout, a few KiB, is left out.
+    
+    Args:
+        fig: Figure returned by create_3d_plot
+        
+    Returns:
+        Estimated size of the figure's JSON in bytes
+    """
+    size = 0
+    for trace in fig.data:
+        for values in (trace.x, trace.y, trace.z, trace.marker.size):
+            if values is None or np.isscalar(values):
+                continue
+            values = np.asarray(values)
+            if _BASE64_ARRAYS and values.dtype != object:
+                size += 4 * -(-values.nbytes // 3)
+            else:
+                size += values.size * _JSON_NUMBER_BYTES
+        if trace.customdata is not None:
+            # Quotes and separator around every cell
+            size += sum(len(str(value)) + 3 for value in np.asarray(trace.customdata).ravel().tolist())
+    return size
@@ -1,6 +1,8 @@
 """Augmentation section component - shows prompt construction"""
 
 import streamlit as st
+from src.config import PROMPT_TOKEN_BUDGET
+from src.core.llm import construct_rag_prompt
 
 
 def render_augmentation_section():
@@ -71,39 +73,61 @@ Always cite which parts of the context you used in your answer."""
     st.subheader("💬 Augmented User Message")
     st.markdown("*This is the final message sent to the LLM (System Prompt + Context + Query)*")
     
+    token_budget = st.slider(
+        "Prompt token budget",
+        min_value=500,
+        max_value=16000,
+        value=PROMPT_TOKEN_BUDGET,
+        step=250,
+        help="Most similar chunks are packed first; chunks that would exceed the budget are left out"
+    )
+    
     # Construct the augmented message
     query_text = st.session_state.get('last_query', '')
     retrieved_docs = st.session_state.query_results['documents'][0]
-    
-    context_text = "\n\n".join([
-        f"[Context {i+1}]:\n{doc}" 
-        for i, doc in enumerate(retrieved_docs)
-    ])
-    
-    augmented_message = f"""Context Information:
-{'='*80}
-{context_text}
-{'='*80}
-
-User Question: {query_text}
-
-Please answer the question based on the context provided above."""
+    similarities = [1 - distance for distance in st.session_state.query_results['distances'][0]]
+    spans = st.session_state.query_results.get('spans', [None])[0]
+    
+    prompt_data = construct_rag_prompt(
+        query_text,
+        retrieved_docs,
+        st.session_state.custom_system_prompt,
+        similarities=similarities,
+        spans=spans,
+        token_budget=token_budget
+    )
+    augmented_message = prompt_data['full_user_message']
     
     # Store for generation
     st.session_state.augmented_prompt = {
         "system_prompt": st.session_state.custom_system_prompt,
         "user_message": augmented_message,
         "query": query_text,
-        "num_contexts": len(retrieved_docs)
+        "num_contexts": prompt_data['num_chunks'],
+        "token_budget": token_budget
     }
     
     # Display in code block for clarity
     with st.expander("View Full Augmented Prompt", expanded=False):
         st.code(augmented_message, language="text")
     
-    # Show token estimate
-    estimated_tokens = len(augmented_message.split()) + len(st.session_state.custom_system_prompt.split())
-    st.caption(f"📊 Estimated tokens: ~{estimated_tokens * 1.3:.0f} (prompt)")
+    # Token counts of the packed prompt against every chunk sent verbatim
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Prompt Tokens", f"{prompt_data['prompt_tokens']:,}", help=f"Budget: {token_budget:,} tokens")
+    with col2:
+        st.metric("Tokens Saved", f"{prompt_data['tokens_saved']:,}",
+                  help=f"{prompt_data['unpacked_prompt_tokens']:,} tokens with every chunk sent verbatim")
+    with col3:
+        st.metric("Chunks Packed", f"{prompt_data['num_chunks']} of {len(retrieved_docs)}")
+    
+    notes = []
+    merged = prompt_data['num_chunks'] - prompt_data['num_passages']
+    if merged:
+        notes.append(f"{merged} overlapping chunk(s) merged, their shared text sent once")
+    if prompt_data['dropped_chunks']:
+        notes.append(f"{prompt_data['dropped_chunks']} chunk(s) left out to stay within the budget")
+    st.caption("📊 Counted with the gpt-4o-mini tokenizer" + "".join(f" · {note}" for note in notes))
     
     st.divider()
     
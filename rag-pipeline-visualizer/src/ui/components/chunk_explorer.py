@@ -24,7 +24,10 @@ def render_chunk_explorer():
     col1, col2 = st.columns([2, 1])
     
     with col1:
+        # Only the selected chunk is sliced out of the text
         st.text_area("Chunk Content", st.session_state.chunks[chunk_idx], height=150)
+        start, end = st.session_state.chunks.span(chunk_idx)
+        st.caption(f"Characters {start:,}–{end:,} of the cleaned text")
     
     with col2:
         st.write("**Embedding Vector (first 10 dims):**")
@@ -1,7 +1,7 @@
 """Generation section component - shows LLM response"""
 
 import streamlit as st
-from src.core.llm import generate_response, get_openai_client
+from src.core.llm import stream_response, get_openai_client
 
 
 def render_generation_section():
@@ -56,29 +56,38 @@ def render_generation_section():
         
         st.session_state.generating = True
         
-        with st.spinner("🧠 Generating response from GPT-4o-mini..."):
-            try:
-                # Get retrieved documents
-                retrieved_docs = st.session_state.query_results['documents'][0]
-                query = st.session_state.augmented_prompt['query']
-                system_prompt = st.session_state.augmented_prompt['system_prompt']
-                
-                # Generate response
-                result = generate_response(
-                    query=query,
-                    retrieved_chunks=retrieved_docs,
-                    system_prompt=system_prompt,
-                    model="gpt-4o-mini"
-                )
-                
-                st.session_state.llm_response = result
-                st.session_state.generating = False
-                st.success("✅ Response generated successfully!")
-                
-            except Exception as e:
-                st.error(f"❌ Error generating response: {str(e)}")
-                st.session_state.generating = False
-                return
+        # The answer is shown as it is generated, then replaced by the full response below
+        streaming = st.empty()
+        try:
+            # Get retrieved documents
+            retrieved_docs = st.session_state.query_results['documents'][0]
+            query = st.session_state.augmented_prompt['query']
+            system_prompt = st.session_state.augmented_prompt['system_prompt']
+            
+            # Stream response
+            stream = stream_response(
+                query=query,
+                retrieved_chunks=retrieved_docs,
+                system_prompt=system_prompt,
+                model="gpt-4o-mini",
+                similarities=[1 - distance for distance in st.session_state.query_results['distances'][0]],
+                spans=st.session_state.query_results.get('spans', [None])[0],
+                token_budget=st.session_state.augmented_prompt['token_budget']
+            )
+            with streaming.container():
+                st.subheader("💡 LLM Response")
+                st.write_stream(stream)
+            
+            st.session_state.llm_response = stream.result
+            st.session_state.generating = False
+            streaming.empty()
+            st.success("✅ Response generated successfully!")
+            
+        except Exception as e:
+            streaming.empty()
+            st.error(f"❌ Error generating response: {str(e)}")
+            st.session_state.generating = False
+            return
     
     # Display response if available
     if st.session_state.get('llm_response'):
@@ -109,6 +118,18 @@ def render_generation_section():
         
         st.caption("💰 Cost based on GPT-4o-mini pricing: $0.150/1M input tokens, $0.600/1M output tokens")
         
+        # Latency of the streamed response
+        timing = st.session_state.llm_response.get('timing')
+        if timing:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Time to First Token", f"{timing['time_to_first_token'] * 1000:,.0f} ms")
+            with col2:
+                st.metric("Tokens/sec", f"{timing['tokens_per_second']:,.1f}")
+            with col3:
+                st.metric("Total Latency", f"{timing['total_latency']:.2f} s")
+            st.caption("⏱️ Tokens/sec is measured after the first token, while the answer is streamed")
+        
         # Show full conversation for debugging/inspection
         with st.expander("🔍 View Full API Call Details"):
             st.markdown("**Model Used:**")
@@ -1,12 +1,13 @@
 """Input section component"""
 
 import streamlit as st
-from src.core.models import load_model
+from src.core.models import embed_chunks, load_model
 from src.core.text_processing import chunk_text
-from src.core.vector_store import create_chromadb_collection
+from src.core.vector_store import build_vector_store
 
 
-def render_input_section(model_name: str, chunk_size: int, overlap: int, collection_name: str):
+def render_input_section(model_name: str, chunk_size: int, overlap: int, collection_name: str,
+                         index_backend: str = "exact", chunk_unit: str = "words"):
     """Render the input section for text upload and embedding generation
     
     Args:
@@ -14,6 +15,8 @@ def render_input_section(model_name: str, chunk_size: int, overlap: int, collect
         chunk_size: Size of text chunks
         overlap: Overlap between chunks
         collection_name: Name of ChromaDB collection
+        index_backend: "chroma" or a vector index backend ("exact", "hnsw", "ivfpq")
+        chunk_unit: Unit of chunk_size and overlap, "words" or "tokens" of the model
     """
     st.subheader("📄 Input Text")
     
@@ -38,29 +41,28 @@ def render_input_section(model_name: str, chunk_size: int, overlap: int, collect
             st.error("Please enter some text first!")
         else:
             with st.spinner("Loading model and generating embeddings..."):
-                # Load model
-                model = load_model(model_name)
-                
-                # Chunk text
-                chunks = chunk_text(text_input, chunk_size, overlap)
+                # Chunk text (offsets into the cleaned text, sliced when a chunk is read)
+                tokenizer = load_model(model_name).tokenizer if chunk_unit == "tokens" else None
+                chunks = chunk_text(text_input, chunk_size, overlap, unit=chunk_unit, tokenizer=tokenizer)
                 st.session_state.chunks = chunks
                 
-                # Generate embeddings
-                embeddings = model.encode(chunks, show_progress_bar=False)
+                # Generate embeddings (only chunks missing from the cache are encoded)
+                result = embed_chunks(model_name, chunks)
+                embeddings = result["embeddings"]
                 st.session_state.embeddings = embeddings
+                st.session_state.embedding_cache_stats = {
+                    "hits": result["hits"],
+                    "misses": result["misses"]
+                }
                 
-                # Create ChromaDB collection
-                collection = create_chromadb_collection(collection_name)
-                
-                # Add to ChromaDB
-                collection.add(
-                    embeddings=embeddings.tolist(),
-                    documents=chunks,
-                    ids=[f"chunk_{i}" for i in range(len(chunks))]
-                )
+                # Store the embeddings in ChromaDB or an in-process vector index
+                collection = build_vector_store(index_backend, embeddings, chunks, collection_name)
                 
                 st.session_state.collection = collection
                 st.session_state.embeddings_generated = True
                 
-            st.success(f"✅ Generated embeddings for {len(chunks)} chunks!")
+            st.success(
+                f"✅ Generated embeddings for {len(chunks)} chunks! "
+                f"({result['misses']} encoded, {result['hits']} reused from cache)"
+            )
 
@@ -2,6 +2,7 @@
 
 import streamlit as st
 from src.core.models import load_model
+from src.core.vector_store import query_vector_store
 
 
 def render_query_section(model_name: str):
@@ -31,10 +32,12 @@ def render_query_section(model_name: str):
                 model = load_model(model_name)
                 query_embedding = model.encode([query_text])[0]
                 
-                # Query ChromaDB
-                results = st.session_state.collection.query(
-                    query_embeddings=[query_embedding.tolist()],
-                    n_results=n_results
+                # Query the vector store
+                results = query_vector_store(
+                    st.session_state.collection,
+                    st.session_state.chunks,
+                    query_embedding,
+                    n_results
                 )
                 
                 st.session_state.query_results = results
@@ -55,4 +58,6 @@ def render_query_section(model_name: str):
                 
                 with st.expander(f"Result {i+1} - Chunk {chunk_number} - Similarity: {similarity:.3f}"):
                     st.write(doc)
+                    start, end = st.session_state.chunks.span(chunk_number)
+                    st.caption(f"Characters {start:,}–{end:,} of the cleaned text")
 
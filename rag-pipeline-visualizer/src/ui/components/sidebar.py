@@ -1,7 +1,7 @@
 """Sidebar component"""
 
 import streamlit as st
-from src.config import MODEL_OPTIONS, SAMPLE_TEXTS
+from src.config import CHUNK_UNIT_OPTIONS, MODEL_OPTIONS, SAMPLE_TEXTS, VECTOR_INDEX_OPTIONS
 from src.core.session_state import reset_embeddings_state
 
 
@@ -9,7 +9,7 @@ def render_sidebar():
     """Render the sidebar with configuration options
     
     Returns:
-        Tuple of (model_name, chunk_size, overlap, reduction_method, collection_name)
+        Tuple of (model_name, chunk_size, overlap, reduction_method, collection_name, index_backend, chunk_unit)
     """
     with st.sidebar:
         st.header("⚙️ Configuration")
@@ -33,8 +33,14 @@ def render_sidebar():
         
         # Chunking parameters
         st.subheader("📝 Chunking Settings")
-        chunk_size = st.slider("Chunk Size (words)", 50, 500, 100, 50)
-        overlap = st.slider("Overlap (words)", 0, 100, 20, 10)
+        unit_label = st.selectbox(
+            "Chunk Unit",
+            options=list(CHUNK_UNIT_OPTIONS.keys()),
+            help="Count chunk sizes in words, or in tokens of the embedding model (which truncates long chunks)"
+        )
+        chunk_unit = CHUNK_UNIT_OPTIONS[unit_label]
+        chunk_size = st.slider(f"Chunk Size ({chunk_unit})", 50, 500, 100, 50)
+        overlap = st.slider(f"Overlap ({chunk_unit})", 0, 100, 20, 10)
         
         # Dimensionality reduction
         st.subheader("📊 Visualization")
@@ -44,6 +50,15 @@ def render_sidebar():
             help="Method to reduce embeddings to 3D"
         )
         
+        # Vector store
+        st.subheader("🗄️ Vector Store")
+        index_label = st.selectbox(
+            "Vector Index",
+            options=list(VECTOR_INDEX_OPTIONS.keys()),
+            help="Exact search is best for small texts, HNSW and IVF-PQ approximate it for large corpora"
+        )
+        index_backend = VECTOR_INDEX_OPTIONS[index_label]
+        
         # Collection name
         collection_name = st.text_input("ChromaDB Collection", "rag_embeddings")
         
@@ -57,5 +72,5 @@ def render_sidebar():
             st.session_state.sample_text = SAMPLE_TEXTS[sample_choice]
             st.rerun()
     
-    return model_name, chunk_size, overlap, reduction_method, collection_name
+    return model_name, chunk_size, overlap, reduction_method, collection_name, index_backend, chunk_unit
 
@@ -9,7 +9,7 @@ def render_stats_section(reduction_method: str):
     Args:
         reduction_method: The reduction method being used
     """
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
         st.markdown(f"""
@@ -42,4 +42,17 @@ def render_stats_section(reduction_method: str):
             <p class="stat-label">Visualization Space</p>
         </div>
         """, unsafe_allow_html=True)
-
+    
+    with col5:
+        cache_stats = st.session_state.get('embedding_cache_stats')
+        if cache_stats and cache_stats['hits'] + cache_stats['misses'] > 0:
+            hit_rate = cache_stats['hits'] / (cache_stats['hits'] + cache_stats['misses'])
+            hit_rate_text = f"{hit_rate:.0%}"
+        else:
+            hit_rate_text = "-"
+        st.markdown(f"""
+        <div class="stat-card">
+            <p class="stat-number">{hit_rate_text}</p>
+            <p class="stat-label">Embedding Cache Hits</p>
+        </div>
+        """, unsafe_allow_html=True)
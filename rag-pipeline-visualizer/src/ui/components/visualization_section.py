@@ -1,9 +1,7 @@
 """Visualization section component"""
 
 import streamlit as st
-import numpy as np
-from src.core.visualization import reduce_dimensions, create_3d_plot
-from src.core.models import load_model
+from src.core.visualization import get_fitted_reducer, create_3d_plot, estimate_payload_size
 
 
 def render_visualization_section(reduction_method: str, model_name: str):
@@ -16,12 +14,13 @@ def render_visualization_section(reduction_method: str, model_name: str):
     st.subheader("🎨 3D Embedding Space")
     
     with st.spinner("Reducing dimensions and creating visualization..."):
-        # Reduce dimensions
-        reduced_embeddings = reduce_dimensions(
+        # Fit the reducer once per embedding matrix (cached across reruns)
+        reducer = get_fitted_reducer(
             st.session_state.embeddings,
             method=reduction_method.lower(),
             n_components=3
         )
+        reduced_embeddings = reducer.embedding_
         
         # Get selected indices and query point if available
         selected_indices = None
@@ -35,12 +34,8 @@ def render_visualization_section(reduction_method: str, model_name: str):
             result_ids = st.session_state.query_results['ids'][0]
             selected_indices = [int(id.split('_')[1]) for id in result_ids]
             
-            # Reduce query embedding dimensions
-            model = load_model(model_name)
-            combined = np.vstack([st.session_state.embeddings, 
-                                 st.session_state.query_embedding.reshape(1, -1)])
-            reduced_combined = reduce_dimensions(combined, method=reduction_method.lower(), n_components=3)
-            query_point = reduced_combined[-1]
+            # Place the query in the already fitted space instead of refitting
+            query_point = reducer.transform(st.session_state.query_embedding.reshape(1, -1))[0]
         
         # Create plot
         fig = create_3d_plot(
@@ -51,4 +46,10 @@ def render_visualization_section(reduction_method: str, model_name: str):
         )
         
         st.plotly_chart(fig, use_container_width=True)
-
+        
+        # Size of the figure sent to the browser, which is what makes large plots slow (estimated, not serialized)
+        payload = estimate_payload_size(fig)
+        st.caption(
+            f"📦 {len(fig.data[0].x):,} markers for {len(reduced_embeddings):,} chunks, "
+            f"~{payload / 1024:,.0f} KiB sent to the browser"
+        )